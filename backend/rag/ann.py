@@ -0,0 +1,148 @@
+import os
+from typing import Optional
+
+import numpy as np
+import faiss
+
+# -----------------------------
+# Index backends: Flat (exact) and IVF-Flat / IVF-PQ / HNSW (approximate)
+# -----------------------------
+# INDEX_KIND: flat | ivf_flat | ivf_pq | hnsw | auto
+#   auto stays Flat until the index holds ANN_PROMOTE_AT vectors, then
+#   rebuilds itself as ANN_PROMOTE_KIND. An explicit IVF kind also waits for
+#   ANN_PROMOTE_AT: below that a handful of lists is just a slower flat scan.
+INDEX_KIND = os.getenv("INDEX_KIND", "auto").lower()
+ANN_PROMOTE_AT = int(os.getenv("ANN_PROMOTE_AT", "250000"))
+ANN_PROMOTE_KIND = os.getenv("ANN_PROMOTE_KIND", "hnsw").lower()
+ANN_TRAIN_SAMPLE = int(os.getenv("ANN_TRAIN_SAMPLE", "100000"))
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_EF_SEARCH = int(os.getenv("ANN_EF_SEARCH", "128"))
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "200"))
+IVF_NLIST = int(os.getenv("IVF_NLIST", "0"))  # 0 = pick from corpus size
+# With IVF_NLIST=0, an IVF index is retrained once the corpus would get this
+# many times the lists it was trained with (4x lists ~ 16x the vectors).
+IVF_REGROW = float(os.getenv("IVF_REGROW", "4"))
+
+KINDS = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+IVF_KINDS = ("ivf_flat", "ivf_pq")
+# kinds that keep only compressed codes: reconstructed vectors are approximations
+LOSSY_KINDS = ("ivf_pq",)
+
+
+def _nlist_for(n: int) -> int:
+    if IVF_NLIST > 0:
+        return IVF_NLIST
+    # ~4*sqrt(n) lists, but keep >= 39 training points per list as faiss recommends
+    return int(max(1, min(4 * np.sqrt(max(n, 1)), n // 39 or 1)))
+
+
+def _pq_m_for(dim: int) -> int:
+    for m in (64, 48, 32, 24, 16, 12, 8, 4):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def kind_of(index: faiss.Index) -> str:
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(base, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(base, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def nlist_of(index: faiss.Index) -> int:
+    """Lists an IVF index was trained with; 0 for other kinds."""
+    base = faiss.downcast_index(index)
+    return base.nlist if isinstance(base, faiss.IndexIVF) else 0
+
+
+def min_train_size(kind: str, n: int) -> int:
+    """How many vectors `kind` needs before it can be built (Flat/HNSW need none)."""
+    if kind == "ivf_flat":
+        return 39 * _nlist_for(n)
+    if kind == "ivf_pq":
+        return max(39 * _nlist_for(n), 256 * 39)  # 8-bit codebooks want >= 256 centroids' worth
+    return 0
+
+
+def new_index(kind: str, dim: int, n_hint: int = 0) -> faiss.Index:
+    """Untrained, empty index of `kind` (inner-product metric, vectors are L2-normalized)."""
+    if kind == "flat":
+        return faiss.IndexFlatIP(dim)
+    if kind == "hnsw":
+        spec = f"HNSW{HNSW_M}"
+    elif kind == "ivf_flat":
+        spec = f"IVF{_nlist_for(n_hint)},Flat"
+    elif kind == "ivf_pq":
+        spec = f"IVF{_nlist_for(n_hint)},PQ{_pq_m_for(dim)}"
+    else:
+        raise ValueError(f"Unknown index kind: {kind!r} (expected one of {KINDS})")
+    return faiss.index_factory(dim, spec, faiss.METRIC_INNER_PRODUCT)
+
+
+def build(kind: str, vecs: np.ndarray, dim: int, train_sample: Optional[int] = None) -> faiss.Index:
+    """Train `kind` on a random sample of `vecs` and add all of them."""
+    index = new_index(kind, dim, n_hint=len(vecs))
+    if not index.is_trained:
+        sample = train_sample or ANN_TRAIN_SAMPLE
+        if len(vecs) > sample:
+            rows = np.random.default_rng(0).choice(len(vecs), sample, replace=False)
+            index.train(vecs[np.sort(rows)])
+        else:
+            index.train(vecs)
+    if kind == "hnsw":
+        faiss.downcast_index(index).hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    if len(vecs):
+        index.add(vecs)
+    return index
+
+
+def target_kind(current: str, n: int) -> str:
+    """Which kind the index should be for its size under INDEX_KIND."""
+    want = INDEX_KIND
+    if want == "auto":
+        want = ANN_PROMOTE_KIND if n >= ANN_PROMOTE_AT else current
+    if want in IVF_KINDS and want != current and n < ANN_PROMOTE_AT:
+        return current
+    if want != "flat" and n < max(1, min_train_size(want, n)):
+        return current  # not enough data to train it yet
+    return want
+
+
+def needs_rebuild(index: faiss.Index) -> bool:
+    """
+    True if the index should be rebuilt for its size: promoted to another kind,
+    or an IVF index whose corpus has outgrown the lists it was trained with.
+    """
+    current, n = kind_of(index), index.ntotal
+    if target_kind(current, n) != current:
+        return True
+    nlist = nlist_of(index)
+    return bool(nlist) and IVF_NLIST <= 0 and _nlist_for(n) >= IVF_REGROW * nlist
+
+
+def set_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None):
+    """Per-query recall/latency knobs; ignored by backends they don't apply to."""
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        base.nprobe = min(nprobe or ANN_NPROBE, base.nlist)
+    elif isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search or ANN_EF_SEARCH
+
+
+def search_params(index: faiss.Index, sel: faiss.IDSelector, nprobe: Optional[int] = None,
+                  ef_search: Optional[int] = None) -> faiss.SearchParameters:
+    """Per-call parameters restricting a search to the rows `sel` accepts, with the same knobs as above."""
+    base = faiss.downcast_index(index)
+    if isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF(sel=sel, nprobe=min(nprobe or ANN_NPROBE, base.nlist))
+    elif isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW(sel=sel, efSearch=ef_search or ANN_EF_SEARCH)
+    else:
+        params = faiss.SearchParameters(sel=sel)
+    return params
@@ -1,20 +1,33 @@
-import os, io, glob, json, hashlib, re
-from typing import List, Dict, Any, Union, Tuple
+import os, io, glob, itertools, json, hashlib, re, queue, threading, time
+from typing import List, Dict, Any, Union, Tuple, Optional, Callable, Iterator
 from datetime import datetime
 
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 from flask_cors import CORS
 from dotenv import load_dotenv
 
 import numpy as np
-import faiss
 from sentence_transformers import SentenceTransformer
-from pypdf import PdfReader
 
 from anthropic import Anthropic, NotFoundError
 import httpx  # required by anthropic client internals
 
 from report import echo_data_extractor
+import fanout
+from index_manager import IndexManager
+from chunk_store import chunk_id, source_label
+from embed_cache import EmbeddingCache, encode_cached
+import ingest as ingest_pipeline
+import chunking
+import json_stream
+from pdf_extract import PdfPages
+from jobs import JobQueue
+import watcher
+from response_cache import ResponseCache, fingerprint
+import incremental
+from breaker import ModelRouter, CallAbandoned
+from governor import Governor, estimate_tokens
+import metrics
 
 # -----------------------------
 # Env & global init
@@ -37,6 +50,15 @@ MODEL_FALLBACKS = [
     "claude-3-haiku-20240307",
 ]
 
+# Send the shared draft+context prefix with cache_control so every bot after the
+# first reads it from the API's prompt cache instead of paying for it again.
+PROMPT_CACHE = os.getenv("PROMPT_CACHE", "1") == "1"
+PROMPT_CACHE_BETA = "prompt-caching-2024-07-31"
+# The API ignores cache_control on a prefix shorter than the model's minimum
+# (Haiku models: 2048 tokens, others 1024), so such prefixes go out unmarked.
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+PROMPT_CACHE_MIN_TOKENS_HAIKU = int(os.getenv("PROMPT_CACHE_MIN_TOKENS_HAIKU", "2048"))
+
 # ---- define dirs FIRST, then create them
 INDEX_DIR = os.getenv("INDEX_DIR", "./faiss_store")
 DATA_DIR = "./data/docs"
@@ -54,14 +76,36 @@ EXPORT_DIR = os.getenv("EXPORT_DIR", "./exports")
 for d in (INDEX_DIR, DATA_DIR, BASE_DATA_DIR, EXPORT_DIR):
     os.makedirs(d, exist_ok=True)
 
+# content-addressed embedding cache (keyed by EMBED_MODEL + chunk text)
+EMBED_CACHE_PATH = os.getenv("EMBED_CACHE_PATH", os.path.join(INDEX_DIR, "embed_cache.sqlite"))
+EMBED_CACHE_MAX_MB = int(os.getenv("EMBED_CACHE_MAX_MB", "1024"))
+
+# model response cache (keyed by model candidates + prompts + sampling params)
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(EXPORT_DIR, "response_cache.sqlite"))
+RESPONSE_CACHE_MAX_MB = int(os.getenv("RESPONSE_CACHE_MAX_MB", "256"))
+
+# persistent queue for /jobs/analyze
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(EXPORT_DIR, "jobs.sqlite"))
+
 # paths that depend on INDEX_DIR
 INDEX_PATH = os.path.join(INDEX_DIR, "index.faiss")
-META_PATH  = os.path.join(INDEX_DIR, "meta.jsonl")
+CHUNK_DIR  = os.path.join(INDEX_DIR, "chunks")
+META_PATH  = os.path.join(INDEX_DIR, "meta.jsonl")  # legacy; migrated into CHUNK_DIR on startup
 
 
-anthropic = Anthropic(api_key=ANTHROPIC_API_KEY)
+# no SDK retries: ROUTER retries each call, through GOVERNOR and the breakers
+anthropic = Anthropic(api_key=ANTHROPIC_API_KEY, max_retries=0)
 embedder = SentenceTransformer(EMBED_MODEL)
 EMB_DIM = embedder.get_sentence_embedding_dimension()
+CHUNKER = chunking.make_chunker(embedder)  # CHUNK_MODE: chars (legacy) | sentence | tokens
+
+# one in-memory copy of index.faiss + chunk store for the whole process
+INDEX = IndexManager(INDEX_PATH, CHUNK_DIR, EMB_DIM, legacy_meta_path=META_PATH,
+                     embed_fn=lambda texts: _embed_texts(texts))  # re-embeds texts when leaving a lossy (PQ) index
+EMB_CACHE = EmbeddingCache(EMBED_CACHE_PATH, EMBED_CACHE_MAX_MB * 1024 * 1024) if EMBED_CACHE_MAX_MB > 0 else None
+ROUTER = ModelRouter()  # per-model circuit breakers for _gen_with_fallbacks
+GOVERNOR = Governor()   # process-wide RPM/TPM buckets (LLM_RPM / LLM_TPM)
+RESP_CACHE = ResponseCache(RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_MB * 1024 * 1024) if RESPONSE_CACHE_MAX_MB > 0 else None
 
 # -----------------------------
 # Editorial bots (10 personas)
@@ -216,6 +260,12 @@ CORS(app)
 def _hash_id(s: str) -> str:
     return hashlib.sha256(s.encode("utf-8")).hexdigest()
 
+def _flag(value: Any, default: bool) -> bool:
+    """A request flag: JSON true/false or a "1"/"true"/"yes" string (anything else is false)."""
+    if value is None:
+        return default
+    return str(value).lower() in ("1", "true", "yes")
+
 def _safe_filename_from_text(text: str, prefix: str = "analysis", ext: str = "json") -> str:
     ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     h = hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:8]
@@ -246,8 +296,7 @@ def _read_text(path: str) -> str:
             return ""
     if ext == ".pdf":
         try:
-            pdf = PdfReader(path)
-            return "\n\n".join([p.extract_text() or "" for p in pdf.pages])
+            return PdfPages(path).text()
         except Exception:
             return ""
     try:
@@ -256,170 +305,198 @@ def _read_text(path: str) -> str:
     except Exception:
         return ""
 
-def _chunk(text: str, size: int = 900, overlap: int = 140) -> List[str]:
-    text = text.strip().replace("\r\n", "\n")
-    out = []
-    i = 0
-    while i < len(text):
-        out.append(text[i:i+size])
-        i += (size - overlap)
-    return [c for c in out if c.strip()]
-
-def _load_meta() -> List[Dict[str, Any]]:
-    if not os.path.exists(META_PATH):
-        return []
-    rows = []
-    with open(META_PATH, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                rows.append(json.loads(line))
-    return rows
-
-def _append_meta(rows: List[Dict[str, Any]]):
-    with open(META_PATH, "a", encoding="utf-8") as f:
-        for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
-
-def _save_faiss(index: faiss.Index):
-    faiss.write_index(index, INDEX_PATH)
-
-def _load_faiss() -> faiss.Index:
-    if os.path.exists(INDEX_PATH):
-        return faiss.read_index(INDEX_PATH)
-    return faiss.IndexFlatIP(EMB_DIM)  # cosine via normalized inner product
-
 def _normalize(v: np.ndarray) -> np.ndarray:
     n = np.linalg.norm(v, axis=1, keepdims=True) + 1e-12
     return v / n
 
+def _iter_doc_chunks(text: Union[str, PdfPages]):
+    """Chunks of one document; PDF chunks come as (text, [first_page, last_page])."""
+    if isinstance(text, PdfPages):
+        return ((ch, [a + 1, b + 1]) for ch, a, b in CHUNKER.iter_chunks(text, spans=True))
+    return CHUNKER.iter_chunks(text)
+
+def _new_chunk_rows(src_label: str, chunks: List[Any], seen: set, start: int = 0,
+                    keep: Optional[set] = None) -> List[Dict[str, Any]]:
+    """Meta rows for chunks whose id isn't indexed yet (nor queued in `seen` or by another
+    running ingest). Returned ids are claimed in _INFLIGHT until _ingest_docs finishes.
+    `start` is the document-level index of chunks[0]; every id, new or not, is added to `keep`."""
+    rows = []
+    for i, ch in enumerate(chunks, start):
+        ch, pages = ch if isinstance(ch, tuple) else (ch, None)
+        row = {"id": chunk_id(src_label, i, ch), "source": src_label, "chunk_index": i, "text": ch}
+        if pages:
+            row["pages"] = pages
+        rows.append(row)
+    if keep is not None:
+        keep.update(r["id"] for r in rows)
+    with _INGEST_LOCK:
+        known = INDEX.existing_ids([r["id"] for r in rows])
+        fresh = [r for r in rows if r["id"] not in known and r["id"] not in seen and r["id"] not in _INFLIGHT]
+        _INFLIGHT.update(r["id"] for r in fresh)
+    seen.update(r["id"] for r in fresh)
+    return fresh
+
+def _embed_texts(texts: List[str], batch_size: int = 32) -> np.ndarray:
+    with metrics.span("ingest_embed", n=len(texts)):
+        embs = encode_cached(embedder, EMBED_MODEL, texts, EMB_CACHE, batch_size=batch_size)
+    return _normalize(embs).astype("float32")
+
 # ---------- JSON corpus helpers (NEW) ----------
-def _extract_texts_from_json_obj(obj: Any, filename: str) -> List[Tuple[str, str]]:
+JSON_EXTS = (".json",)
+JSONL_EXTS = (".jsonl", ".ndjson")
+
+def _iter_json_docs(f, filename: str, ext: str) -> Iterator[Tuple[str, str]]:
     """
-    Normalize many JSON shapes into a list of (source_label, text).
-    Supports:
-      { "sources": [ {url, text|data|content}, ... ] }
-      { "documents" | "docs": [ ..., ... ] }
-      { "text" | "data" | "content": "..." }
-      [ "text...", {"url":"...", "text":"..."} , ... ]
+    (source_label, text) pairs streamed from a .json or .jsonl file (see json_stream).
+    Malformed JSON raises ValueError if nothing was read yet; after that the
+    file is ingested up to the error.
     """
-    out: List[Tuple[str, str]] = []
-
-    def _pick_text(d: Dict[str, Any]) -> str:
-        for k in ("text", "data", "content", "body"):
-            v = d.get(k)
-            if isinstance(v, str) and v.strip():
-                return v
-        return ""
-
-    if isinstance(obj, dict):
-        # primary pattern: {"sources":[{url, text}, ...]}
-        if isinstance(obj.get("sources"), list):
-            for i, it in enumerate(obj["sources"]):
-                if isinstance(it, dict):
-                    txt = _pick_text(it)
-                    if not txt: continue
-                    url = (it.get("url") or "").strip()
-                    label = f"{filename}::{url}" if url else f"{filename}::source_{i+1}"
-                    out.append((label, txt))
-        # alt arrays
-        for key in ("documents", "docs"):
-            if isinstance(obj.get(key), list):
-                for i, it in enumerate(obj[key]):
-                    if isinstance(it, dict):
-                        txt = _pick_text(it)
-                        if not txt: continue
-                        url = (it.get("url") or "").strip()
-                        label = f"{filename}::{url}" if url else f"{filename}::{key[:-1]}_{i+1}"
-                        out.append((label, txt))
-                    elif isinstance(it, str) and it.strip():
-                        out.append((f"{filename}::{key[:-1]}_{i+1}", it))
-        # single text field
-        single = None
-        for k in ("text", "data", "content", "body"):
-            v = obj.get(k)
-            if isinstance(v, str) and v.strip():
-                single = v
-                break
-        if single:
-            out.append((f"{filename}::single", single))
-
-    elif isinstance(obj, list):
-        for i, it in enumerate(obj):
-            if isinstance(it, dict):
-                txt = _pick_text(it)
-                if not txt: continue
-                url = (it.get("url") or "").strip()
-                label = f"{filename}::{url}" if url else f"{filename}::item_{i+1}"
-                out.append((label, txt))
-            elif isinstance(it, str) and it.strip():
-                out.append((f"{filename}::item_{i+1}", it))
-
-    return out
-
-def _extract_texts_from_path(path: str) -> List[Tuple[str, str]]:
+    reader = json_stream.iter_jsonl_docs if ext in JSONL_EXTS else json_stream.iter_json_docs
+    yielded = False
+    try:
+        for doc in reader(f, filename):
+            yielded = True
+            yield doc
+    except ValueError as e:
+        if not yielded:
+            raise
+        print(f"[ingest] {filename}: stopped at malformed JSON ({e})")
+
+def _extract_texts_from_path(path: str) -> Iterator[Tuple[str, Any]]:
     """
-    For a given file path, return normalized (source_label, text) pairs.
-    - .json => parse and split into many docs
+    For a given file path, yield normalized (source_label, text) pairs.
+    - .json / .jsonl => streamed and split into many docs
+    - .pdf => single doc whose pages are extracted lazily (see pdf_extract)
     - others => single doc using file content
     """
     ext = os.path.splitext(path)[1].lower()
-    if ext == ".json":
+    # "./data/docs/x.txt" and "data/docs/x.txt" are the same document (and must get the same chunk ids)
+    path = source_label(path)
+    if ext in JSON_EXTS + JSONL_EXTS:
+        yielded = False
         try:
             with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                obj = json.load(f)
-            items = _extract_texts_from_json_obj(obj, os.path.basename(path))
-            return [(src, txt) for (src, txt) in items if (txt and txt.strip())]
+                for doc in _iter_json_docs(f, os.path.basename(path), ext):
+                    yielded = True
+                    yield doc
+            return
+        except Exception as e:
+            if yielded:
+                # the parsed docs are already queued; the raw file would index them twice
+                print(f"[ingest] {path}: stopped mid-file ({type(e).__name__}: {e})")
+                return
+        # If JSON is malformed, fall back to raw text ingestion
+        raw = _read_text(path)
+        if raw.strip():
+            yield (path, raw)
+    elif ext == ".pdf":
+        try:
+            yield (path, PdfPages(path))
         except Exception:
-            # If JSON is malformed, fall back to raw text ingestion
-            raw = _read_text(path)
-            return [(path, raw)] if raw.strip() else []
+            return
     else:
         raw = _read_text(path)
-        return [(path, raw)] if raw.strip() else []
+        if raw.strip():
+            yield (path, raw)
+
+def _upload_json_docs(content: bytes, filename: str, ext: str) -> Iterator[Tuple[str, str]]:
+    f = io.TextIOWrapper(io.BytesIO(content), encoding="utf-8", errors="ignore")
+    try:
+        yield from _iter_json_docs(f, filename, ext)
+    except ValueError:
+        raise ValueError("Invalid JSON")
+
+def _extract_texts_from_upload(filename: str, content: bytes) -> Iterator[Tuple[str, Any]]:
+    """Same normalization as _extract_texts_from_path, for an uploaded file's bytes.
+    JSON errors surface as ValueError when the first document is pulled."""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in JSON_EXTS + JSONL_EXTS:
+        return _upload_json_docs(content, filename, ext)
+    if ext == ".pdf":
+        try:
+            return iter([(filename, PdfPages(content))])
+        except Exception:
+            raise ValueError("Unsupported file")
+    # txt/md and other plain text
+    text = content.decode("utf-8", errors="ignore")
+    return iter([(filename, text)] if text.strip() else [])
 
 # ---------- Index build ----------
-def _build_index_from_paths(paths: List[str]) -> Dict[str, Any]:
+# Chunk ids claimed by running ingests: two overlapping runs (e.g. /ingest and the
+# watcher) would otherwise both see the same ids as new and index them twice.
+# _INGEST_LOCK only guards the claim, so runs embed and commit concurrently.
+_INGEST_LOCK = threading.Lock()
+_INFLIGHT: set = set()
+_SOURCE_LOCKS: Dict[str, threading.Lock] = {}
+
+def _source_lock(labels: List[str], prefixes: List[str]) -> threading.Lock:
+    """One lock per set of source labels, so replacing the same file twice doesn't interleave."""
+    key = "\0".join(sorted(labels) + ["::"] + sorted(prefixes))
+    with _INGEST_LOCK:
+        return _SOURCE_LOCKS.setdefault(key, threading.Lock())
+
+def _ingest_docs(docs, batch_size: Optional[int] = None, workers: Optional[int] = None,
+                 progress=None, keep_ids: Optional[set] = None) -> Dict[str, Any]:
+    """
+    Shared chunk -> embed -> index path for /seed, /ingest and /ingest/upload.
+    `docs` is any iterable of (source_label, text); it is consumed lazily.
+    `keep_ids` collects the id of every chunk the docs produced (see _replace_docs).
+    """
+    seen: set = set()
+    try:
+        return ingest_pipeline.run_ingest(
+            docs,
+            chunk_fn=_iter_doc_chunks,
+            select_fn=lambda src_label, chunks, start: _new_chunk_rows(src_label, chunks, seen, start, keep_ids),
+            embed_fn=_embed_texts,
+            commit_fn=INDEX.add,
+            batch_size=batch_size,
+            workers=workers,
+            progress=progress,
+        )
+    finally:
+        with _INGEST_LOCK:
+            _INFLIGHT.difference_update(seen)  # committed by now, or failed and free to retry
+
+def _source_labels(path: str) -> Tuple[List[str], List[str]]:
+    """(labels, label prefixes) that _extract_texts_from_path gives this file's docs."""
+    path = source_label(path)
+    ext = os.path.splitext(path)[1].lower()
+    prefixes = [os.path.basename(path) + "::"] if ext in JSON_EXTS + JSONL_EXTS else []
+    return [path], prefixes
+
+def _replace_docs(docs, labels: List[str], prefixes: List[str] = ()) -> Dict[str, Any]:
+    """
+    Ingest a new version of some sources, then delete their chunks that the new
+    version no longer produces. Unchanged chunks keep their rows (and are not
+    re-embedded); stale ones stop matching searches at once.
+    """
+    keep: set = set()
+    with _source_lock(labels, list(prefixes)):
+        stats = _ingest_docs(docs, keep_ids=keep)
+        stats["removed_chunks"] = INDEX.delete_sources(labels, prefixes, keep_ids=keep)
+    return stats
+
+def _replace_path(path: str) -> Dict[str, Any]:
+    return _replace_docs(_extract_texts_from_path(path), *_source_labels(path))
+
+def _build_index_from_paths(paths: List[str], batch_size: Optional[int] = None,
+                            workers: Optional[int] = None) -> Dict[str, Any]:
     """
     Ingest txt/md/pdf as before, and JSON files where each JSON may contain many 'documents'.
-    Each (source_label, text) is chunked and embedded separately.
+    Chunks from all files are pooled into length-sorted embedding batches.
     """
-    index = _load_faiss()
-    new_meta = []
-    add_vecs: List[np.ndarray] = []
-    ingested_docs = 0
-    ingested_chunks = 0
-
-    for p in paths:
-        docs = _extract_texts_from_path(p)  # list of (source_label, text)
-        if not docs:
-            continue
-        for src_label, text in docs:
-            chunks = _chunk(text)
-            if not chunks:
-                continue
-            embs = embedder.encode(chunks, convert_to_numpy=True)
-            embs = _normalize(embs).astype("float32")
-            add_vecs.append(embs)
-
-            for i, ch in enumerate(chunks):
-                new_meta.append({
-                    "id": _hash_id(f"{src_label}|{i}|{len(ch)}"),
-                    "source": src_label,
-                    "chunk_index": i,
-                    "text": ch
-                })
-            ingested_docs += 1
-            ingested_chunks += len(chunks)
+    docs = (doc for p in paths for doc in _extract_texts_from_path(p))
+    stats = _ingest_docs(docs, batch_size=batch_size, workers=workers)
 
-    if not new_meta:
+    if not stats["ingested_chunks"]:
+        if stats["skipped_chunks"]:
+            return {"ok": True, "msg": "Everything is already indexed.", "ingested_chunks": 0, "skipped_chunks": stats["skipped_chunks"]}
         return {"ok": True, "msg": "No readable text found.", "ingested_chunks": 0}
 
-    add_mat = np.vstack(add_vecs).astype("float32")
-    index.add(add_mat)
-    _save_faiss(index)
-    _append_meta(new_meta)
-    return {"ok": True, "ingested_files": len(paths), "ingested_docs": ingested_docs, "ingested_chunks": ingested_chunks}
+    return {"ok": True, "ingested_files": len(paths), "ingested_docs": stats["ingested_docs"],
+            "ingested_chunks": stats["ingested_chunks"], "skipped_chunks": stats["skipped_chunks"],
+            "batches": stats["batches"], "elapsed_s": stats["elapsed_s"]}
 
 def _dedup_hits(hits: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
     seen = set()
@@ -433,28 +510,105 @@ def _dedup_hits(hits: List[Dict[str,Any]]) -> List[Dict[str,Any]]:
         out.append(h)
     return out
 
-def retrieve(query: str, k: int = 6) -> List[Dict[str, Any]]:
-    meta = _load_meta()
-    if not meta or not os.path.exists(INDEX_PATH):
+def retrieve_many(queries: List[str], k: int = 6, nprobe: Optional[int] = None,
+                  ef_search: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Retrieve for N queries with one embedder.encode call and one index search
+    over the stacked query matrix. Returns one deduplicated top-k list per query.
+    """
+    if not queries:
         return []
-    index = _load_faiss()
-    q = embedder.encode([query], convert_to_numpy=True)
-    q = _normalize(q).astype("float32")
+    if len(INDEX) == 0:
+        return [[] for _ in queries]
+    with metrics.span("embedding", n=len(queries)):
+        q = embedder.encode(list(queries), convert_to_numpy=True)
+        q = _normalize(q).astype("float32")
     # Overfetch then hash-dedup to avoid repeated snippets
-    D, I = index.search(q, min(k*3, len(meta)))
-    hits = []
-    for score, idx in zip(D[0].tolist(), I[0].tolist()):
-        if idx == -1:
-            continue
-        m = meta[idx]
-        hits.append({
-            "score": float(score),
-            "text": m["text"],
-            "source": m["source"],
-            "chunk_index": m["chunk_index"]
-        })
-    hits = _dedup_hits(hits)
-    return hits[:k]
+    with metrics.span("faiss_search", n=len(queries), k=k*3):
+        D, I, meta = INDEX.search(q, k*3, nprobe=nprobe, ef_search=ef_search)
+    out = []
+    for row_d, row_i in zip(D.tolist(), I.tolist()):
+        hits = []
+        for score, idx in zip(row_d, row_i):
+            if idx == -1:
+                continue
+            m = meta[idx]
+            hit = {
+                "score": float(score),
+                "text": m["text"],
+                "source": m["source"],
+                "chunk_index": m["chunk_index"]
+            }
+            if "pages" in m:
+                hit["pages"] = m["pages"]
+            hits.append(hit)
+        out.append(_dedup_hits(hits)[:k])
+    return out
+
+def retrieve(query: str, k: int = 6, nprobe: Optional[int] = None,
+             ef_search: Optional[int] = None) -> List[Dict[str, Any]]:
+    return retrieve_many([query], k, nprobe=nprobe, ef_search=ef_search)[0]
+
+# ---------- Claim-level retrieval for drafts ----------
+CLAIM_MAX_QUERIES = int(os.getenv("CLAIM_MAX_QUERIES", "24"))
+CLAIM_WINDOW_SENTENCES = int(os.getenv("CLAIM_WINDOW_SENTENCES", "2"))
+RRF_K = 60
+
+_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+def _claim_windows(draft: str, window: int = CLAIM_WINDOW_SENTENCES,
+                   max_windows: int = CLAIM_MAX_QUERIES) -> List[str]:
+    """
+    Cut the whole draft into overlapping windows of `window` sentences so every
+    claim gets its own query. Long drafts are sampled evenly down to `max_windows`.
+    """
+    sents = [x.strip() for x in _SENT_SPLIT.split(draft) if x and len(x.strip()) > 20]
+    if not sents:
+        return []
+    step = max(1, window - 1) if window > 1 else 1
+    windows = [" ".join(sents[i:i+window]) for i in range(0, max(1, len(sents) - window + 1), step)]
+    if len(windows) > max_windows:
+        picks = np.linspace(0, len(windows) - 1, max_windows).round().astype(int)
+        windows = [windows[i] for i in sorted(set(picks.tolist()))]
+    return windows
+
+def _rrf_fuse(ranked_lists: List[List[Dict[str, Any]]], k: int) -> List[Dict[str, Any]]:
+    """Reciprocal-rank fusion: score(chunk) = sum over lists of 1 / (RRF_K + rank)."""
+    fused: Dict[Tuple[str, int], Dict[str, Any]] = {}
+    for hits in ranked_lists:
+        for rank, h in enumerate(hits):
+            key = (h["source"], h["chunk_index"])
+            cur = fused.get(key)
+            if cur is None:
+                cur = fused[key] = {**h, "rrf_score": 0.0}
+            cur["rrf_score"] += 1.0 / (RRF_K + rank + 1)
+            cur["score"] = max(cur["score"], h["score"])
+    ranked = sorted(fused.values(), key=lambda h: h["rrf_score"], reverse=True)
+    return _dedup_hits(ranked)[:k]
+
+def _retrieve_cached(queries: List[str], k: int,
+                     cached: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> List[List[Dict[str, Any]]]:
+    """
+    retrieve_many, except that queries whose incremental.fingerprint is in
+    `cached` (hits a previous run got for the same text) are not searched again.
+    """
+    cached = cached or {}
+    keys = [incremental.fingerprint(q) for q in queries]
+    fresh = iter(retrieve_many([q for q, key in zip(queries, keys) if key not in cached], k))
+    return [cached[key] if key in cached else next(fresh) for key in keys]
+
+def retrieve_for_draft(draft: str, k: int, head_query: str,
+                       cached: Optional[Dict[str, List[Dict[str, Any]]]] = None
+                       ) -> Tuple[List[Dict[str, Any]], List[str], List[List[Dict[str, Any]]]]:
+    """
+    Retrieval for a whole draft: the head query plus one query per claim window,
+    embedded and searched as a single batch, merged with reciprocal-rank fusion.
+    Windows found in `cached` (see _retrieve_cached) keep their previous hits.
+    Returns (top-k hits, queries used, hits per query).
+    """
+    queries = [head_query] + _claim_windows(draft)
+    per_query = _retrieve_cached(queries, k, cached)
+    return _rrf_fuse(per_query, k), queries, per_query
 
 # -----------------------------
 # JSON hardening helpers
@@ -537,53 +691,205 @@ def _coerce_risks(risks: Any) -> List[Dict[str, Any]]:
 # -----------------------------
 # Anthropic helper
 # -----------------------------
-def _gen_with_fallbacks(system: str, user: str, temp: float, max_tokens: int) -> Dict[str,Any]:
+class UsageMeter:
+    """Running token totals for one /analyze run (USAGE_TOTAL keeps the process-wide ones)."""
+
+    TOKEN_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+    # uncached_prefix_calls: calls whose shared prefix the API did not cache (see _cache_outcome)
+    FIELDS = ("calls", "cached_responses", "uncached_prefix_calls") + TOKEN_FIELDS
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {f: 0 for f in self.FIELDS}
+        self.by_model: Dict[str, Dict[str, int]] = {}
+
+    def add(self, model: Optional[str] = None, **counts: int):
+        with self._lock:
+            per_model = self.by_model.setdefault(model, {f: 0 for f in self.FIELDS}) if model else None
+            for k, v in counts.items():
+                self.totals[k] += int(v or 0)
+                if per_model is not None:
+                    per_model[k] += int(v or 0)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self.totals)
+            out["by_model"] = {m: dict(c) for m, c in self.by_model.items()}
+        prompt = out["input_tokens"] + out["cache_creation_input_tokens"] + out["cache_read_input_tokens"]
+        out["prompt_tokens"] = prompt
+        out["cache_read_ratio"] = round(out["cache_read_input_tokens"] / prompt, 3) if prompt else None
+        return out
+
+USAGE_TOTAL = UsageMeter()
+
+def _usage_counts(msg: Any) -> Dict[str, int]:
+    usage = getattr(msg, "usage", None)
+    return {f: int(getattr(usage, f, 0) or 0) for f in UsageMeter.TOKEN_FIELDS}
+
+def _system_blocks(prefix: List[str], system: str, model: str) -> Tuple[Union[str, List[Dict[str, Any]]], bool]:
+    """
+    System prompt for `model`: `prefix` blocks then `system`. With PROMPT_CACHE,
+    a prefix block is marked cacheable once the prompt up to and including it
+    reaches the model's minimum cacheable size (at most 3 marks; the API
+    allows 4 breakpoints). Returns (system param, whether any block was marked).
+    """
+    if not prefix:
+        return system, False
+    floor = PROMPT_CACHE_MIN_TOKENS_HAIKU if "haiku" in model else PROMPT_CACHE_MIN_TOKENS
+    blocks: List[Dict[str, Any]] = []
+    tokens, marks = 0, 0
+    for i, text in enumerate(prefix + [system]):
+        block = {"type": "text", "text": text}
+        tokens += estimate_tokens(text, "", 0)
+        if PROMPT_CACHE and i < len(prefix) and marks < 3 and tokens >= floor:
+            block["cache_control"] = {"type": "ephemeral"}
+            marks += 1
+        blocks.append(block)
+    return blocks, marks > 0
+
+def _cache_outcome(counts: Dict[str, int], marked: bool) -> str:
+    """What the prompt cache did for a call with a shared prefix: read | write | ignored | too_short."""
+    if counts["cache_read_input_tokens"]:
+        return "read"
+    if counts["cache_creation_input_tokens"]:
+        return "write"
+    return "ignored" if marked else "too_short"
+
+def _gen_with_fallbacks(system: str, user: str, temp: float, max_tokens: int,
+                        timeout: Optional[float] = None, use_cache: bool = True,
+                        prefix: Optional[List[str]] = None, meter: Optional[UsageMeter] = None) -> Dict[str,Any]:
+    """
+    Try each model candidate in turn, skipping any whose circuit breaker is
+    open; rate-limit/overload errors are retried on the same model with
+    jittered backoff first. Every attempt, retries included, waits its turn
+    at GOVERNOR and settles its reservation afterwards (refunding it if the
+    request failed); if no capacity frees up before the deadline we give up
+    rather than downgrade. `prefix` blocks go first in the system prompt and
+    are marked for the API prompt cache when long enough to be cached (see
+    _system_blocks); calls whose prefix was not cached are counted in
+    metrics.LLM_PROMPT_CACHE and the meter's uncached_prefix_calls.
+    Successful replies are cached by call fingerprint; use_cache=False skips
+    the lookup but still refreshes the entry.
+    """
     content = None
     used_model = None
     last_err = None
     seen = set()
     candidates = [m for m in MODEL_FALLBACKS if (m and not (m in seen or seen.add(m)))]
-    for model_try in candidates:
+    prefix = prefix or []
+    key = fingerprint(candidates, "\n\n".join(prefix + [system]), user, temp, max_tokens) if RESP_CACHE else None
+    if key and use_cache:
+        hit = RESP_CACHE.get(key)
+        if hit is not None:
+            if meter:
+                meter.add(cached_responses=1)
+            return {"content": hit["content"], "used_model": hit["used_model"], "error": None, "cached": True}
+    elif key:
+        RESP_CACHE.note_bypass()
+    extra: Dict[str, Any] = {"timeout": timeout} if timeout else {}
+    deadline = time.monotonic() + timeout if timeout else None
+    est_tokens = estimate_tokens("".join(prefix) + system, user, max_tokens)
+
+    def _attempt(model: str, system_param: Any, marked: bool) -> Any:
+        try:
+            reserved = GOVERNOR.acquire(est_tokens, deadline=deadline)
+        except TimeoutError as e:
+            raise CallAbandoned(str(e)) from e
+        used: Optional[int] = 0  # a failed request gives its reservation back
         try:
             msg = anthropic.messages.create(
-                model=model_try,
+                model=model,
                 temperature=temp,
                 max_tokens=max_tokens,
-                system=system,
+                system=system_param,
                 messages=[{"role": "user", "content": user}],
+                **extra,
+                **({"extra_headers": {"anthropic-beta": PROMPT_CACHE_BETA}} if marked else {}),
             )
+            used = sum(_usage_counts(msg).values()) if getattr(msg, "usage", None) else None
+            return msg
+        finally:
+            GOVERNOR.settle(reserved, used)
+
+    for model_try in ROUTER.route(candidates):
+        system_param, marked = _system_blocks(prefix, system, model_try)
+        t0 = time.perf_counter()
+        try:
+            with metrics.span("model_call", model=model_try) as span_info:
+                try:
+                    msg = ROUTER.call(model_try, lambda: _attempt(model_try, system_param, marked), deadline=deadline)
+                except CallAbandoned:
+                    raise
+                except Exception as e:
+                    span_info["error"] = type(e).__name__
+                    metrics.LLM_CALLS.inc(model=model_try, outcome="error")
+                    metrics.LLM_CALL_SECONDS.observe(time.perf_counter() - t0, model=model_try, outcome="error")
+                    raise
+                counts = _usage_counts(msg)
+                span_info.update(counts)
+            metrics.LLM_CALLS.inc(model=model_try, outcome="ok")
+            metrics.LLM_CALL_SECONDS.observe(time.perf_counter() - t0, model=model_try, outcome="ok")
+            for kind, n in counts.items():
+                metrics.LLM_TOKENS.inc(n, model=model_try, kind=kind.replace("_tokens", ""))
+            if prefix and PROMPT_CACHE:
+                outcome = _cache_outcome(counts, marked)
+                metrics.LLM_PROMPT_CACHE.inc(model=model_try, outcome=outcome)
+                counts["uncached_prefix_calls"] = int(outcome in ("ignored", "too_short"))
+            USAGE_TOTAL.add(model=model_try, calls=1, **counts)
+            if meter:
+                meter.add(model=model_try, calls=1, **counts)
             content = "".join([c.text for c in msg.content if getattr(c, "type", "") == "text"])
             used_model = model_try
             break
+        except CallAbandoned as e:
+            last_err = e.__cause__ or e
+            break
         except NotFoundError as e:
             last_err = e; continue
         except Exception as e:
             last_err = e; continue
-    return {"content": content, "used_model": used_model, "error": last_err}
+    if key and content is not None:
+        RESP_CACHE.put(key, {"content": content, "used_model": used_model})
+    return {"content": content, "used_model": used_model, "error": last_err, "cached": False}
 
-# -----------------------------
-# Editorial bot call
-# -----------------------------
-def call_bot(bot: Dict[str,str], draft: str, hits: List[Dict[str,Any]], temp: float, max_tokens: int) -> Dict[str,Any]:
+def _pages_note(h: Dict[str, Any]) -> str:
+    pages = h.get("pages")
+    if not pages:
+        return ""
+    return f", p. {pages[0]}" if pages[0] == pages[1] else f", pp. {pages[0]}-{pages[1]}"
+
+# Bump when the way bot prompts are assembled changes (e.g. what goes in the
+# cached system blocks vs the user turn): it is part of every incremental
+# fingerprint, so outputs produced under an older layout are not reused.
+PROMPT_LAYOUT = 2
+
+def _shared_prefix(draft: str, hits: List[Dict[str,Any]]) -> str:
+    """Draft + context block shared verbatim by every bot of a run (the cacheable prompt prefix)."""
     ctx = "\n\n".join(
-        f"[{i+1}] Source: {h['source']} (chunk {h['chunk_index']})\n{h['text']}"
+        f"[{i+1}] Source: {h['source']} (chunk {h['chunk_index']}{_pages_note(h)})\n{h['text']}"
         for i, h in enumerate(hits)
     ) if hits else "No context available."
-
-    system = f"""{bot['system'].strip()}
-
-{RAG_INSTR}
-"""
-    user = f"""JOURNALIST DRAFT:
+    return f"""ARTICLE DRAFT:
 ---
 {draft}
 ---
 
-CONTEXT SNIPPETS:
+CONTEXT SNIPPETS (cite like [3]):
 {ctx}
 """
 
-    out = _gen_with_fallbacks(system, user, temp, max_tokens)
+# -----------------------------
+# Editorial bot call
+# -----------------------------
+def call_bot(bot: Dict[str,str], draft: str, hits: List[Dict[str,Any]], temp: float, max_tokens: int,
+             timeout: Optional[float] = None, use_cache: bool = True,
+             meter: Optional[UsageMeter] = None) -> Dict[str,Any]:
+    # shared draft/context + RAG_INSTR form the cached prefix; only the role varies per bot
+    system = bot['system'].strip()
+    user = "Review the journalist's ARTICLE DRAFT above in your ROLE, using the CONTEXT SNIPPETS, and follow the GENERAL RULES."
+
+    out = _gen_with_fallbacks(system, user, temp, max_tokens, timeout=timeout, use_cache=use_cache,
+                              prefix=[_shared_prefix(draft, hits), RAG_INSTR], meter=meter)
     content, used_model = out["content"], out["used_model"]
 
     if content is None:
@@ -637,7 +943,8 @@ CONTEXT SNIPPETS:
         "headline_suggestions": headline_suggestions,
         "citations": citations,
         "next_actions": next_actions,
-        "_model": used_model
+        "_model": used_model,
+        "_cached": out["cached"],
     }
 
 # -----------------------------
@@ -689,25 +996,16 @@ def _extract_personas_from_content(content: str) -> List[Dict[str,Any]]:
 # Dynamic Audience Persona Generation
 # -----------------------------
 def _generate_personas_once(draft: str, hits: List[Dict[str,Any]], target_n: int,
-                            exclude_names: List[str], temp: float, max_tokens: int) -> List[Dict[str,str]]:
-    ctx = "\n\n".join(
-        f"[{i+1}] {h['source']} (chunk {h['chunk_index']})\n{h['text']}"
-        for i, h in enumerate(hits)
-    ) if hits else "No context available."
-
+                            exclude_names: List[str], temp: float, max_tokens: int,
+                            timeout: Optional[float] = None, use_cache: bool = True,
+                            meter: Optional[UsageMeter] = None) -> List[Dict[str,str]]:
     system = """You are an audience research planner for a newsroom.
 Design distinct, non-overlapping audience personas tailored to the article draft and context.
 Each persona must be a realistic local stakeholder group with unique concerns and must NOT overlap with the others.
 Return STRICT JSON only."""
     existing = ", ".join(sorted(set(exclude_names))) if exclude_names else "none"
 
-    user = f"""ARTICLE DRAFT:
----
-{draft}
----
-
-CONTEXT (snippets; you may reference indices like [1..N] only in rationale strings):
-{ctx}
+    user = f"""Plan audience personas for the ARTICLE DRAFT above. You may reference CONTEXT indices like [1..N] only in rationale strings.
 
 EXISTING NAMES TO AVOID: [{existing}]
 TASK:
@@ -727,7 +1025,8 @@ JSON SHAPE:
 STRICT: No commentary. Only JSON.
 """
 
-    out = _gen_with_fallbacks(system, user, temp, max_tokens)
+    out = _gen_with_fallbacks(system, user, temp, max_tokens, timeout=timeout, use_cache=use_cache,
+                              prefix=[_shared_prefix(draft, hits)], meter=meter)
     content = out["content"]
     if not content:
         return []
@@ -757,7 +1056,9 @@ DELIVER IN THE AUDIENCE SCHEMA ONLY."""
     return clean
 
 def generate_audience_personas(draft: str, hits: List[Dict[str,Any]], n: int = 5,
-                               temp: float = 0.2, max_tokens: int = 1200) -> List[Dict[str,str]]:
+                               temp: float = 0.2, max_tokens: int = 1200,
+                               timeout: Optional[float] = None, use_cache: bool = True,
+                               meter: Optional[UsageMeter] = None) -> List[Dict[str,str]]:
     """
     Two-pass generation:
       Pass 1: ask for EXACTLY n personas.
@@ -766,7 +1067,7 @@ def generate_audience_personas(draft: str, hits: List[Dict[str,Any]], n: int = 5
     """
     chosen: List[Dict[str,str]] = []
     # Pass 1
-    p1 = _generate_personas_once(draft, hits, target_n=n, exclude_names=[], temp=temp, max_tokens=max_tokens)
+    p1 = _generate_personas_once(draft, hits, target_n=n, exclude_names=[], temp=temp, max_tokens=max_tokens, timeout=timeout, use_cache=use_cache, meter=meter)
     seen = set()
     for p in p1:
         if p["name"].lower() in seen:
@@ -779,7 +1080,7 @@ def generate_audience_personas(draft: str, hits: List[Dict[str,Any]], n: int = 5
     if len(chosen) < n:
         missing = n - len(chosen)
         exclude = [p["name"] for p in chosen]
-        p2 = _generate_personas_once(draft, hits, target_n=missing, exclude_names=exclude, temp=temp, max_tokens=max_tokens)
+        p2 = _generate_personas_once(draft, hits, target_n=missing, exclude_names=exclude, temp=temp, max_tokens=max_tokens, timeout=timeout, use_cache=use_cache, meter=meter)
         for p in p2:
             if p["name"].lower() in seen:
                 continue
@@ -820,26 +1121,15 @@ def _fallback_personas(draft: str) -> List[Dict[str,str]]:
 # -----------------------------
 # Audience bot call
 # -----------------------------
-def call_audience_bot(bot: Dict[str,str], draft: str, hits: List[Dict[str,Any]], temp: float, max_tokens: int) -> Dict[str,Any]:
-    ctx = "\n\n".join(
-        f"[{i+1}] Source: {h['source']} (chunk {h['chunk_index']})\n{h['text']}"
-        for i, h in enumerate(hits)
-    ) if hits else "No context available."
-
-    system = f"""{bot['system'].strip()}
-
-{AUDIENCE_INSTR}
-"""
-    user = f"""ARTICLE DRAFT (for audience reaction):
----
-{draft}
----
-
-CONTEXT SNIPPETS (for evidence; cite like [3]):
-{ctx}
-"""
-
-    out = _gen_with_fallbacks(system, user, temp, max_tokens)
+def call_audience_bot(bot: Dict[str,str], draft: str, hits: List[Dict[str,Any]], temp: float, max_tokens: int,
+                      timeout: Optional[float] = None, use_cache: bool = True,
+                      meter: Optional[UsageMeter] = None) -> Dict[str,Any]:
+    # shared draft/context + AUDIENCE_INSTR form the cached prefix; only the persona varies
+    system = bot['system'].strip()
+    user = "React to the ARTICLE DRAFT above from your AUDIENCE ROLE, using the CONTEXT SNIPPETS as evidence, and follow the AUDIENCE REPORT RULES."
+
+    out = _gen_with_fallbacks(system, user, temp, max_tokens, timeout=timeout, use_cache=use_cache,
+                              prefix=[_shared_prefix(draft, hits), AUDIENCE_INSTR], meter=meter)
     content, used_model = out["content"], out["used_model"]
 
     if content is None:
@@ -909,10 +1199,43 @@ CONTEXT SNIPPETS (for evidence; cite like [3]):
         "likely_comment": data.get("likely_comment",""),
         "suggestions_to_journalist": _aud_sug(data.get("suggestions_to_journalist")),
         "citations": [int(i) for i in _to_list(data.get("citations")) if str(i).isdigit()],
-        "_model": used_model
+        "_model": used_model,
+        "_cached": out["cached"],
     }
     return res
 
+# -----------------------------
+# Fallbacks when a bot call raises or times out
+# -----------------------------
+def _editorial_fallback(e: BaseException) -> Dict[str,Any]:
+    return {
+        "summary": "Bot failed to generate.",
+        "key_points": [],
+        "suggestions": [],
+        "risks": [],
+        "ratings": {"clarity": 5, "accuracy": 5, "engagement": 5, "novelty": 5, "risk": 5},
+        "headline_suggestions": [],
+        "citations": [],
+        "next_actions": ["Retry or check server logs."],
+        "_model": "n/a",
+        "_error": f"{type(e).__name__}: {e}",
+    }
+
+def _audience_fallback(e: BaseException) -> Dict[str,Any]:
+    return {
+        "persona_takeaway": "Audience bot failed to generate.",
+        "stance": "mixed",
+        "positives": [],
+        "concerns": [],
+        "questions_for_reporter": [],
+        "scores": {"trust": 5, "relevance": 5, "share_intent": 5},
+        "likely_comment": "",
+        "suggestions_to_journalist": [],
+        "citations": [],
+        "_model": "n/a",
+        "_error": f"{type(e).__name__}: {e}",
+    }
+
 # -----------------------------
 # Aggregations
 # -----------------------------
@@ -1062,7 +1385,34 @@ def sample_draft():
 # -----------------------------
 @app.get("/health")
 def health():
-    return jsonify({"ok": True, "time": datetime.utcnow().isoformat()+"Z"})
+    return jsonify({
+        "ok": True,
+        "time": datetime.utcnow().isoformat()+"Z",
+        "index": INDEX.stats(),
+        "chunking": CHUNKER.describe(),
+        "embed_cache": EMB_CACHE.stats() if EMB_CACHE else None,
+        "response_cache": RESP_CACHE.stats() if RESP_CACHE else None,
+        "models": {"candidates": MODEL_FALLBACKS, "breakers": ROUTER.snapshot()},
+        "governor": GOVERNOR.stats(),
+        "usage": USAGE_TOTAL.summary(),
+        "jobs": JOBS.stats(),
+        "watcher": WATCHER.stats() if WATCHER else None,
+    })
+
+metrics.register_gauge("echo_index_chunks", "Chunks in the FAISS index.", lambda: [({"kind": INDEX.kind}, len(INDEX))])
+metrics.register_gauge("echo_index_tombstones", "Deleted rows awaiting compaction.",
+                       lambda: [({}, INDEX.stats()["tombstones"])])
+metrics.register_gauge("echo_governor_queue_depth", "Model calls waiting at the rate governor.",
+                       lambda: [({}, GOVERNOR.stats()["queue_depth"])])
+metrics.register_gauge("echo_model_breaker_open", "1 if the model's circuit breaker is open.",
+                       lambda: [({"model": m}, b["state"] == "open") for m, b in ROUTER.snapshot().items()])
+metrics.register_gauge("echo_jobs", "Background jobs by status.",
+                       lambda: [({"status": st}, n) for st, n in JOBS.stats().items() if st not in ("workers", "max_queued")])
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition of stage/model latency histograms, token counters and gauges."""
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
 
 @app.get("/bots")
 def bots():
@@ -1072,8 +1422,9 @@ def bots():
 def seed():
     paths = write_seed_files()
     # reset index/meta for clean demo
-    if os.path.exists(INDEX_PATH): os.remove(INDEX_PATH)
-    if os.path.exists(META_PATH): os.remove(META_PATH)
+    INDEX.reset()
+    if WATCHER:
+        WATCHER.forget()  # the watched folders are re-ingested into the fresh index
     return jsonify(_build_index_from_paths(paths))
 
 @app.post("/ingest")
@@ -1083,102 +1434,180 @@ def ingest():
     paths = glob.glob(glob_pattern, recursive=True)
     if not paths:
         return jsonify({"ok": False, "msg": "No files matched.", "ingested_chunks": 0})
-    return jsonify(_build_index_from_paths(paths))
+    batch_size = int(body["batch_size"]) if body.get("batch_size") else None
+    workers = int(body["workers"]) if body.get("workers") else None
+    return jsonify(_build_index_from_paths(paths, batch_size=batch_size, workers=workers))
 
 @app.post("/ingest/upload")
 def ingest_upload():
+    """Index one uploaded file. With form field replace=1 it replaces an earlier upload of the same name."""
     if "file" not in request.files:
         return jsonify({"ok": False, "msg": "No file provided"}), 400
     file = request.files["file"]
     filename = file.filename or "upload"
     content = file.read()
-    ext = os.path.splitext(filename)[1].lower()
-
-    index = _load_faiss()
-    new_meta = []
-    add_vecs: List[np.ndarray] = []
-    total_chunks = 0
-    ingested_docs = 0
-
-    if ext == ".json":
-        try:
-            obj = json.loads(content.decode("utf-8", errors="ignore"))
-        except Exception:
-            return jsonify({"ok": False, "msg": "Invalid JSON"}), 400
-        docs = _extract_texts_from_json_obj(obj, filename)
-        if not docs:
-            return jsonify({"ok": False, "msg": "No usable texts in JSON"}), 400
-        for src_label, text in docs:
-            chunks = _chunk(text)
-            if not chunks: 
-                continue
-            embs = embedder.encode(chunks, convert_to_numpy=True)
-            embs = _normalize(embs).astype("float32")
-            add_vecs.append(embs)
-            for i, ch in enumerate(chunks):
-                new_meta.append({
-                    "id": _hash_id(f"{src_label}|{i}|{len(ch)}"),
-                    "source": src_label,
-                    "chunk_index": i,
-                    "text": ch
-                })
-            total_chunks += len(chunks)
-            ingested_docs += 1
-    else:
-        # txt/md/pdf and other plain text
-        text = ""
-        try:
-            text = content.decode("utf-8", errors="ignore")
-        except Exception:
-            try:
-                pdf = PdfReader(io.BytesIO(content))
-                text = "\n\n".join([p.extract_text() or "" for p in pdf.pages])
-            except Exception:
-                return jsonify({"ok": False, "msg": "Unsupported file"}), 400
-
-        chunks = _chunk(text)
-        if not chunks:
-            return jsonify({"ok": False, "msg": "No text extracted."}), 400
-
-        embs = embedder.encode(chunks, convert_to_numpy=True)
-        embs = _normalize(embs).astype("float32")
-        add_vecs.append(embs)
-
-        for i, ch in enumerate(chunks):
-            new_meta.append({
-                "id": _hash_id(f"{filename}|{i}|{len(ch)}"),
-                "source": filename,
-                "chunk_index": i,
-                "text": ch
-            })
-        total_chunks = len(chunks)
-        ingested_docs = 1
 
-    if not new_meta:
+    try:
+        docs = _extract_texts_from_upload(filename, content)
+        first = next(docs, None)
+    except ValueError as e:
+        return jsonify({"ok": False, "msg": str(e)}), 400
+    if first is None:
+        is_json = os.path.splitext(filename)[1].lower() in JSON_EXTS + JSONL_EXTS
+        msg = "No usable texts in JSON" if is_json else "No text extracted."
+        return jsonify({"ok": False, "msg": msg}), 400
+
+    docs = itertools.chain([first], docs)
+    replace = _flag(request.form.get("replace"), False)
+    stats = _replace_docs(docs, *_source_labels(filename)) if replace else _ingest_docs(docs)
+    removed = stats.get("removed_chunks", 0)
+
+    if not stats["ingested_chunks"]:
+        if removed:
+            return jsonify({"ok": True, "file": filename, "docs": 0, "chunks": 0,
+                            "skipped_chunks": stats["skipped_chunks"], "removed_chunks": removed})
+        if stats["skipped_chunks"]:
+            return jsonify({"ok": True, "file": filename, "docs": 0, "chunks": 0,
+                            "skipped_chunks": stats["skipped_chunks"], "msg": "Already indexed."})
         return jsonify({"ok": False, "msg": "Nothing to index"}), 400
 
-    add_mat = np.vstack(add_vecs).astype("float32")
-    index.add(add_mat)
-    _save_faiss(index)
-    _append_meta(new_meta)
+    out = {"ok": True, "file": filename, "docs": stats["ingested_docs"], "chunks": stats["ingested_chunks"],
+           "skipped_chunks": stats["skipped_chunks"]}
+    if replace:
+        out["removed_chunks"] = removed
+    return jsonify(out)
 
-    return jsonify({"ok": True, "file": filename, "docs": ingested_docs, "chunks": total_chunks})
+@app.post("/index/delete")
+def index_delete():
+    """
+    Delete chunks by {"ids": [...]}, {"source": label} (a JSON corpus's
+    "name.json::..." labels go with "name.json") or {"path": file} (every
+    label ingesting that file produced).
+    """
+    body = request.get_json(silent=True) or {}
+    if body.get("ids"):
+        n = INDEX.delete_ids([str(i) for i in body["ids"]])
+    elif body.get("source"):
+        src = str(body["source"])
+        n = INDEX.delete_sources([src], [src + "::"])
+    elif body.get("path"):
+        n = INDEX.delete_sources(*_source_labels(str(body["path"])))
+    else:
+        return jsonify({"ok": False, "msg": "Provide 'ids', 'source' or 'path'"}), 400
+    return jsonify({"ok": True, "deleted_chunks": n, "index": INDEX.stats()})
+
+@app.post("/index/update")
+def index_update():
+    """Re-ingest a file from disk, replacing its previously indexed chunks (removes them if it is gone)."""
+    body = request.get_json(silent=True) or {}
+    path = str(body.get("path") or "")
+    if not path:
+        return jsonify({"ok": False, "msg": "Missing 'path'"}), 400
+    if not os.path.isfile(path):
+        n = INDEX.delete_sources(*_source_labels(path))
+        return jsonify({"ok": True, "path": path, "ingested_chunks": 0, "removed_chunks": n})
+    stats = _replace_path(path)
+    return jsonify({"ok": True, "path": path, "ingested_chunks": stats["ingested_chunks"],
+                    "skipped_chunks": stats["skipped_chunks"], "removed_chunks": stats["removed_chunks"]})
+
+@app.post("/index/compact")
+def index_compact():
+    """Rebuild the index without its deleted rows, in the background (it also runs on its own past COMPACT_DEAD_RATIO)."""
+    started = INDEX.compact_async()
+    return jsonify({"ok": True, "started": started, "index": INDEX.stats()}), 202
+
+# ---------- Auto-ingestion of the docs and community folders ----------
+WATCH_MANIFEST_PATH = os.getenv("WATCH_MANIFEST_PATH", os.path.join(INDEX_DIR, "watch_manifest.sqlite"))
+# Files under BASE_DATA_DIR that count as corpus: the scraped community_*.txt/json,
+# not the artifact drafts or the rag_/llmready_/response_ analysis outputs.
+WATCH_COMMUNITY_PATTERNS = [p.strip() for p in os.getenv("WATCH_COMMUNITY_PATTERNS", "community_*").split(",") if p.strip()]
+
+def _unindex_path(path: str):
+    INDEX.delete_sources(*_source_labels(path))
+
+# an edited file replaces its old chunks; a deleted one takes them with it
+WATCHER = watcher.DirWatcher(
+    WATCH_MANIFEST_PATH,
+    [(DATA_DIR, ["*"]), (BASE_DATA_DIR, WATCH_COMMUNITY_PATTERNS)],
+    _replace_path,
+    remove_fn=_unindex_path,
+) if watcher.WATCH_ENABLED else None
+if WATCHER:
+    WATCHER.start()
+
+metrics.register_gauge("echo_watch_files", "Files tracked by the ingestion watcher, and files still settling.",
+                       lambda: [({"state": "tracked"}, WATCHER.stats()["tracked_files"]),
+                                ({"state": "pending"}, len(WATCHER.stats()["pending"]))] if WATCHER else [])
+
+@app.get("/ingest/watch")
+def ingest_watch():
+    """Watcher stats plus the most recently ingested files (?status=failed for errors only)."""
+    if not WATCHER:
+        return jsonify({"ok": False, "msg": "Watcher disabled (WATCH_ENABLED=0)"}), 404
+    limit = int(request.args.get("limit", 50))
+    return jsonify({"ok": True, "watcher": WATCHER.stats(),
+                    "files": WATCHER.files(limit=limit, status=request.args.get("status"))})
+
+@app.post("/ingest/watch/scan")
+def ingest_watch_scan():
+    """Ask the watcher to scan now; ingestion still happens in the background."""
+    if not WATCHER:
+        return jsonify({"ok": False, "msg": "Watcher disabled (WATCH_ENABLED=0)"}), 404
+    WATCHER.wake()
+    return jsonify({"ok": True, "msg": "Scan scheduled"}), 202
+
+@app.post("/index/rebuild")
+def index_rebuild():
+    body = request.get_json(silent=True) or {}
+    kind = (body.get("kind") or "").lower()
+    try:
+        INDEX.rebuild(kind)
+    except ValueError as e:
+        return jsonify({"ok": False, "msg": str(e)}), 400
+    return jsonify({"ok": True, "kind": kind, "chunks": len(INDEX)})
 
 @app.post("/search")
 def search():
     body = request.get_json(silent=True) or {}
     query = body.get("query", "")
     top_k = int(body.get("top_k", 6))
-    return jsonify({"results": retrieve(query, top_k)})
+    nprobe = int(body["nprobe"]) if body.get("nprobe") else None
+    ef_search = int(body["ef_search"]) if body.get("ef_search") else None
+    return jsonify({"results": retrieve(query, top_k, nprobe=nprobe, ef_search=ef_search)})
 
-@app.post("/analyze")
-def analyze():
-    print('analyze called')
+@app.post("/search/batch")
+def search_batch():
     body = request.get_json(silent=True) or {}
+    queries = body.get("queries")
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        return jsonify({"ok": False, "msg": "'queries' must be a list of strings"}), 400
+    top_k = int(body.get("top_k", 6))
+    nprobe = int(body["nprobe"]) if body.get("nprobe") else None
+    ef_search = int(body["ef_search"]) if body.get("ef_search") else None
+    results = retrieve_many(queries, top_k, nprobe=nprobe, ef_search=ef_search)
+    return jsonify({"results": [{"query": q, "results": r} for q, r in zip(queries, results)]})
+
+# -----------------------------
+# Analysis pipeline (shared by /analyze and /analyze/stream)
+# -----------------------------
+def run_analysis(body: Dict[str, Any], emit: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Full /analyze run for a request body. `emit(event, data)` is called as each
+    stage settles: retrieval, personas, per_bot (one per bot), per_audience
+    (one per persona), rollups, export and finally report (the full payload).
+    Unless body["incremental"] is false, sections whose inputs match the
+    previous rag_{j}.json (or body["base_artifact"]) are reused, not re-run.
+    Stage timings are collected into a `timings` block. Raises ValueError on bad input.
+    """
+    with metrics.span("analyze"), metrics.collect() as timings:
+        return _run_analysis(body, emit or (lambda event, data: None), timings)
+
+def _run_analysis(body: Dict[str, Any], emit: Callable[[str, Dict[str, Any]], None],
+                  timings: metrics.Timings) -> Dict[str, Any]:
     draft = (body.get("draft") or "").strip()
     if not draft:
         print('missing draft')
-        return jsonify({"ok": False, "msg": "Missing 'draft'"}), 400
+        raise ValueError("Missing 'draft'")
 
     # where to save rag_i.json
     community_id = (body.get("communityId") or body.get("community_id") or "").strip()
@@ -1212,63 +1641,137 @@ def analyze():
     temperature = float(body.get("temperature", 0.3))
     max_tokens = int(body.get("max_tokens", 900))
 
-    # retrieval
-    retrieval_query = f"Key claims and entities in this draft: {draft[:2000]}"
-    hits = retrieve(retrieval_query, top_k)
+    use_cache = _flag(body.get("use_cache"), True)  # false = always hit the API (fresh samples)
 
-    # audience personas
-    audience_personas = generate_audience_personas(draft, hits, n=5, temp=0.2, max_tokens=1200)
+    # what the previous run of this community can contribute (nothing when fresh samples were asked for)
+    prev = None
+    if _flag(body.get("incremental"), True) and use_cache:
+        prev = incremental.load_previous(community_dir, artifact_idx, body.get("base_artifact"))
+    reuse = incremental.Reuse(prev[0] if prev else None, prev[1] if prev else None, draft)
 
+    # retrieval
+    retrieval_query = f"Key claims and entities in this draft: {draft[:2000]}"
+    retrieval_mode = body.get("retrieval_mode", "claims")
+    retrieval_sig = incremental.fingerprint(retrieval_mode, top_k, len(INDEX), INDEX.kind)
+    # only queries whose text changed since the previous run are searched again
+    cached_hits = reuse.query_hits(retrieval_sig)
+    with metrics.span("retrieval", mode=retrieval_mode):
+        if retrieval_mode == "single":
+            retrieval_queries = [retrieval_query]
+            per_query = _retrieve_cached(retrieval_queries, top_k, cached_hits)
+            hits = per_query[0]
+        else:
+            hits, retrieval_queries, per_query = retrieve_for_draft(draft, top_k, retrieval_query, cached_hits)
+    reuse.mark_queries(sum(incremental.fingerprint(q) in cached_hits for q in retrieval_queries),
+                       len(retrieval_queries))
+    retrieval_block = {
+        "query_used": retrieval_query,
+        "claim_queries": retrieval_queries[1:],
+        "snippets": [
+            {
+                "idx": j + 1,
+                "source": h["source"],
+                "chunk_index": h["chunk_index"],
+                "score": h["score"],
+                "text": h["text"],
+                **({"pages": h["pages"]} if "pages" in h else {}),
+            }
+            for j, h in enumerate(hits)
+        ],
+    }
+    emit("retrieval", {**retrieval_block, "reused": reuse.sections["retrieval"] == "reused"})
+    snippets_fp = incremental.snippets_fingerprint(hits)
+
+    # Persona generation runs first, on its own: its call writes the shared
+    # draft+context prompt prefix to the API cache, so the editorial and
+    # audience bots that then fan out together read that prefix from cache.
+    max_concurrency = int(body.get("max_concurrency", fanout.BOT_MAX_CONCURRENCY))
+    call_timeout = float(body.get("call_timeout", fanout.BOT_CALL_TIMEOUT))
+    meter = UsageMeter()
+    call_opts = {"timeout": call_timeout, "use_cache": use_cache, "meter": meter}
+
+    fps: Dict[str, Any] = {"per_bot": {}, "per_audience": {}}
+    fps["personas"] = incremental.fingerprint("personas", snippets_fp, 5, 0.2, 1200, MODEL_FALLBACKS, PROMPT_LAYOUT)
+    audience_personas = reuse.personas(fps["personas"])
+    reuse.mark("personas", None, audience_personas is not None)
+    if audience_personas is None:
+        with metrics.span("personas"):
+            audience_personas = fanout.run_bounded(
+                [("personas", lambda: generate_audience_personas(draft, hits, n=5, temp=0.2, max_tokens=1200, **call_opts))],
+                lambda key, e: _fallback_personas(draft),
+                timeout=call_timeout,
+            )["personas"]
+    emit("personas", {"reused": reuse.sections["personas"] == "reused", "audience_bots": [
+        {"id": a["id"], "name": a["name"], "why_included": a.get("why_included", "")} for a in audience_personas
+    ]})
     print(f'generated {len(audience_personas)} audience personas')
 
-    # editorial bots
-    per_bot = {}
+    def _editorial_task(bot_id: str, bot: Dict[str,str]):
+        def _run():
+            with metrics.span("editorial_bot", id=bot_id):
+                return call_bot({"id": bot_id, **bot}, draft, hits, temperature, max_tokens, **call_opts)
+        return _run
+
+    def _audience_task(a: Dict[str,str]):
+        def _run():
+            with metrics.span("audience_bot", id=a["id"]):
+                return call_audience_bot(a, draft, hits, temperature, max_tokens, **call_opts)
+        return _run
+
+    # editorial + audience bots, minus whatever the previous run already answered
+    tasks = []
+    per_bot: Dict[str, Any] = {}
+    per_audience: Dict[str, Any] = {}
     for b_idx, bot in enumerate(BOTS):
         bot_id = f"bot{str(b_idx+1).zfill(2)}"
-        try:
-            per_bot[bot_id] = call_bot({"id": bot_id, **bot}, draft, hits, temperature, max_tokens)
-        except Exception as e:
-            per_bot[bot_id] = {
-                "summary": "Bot failed to generate.",
-                "key_points": [],
-                "suggestions": [],
-                "risks": [],
-                "ratings": {"clarity": 5, "accuracy": 5, "engagement": 5, "novelty": 5, "risk": 5},
-                "headline_suggestions": [],
-                "citations": [],
-                "next_actions": ["Retry or check server logs."],
-                "_model": "n/a",
-                "_error": f"{type(e).__name__}: {e}",
-            }
+        fps["per_bot"][bot_id] = incremental.fingerprint(bot["system"], RAG_INSTR, snippets_fp, temperature, max_tokens,
+                                                         MODEL_FALLBACKS, PROMPT_LAYOUT)
+        prev_out = reuse.output("per_bot", bot_id, fps["per_bot"][bot_id])
+        reuse.mark("per_bot", bot_id, prev_out is not None)
+        if prev_out is not None:
+            per_bot[bot_id] = prev_out
+            emit("per_bot", {"id": bot_id, "result": prev_out, "reused": True})
+        else:
+            tasks.append((bot_id, _editorial_task(bot_id, bot)))
+    for a in audience_personas:
+        fps["per_audience"][a["id"]] = incremental.fingerprint(a, AUDIENCE_INSTR, snippets_fp, temperature, max_tokens,
+                                                           MODEL_FALLBACKS, PROMPT_LAYOUT)
+        prev_out = reuse.output("per_audience", a["id"], fps["per_audience"][a["id"]])
+        reuse.mark("per_audience", a["id"], prev_out is not None)
+        if prev_out is not None:
+            per_audience[a["id"]] = prev_out
+            emit("per_audience", {"id": a["id"], "result": prev_out, "reused": True})
+        else:
+            tasks.append((a["id"], _audience_task(a)))
 
-    print(f'completed editorial bot calls for {len(per_bot)} bots')
+    editorial_ids = set(fps["per_bot"])
 
-    # audience bots
-    per_audience = {}
-    for a in audience_personas:
-        try:
-            per_audience[a["id"]] = call_audience_bot(a, draft, hits, temperature, max_tokens)
-        except Exception as e:
-            per_audience[a["id"]] = {
-                "persona_takeaway": "Audience bot failed to generate.",
-                "stance": "mixed",
-                "positives": [],
-                "concerns": [],
-                "questions_for_reporter": [],
-                "scores": {"trust": 5, "relevance": 5, "share_intent": 5},
-                "likely_comment": "",
-                "suggestions_to_journalist": [],
-                "citations": [],
-                "_model": "n/a",
-                "_error": f"{type(e).__name__}: {e}",
-            }
+    def _fallback(key: str, e: BaseException):
+        return _editorial_fallback(e) if key in editorial_ids else _audience_fallback(e)
+
+    def _done(key: str, result: Any):
+        emit("per_bot" if key in editorial_ids else "per_audience", {"id": key, "result": result, "reused": False})
+
+    fresh = fanout.run_bounded(tasks, _fallback, max_concurrency=max_concurrency, timeout=call_timeout, on_done=_done)
+    per_bot = {bot_id: per_bot.get(bot_id, fresh.get(bot_id)) for bot_id in fps["per_bot"]}
+    per_audience = {a["id"]: per_audience.get(a["id"], fresh.get(a["id"])) for a in audience_personas}
 
+    # failed calls left placeholders: leave their fingerprints out so the next run retries them
+    for section, results in (("per_bot", per_bot), ("per_audience", per_audience)):
+        for key, result in results.items():
+            if not incremental.usable(result):
+                fps[section].pop(key, None)
+    if {a["id"] for a in audience_personas} & {a["id"] for a in _fallback_personas(draft)}:
+        fps.pop("personas")  # padded with the static defaults after a failed persona call
+
+    print(f'completed editorial bot calls for {len(per_bot)} bots')
     print(f'completed audience bot calls for {len(per_audience)} personas')
 
     # rollups
-    editorial_rollup = aggregate_editorial(per_bot)
-    headline_pool = (per_bot.get(HEADLINE_BOT_ID, {}) or {}).get("headline_suggestions", [])[:12]
-    audience_rollup = aggregate_audience(per_audience)
+    with metrics.span("rollups"):
+        editorial_rollup = aggregate_editorial(per_bot)
+        headline_pool = (per_bot.get(HEADLINE_BOT_ID, {}) or {}).get("headline_suggestions", [])[:12]
+        audience_rollup = aggregate_audience(per_audience)
 
     # response (what the client uses)
     response_payload = {
@@ -1277,19 +1780,7 @@ def analyze():
             {"id": a["id"], "name": a["name"], "why_included": a.get("why_included", "")}
             for a in audience_personas
         ],
-        "retrieval": {
-            "query_used": retrieval_query,
-            "snippets": [
-                {
-                    "idx": j + 1,
-                    "source": h["source"],
-                    "chunk_index": h["chunk_index"],
-                    "score": h["score"],
-                    "text": h["text"],
-                }
-                for j, h in enumerate(hits)
-            ],
-        },
+        "retrieval": retrieval_block,
         "per_bot": per_bot,
         "per_audience": per_audience,
         "report": {
@@ -1305,14 +1796,21 @@ def analyze():
             "top_concerns": audience_rollup["top_concerns"],
             "top_questions": audience_rollup["top_questions"],
         },
+        "incremental": reuse.summary(),
+        "usage": meter.summary(),
     }
 
+    emit("rollups", {"report": response_payload["report"], "audience_report": response_payload["audience_report"]})
+
     # on-disk export
     export_payload = {
         "meta": {
             "timestamp_utc": datetime.utcnow().isoformat() + "Z",
-            "params": {"top_k": top_k, "temperature": temperature, "max_tokens": max_tokens},
+            "params": {"top_k": top_k, "temperature": temperature, "max_tokens": max_tokens,
+                       "max_concurrency": max_concurrency, "call_timeout": call_timeout,
+                       "use_cache": use_cache},
             "models": {"fallbacks": MODEL_FALLBACKS},
+            "usage": response_payload["usage"],
         },
         "input": {"draft": draft, "retrieval_query": retrieval_query},
         "retrieval": response_payload["retrieval"],
@@ -1327,22 +1825,138 @@ def analyze():
             "per_audience": per_audience,
             "rollup": audience_rollup,
         },
+        "incremental": {**reuse.summary(), "retrieval_sig": retrieval_sig, "fingerprints": fps,
+                        "query_hits": incremental.pack_query_hits(retrieval_queries, per_query)},
+        "timings": timings.summary(),
     }
 
-    export_file_path = save_run_json(export_payload, community_dir, rag_filename)
+    with metrics.span("export_write"):
+        export_file_path = save_run_json(export_payload, community_dir, rag_filename)
     print(f'Wrote RAG analysis to {export_file_path}')
+    emit("export", {"export_file": export_file_path, "artifact_number": artifact_idx, "community_id": community_id})
+
+    with metrics.span("echo_extractor"):
+        echo_data_extractor.extract_and_run_echo(os.path.abspath(community_dir), artifact_idx, analysis=export_payload)
 
-    echo_data_extractor.extract_and_run_echo(community_dir, artifact_idx)
+    # rewrite with the complete timings (export + echo included) now that they're known
+    export_payload["timings"] = timings.summary()
+    save_run_json(export_payload, community_dir, rag_filename)
     
     response_payload.update({
+        "timings": export_payload["timings"],
         "ok": True,
         "export_file": export_file_path,
         "artifact_number": artifact_idx,
         "community_id": community_id,
     })
-    return jsonify(response_payload)
+    emit("report", response_payload)
+    return response_payload
+
 
 
+@app.post("/analyze")
+def analyze():
+    print('analyze called')
+    body = request.get_json(silent=True) or {}
+    try:
+        return jsonify(run_analysis(body))
+    except ValueError as e:
+        return jsonify({"ok": False, "msg": str(e)}), 400
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/analyze/stream")
+def analyze_stream():
+    """Same as /analyze, but streams each stage as a Server-Sent Event while it runs."""
+    body = request.get_json(silent=True) or {}
+    if not (body.get("draft") or "").strip():
+        return jsonify({"ok": False, "msg": "Missing 'draft'"}), 400
+
+    events: "queue.Queue[Optional[Tuple[str, Any]]]" = queue.Queue()
+
+    def _worker():
+        try:
+            run_analysis(body, emit=lambda event, data: events.put((event, data)))
+        except Exception as e:
+            events.put(("error", {"ok": False, "msg": f"{type(e).__name__}: {e}"}))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=_worker, name="analyze-stream", daemon=True).start()
+
+    def _stream():
+        while True:
+            try:
+                item = events.get(timeout=15)
+            except queue.Empty:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                return
+            yield _sse(*item)
+
+    return Response(_stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# -----------------------------
+# Routes: background analysis jobs
+# -----------------------------
+# run_analysis on a local worker pool; the queue is persisted in JOBS_DB_PATH
+JOBS = JobQueue(JOBS_DB_PATH, run_analysis)
+JOBS.start()
+
+@app.post("/jobs/analyze")
+def jobs_submit():
+    """Queue an /analyze run; returns 202 with the job id to poll."""
+    body = request.get_json(silent=True) or {}
+    if not (body.get("draft") or "").strip():
+        return jsonify({"ok": False, "msg": "Missing 'draft'"}), 400
+    try:
+        job_id = JOBS.submit(body)
+    except OverflowError as e:
+        return jsonify({"ok": False, "msg": str(e)}), 429
+    return jsonify({
+        "ok": True,
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+        "result_url": f"/jobs/{job_id}/result",
+    }), 202
+
+@app.get("/jobs")
+def jobs_list():
+    limit = int(request.args.get("limit", 50))
+    return jsonify({"ok": True, "jobs": JOBS.list(limit=limit, status=request.args.get("status"))})
+
+@app.get("/jobs/<job_id>")
+def jobs_status(job_id: str):
+    """Status plus the partial results gathered so far (retrieval, personas, per_bot, ...)."""
+    job = JOBS.get(job_id)
+    if job is None:
+        return jsonify({"ok": False, "msg": "Unknown job"}), 404
+    return jsonify({"ok": True, "job": job})
+
+@app.get("/jobs/<job_id>/result")
+def jobs_result(job_id: str):
+    """The final /analyze payload once done; 202 while pending, 409 if failed or cancelled."""
+    job = JOBS.get(job_id, with_result=True)
+    if job is None:
+        return jsonify({"ok": False, "msg": "Unknown job"}), 404
+    if job["status"] == "done":
+        return jsonify(job["result"])
+    if job["status"] in ("queued", "running"):
+        return jsonify({"ok": False, "status": job["status"], "msg": "Job not finished"}), 202
+    return jsonify({"ok": False, "status": job["status"], "msg": job["error"]}), 409
+
+@app.post("/jobs/<job_id>/cancel")
+def jobs_cancel(job_id: str):
+    status = JOBS.cancel(job_id)
+    if status is None:
+        return jsonify({"ok": False, "msg": "Unknown job"}), 404
+    return jsonify({"ok": True, "job_id": job_id, "status": status})
+
 
 if __name__ == "__main__":
     print(f"[Anthropic] CLAUDE_MODEL (env): {os.getenv('CLAUDE_MODEL') or '(none)'}")
@@ -0,0 +1,80 @@
+"""
+Recall@k vs. latency of each ANN backend against the exact Flat baseline.
+
+    cd backend/rag && python -m bench.bench_ann --n 200000 --dim 384 --queries 500
+"""
+import argparse, json, time
+
+import numpy as np
+
+import ann
+
+
+def _clustered(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    # embeddings of real text cluster by topic; uniform noise would flatter IVF less than reality
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    x = centers[rng.integers(0, clusters, n)] + 0.35 * rng.standard_normal((n, dim)).astype("float32")
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def _timed_search(index, q: np.ndarray, k: int):
+    lat = []
+    out = np.empty((len(q), k), dtype="int64")
+    for i in range(len(q)):
+        t0 = time.perf_counter()
+        _, I = index.search(q[i:i+1], k)
+        lat.append((time.perf_counter() - t0) * 1000)
+        out[i] = I[0]
+    return out, lat
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=300)
+    ap.add_argument("--k", type=int, default=24, help="retrieve() asks for top_k*3")
+    ap.add_argument("--clusters", type=int, default=200)
+    ap.add_argument("--kinds", default="ivf_flat,ivf_pq,hnsw")
+    ap.add_argument("--out", help="write results JSON here")
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(0)
+    xb = _clustered(args.n, args.dim, args.clusters, rng)
+    xq = _clustered(args.queries, args.dim, args.clusters, rng)
+
+    flat = ann.build("flat", xb, args.dim)
+    truth, lat = _timed_search(flat, xq, args.k)
+    results = [{"kind": "flat", "param": None, "recall": 1.0, "build_s": 0.0,
+                "p50_ms": round(float(np.percentile(lat, 50)), 3), "p95_ms": round(float(np.percentile(lat, 95)), 3)}]
+
+    sweeps = {"ivf_flat": ("nprobe", [1, 4, 16, 64]), "ivf_pq": ("nprobe", [1, 4, 16, 64]),
+              "hnsw": ("ef_search", [16, 32, 64, 128])}
+    for kind in [k.strip() for k in args.kinds.split(",") if k.strip()]:
+        t0 = time.perf_counter()
+        index = ann.build(kind, xb, args.dim)
+        build_s = time.perf_counter() - t0
+        name, values = sweeps[kind]
+        for v in values:
+            ann.set_search_params(index, **{name: v})
+            found, lat = _timed_search(index, xq, args.k)
+            results.append({"kind": kind, "param": f"{name}={v}", "recall": round(_recall(found, truth), 4),
+                            "build_s": round(build_s, 2),
+                            "p50_ms": round(float(np.percentile(lat, 50)), 3),
+                            "p95_ms": round(float(np.percentile(lat, 95)), 3)})
+
+    print(f"{'kind':<9} {'param':<14} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8}")
+    for r in results:
+        print(f"{r['kind']:<9} {str(r['param'] or '-'):<14} {r['recall']:>10.4f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {r['build_s']:>8.2f}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
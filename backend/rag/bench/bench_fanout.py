@@ -0,0 +1,59 @@
+"""
+Wall-clock comparison of sequential vs. bounded-concurrency bot fan-out.
+
+    cd backend/rag && python -m bench.bench_fanout --latency 0.5 --bots 10 --audience 5
+"""
+import argparse, json, time
+
+import fanout
+from bench.stub_client import StubAnthropic
+
+
+def _call(client: StubAnthropic, system: str):
+    return client.messages.create(model="stub", system=system, max_tokens=900,
+                                  messages=[{"role": "user", "content": "draft"}])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--latency", type=float, default=0.5, help="mean stub latency per call (s)")
+    ap.add_argument("--jitter", type=float, default=0.1)
+    ap.add_argument("--failure-rate", type=float, default=0.0)
+    ap.add_argument("--bots", type=int, default=10)
+    ap.add_argument("--audience", type=int, default=5)
+    ap.add_argument("--max-concurrency", type=int, default=fanout.BOT_MAX_CONCURRENCY)
+    args = ap.parse_args()
+
+    systems = [f"editorial {i}" for i in range(args.bots)] + [f"AUDIENCE {i}" for i in range(args.audience)]
+
+    client = StubAnthropic(args.latency, args.jitter, args.failure_rate, seed=1)
+    t0 = time.perf_counter()
+    for s in systems:
+        try:
+            _call(client, s)
+        except Exception:
+            pass
+    sequential = time.perf_counter() - t0
+
+    client = StubAnthropic(args.latency, args.jitter, args.failure_rate, seed=1)
+    t0 = time.perf_counter()
+    out = fanout.run_bounded(
+        [(s, (lambda s=s: _call(client, s))) for s in systems],
+        lambda key, e: {"_error": str(e)},
+        max_concurrency=args.max_concurrency,
+    )
+    concurrent = time.perf_counter() - t0
+
+    print(json.dumps({
+        "calls": len(systems),
+        "max_concurrency": args.max_concurrency,
+        "peak_inflight": client.peak_inflight,
+        "fallbacks": sum(1 for v in out.values() if isinstance(v, dict) and "_error" in v),
+        "sequential_s": round(sequential, 3),
+        "concurrent_s": round(concurrent, 3),
+        "speedup": round(sequential / concurrent, 2) if concurrent else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+End-to-end offline benchmark: ingest -> retrieve -> analyze -> rollups -> Echo transform.
+
+Runs the real pipeline from app.py against a generated corpus, with
+StubAnthropic standing in for the model API (no network, no API cost).
+Everything lives in a scratch folder under bench/ that is removed afterwards.
+
+    cd backend/rag && python -m bench.bench_pipeline --docs 500 --analyses 10 --out bench_results.json
+    cd backend/rag && python -m bench.bench_pipeline --compare bench_results.json   # exit 1 on regression
+"""
+import argparse, json, os, platform, random, resource, shutil, sys, tempfile, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_TOPICS = {
+    "transit": "bus lane fare ridership route depot schedule commuter subway ticket transfer",
+    "housing": "rent zoning permit tenant landlord eviction density affordable mortgage lease",
+    "schools": "teacher enrollment budget classroom district curriculum principal tuition bus",
+    "health": "clinic hospital nurse insurance vaccine outbreak patient emergency wait doctor",
+    "budget": "tax levy deficit bond audit council spending revenue pension reserve vote",
+    "climate": "flood heat tree canopy stormwater emissions solar drought shoreline resilience",
+}
+_FILLER = "the a of to and in for on with said officials residents city county report data new plan".split()
+
+
+def _percentiles(xs: List[float]) -> Dict[str, Any]:
+    if not xs:
+        return {"n": 0}
+    a = np.asarray(xs) * 1000
+    return {"n": len(xs), "mean_ms": round(float(a.mean()), 2), "p50_ms": round(float(np.percentile(a, 50)), 2),
+            "p95_ms": round(float(np.percentile(a, 95)), 2), "p99_ms": round(float(np.percentile(a, 99)), 2),
+            "max_ms": round(float(a.max()), 2)}
+
+
+def _peak_rss_mb() -> float:
+    kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(kb / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)  # bytes on macOS, KiB on Linux
+
+
+def _doc(rng: random.Random, words: int) -> str:
+    topic = rng.choice(list(_TOPICS))
+    vocab = _TOPICS[topic].split()
+    out, sentence = [], []
+    for _ in range(words):
+        sentence.append(rng.choice(vocab) if rng.random() < 0.35 else rng.choice(_FILLER))
+        if len(sentence) >= rng.randint(8, 20):
+            out.append(" ".join(sentence).capitalize() + ".")
+            sentence = []
+    return f"{topic.title()} report\n\n" + " ".join(out)
+
+
+def _draft(rng: random.Random, sentences: int) -> str:
+    topics = rng.sample(list(_TOPICS), 2)
+    lines = []
+    for i in range(sentences):
+        vocab = _TOPICS[topics[i % 2]].split()
+        lines.append(f"The {rng.choice(vocab)} {rng.choice(vocab)} plan will change {rng.randint(2, 90)}% of "
+                     f"{rng.choice(vocab)} costs, officials said on day {i}.")
+    return "\n".join(lines)
+
+
+def _timed(fn: Callable[[], Any]) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return time.perf_counter() - t0
+
+
+def run(args) -> Dict[str, Any]:
+    # app reads its config from the environment at import time, so point every
+    # store at the scratch folder first (inside backend/rag, where the Echo path checks allow it)
+    scratch = tempfile.mkdtemp(prefix="run_", dir=BENCH_DIR)
+    os.environ.update({
+        "ANTHROPIC_API_KEY": os.environ.get("ANTHROPIC_API_KEY") or "bench",
+        "INDEX_DIR": os.path.join(scratch, "index"),
+        "BASE_DATA_DIR": os.path.join(scratch, "communities"),
+        "EXPORT_DIR": os.path.join(scratch, "exports"),
+        "RESPONSE_CACHE_MAX_MB": "0" if not args.response_cache else os.environ.get("RESPONSE_CACHE_MAX_MB", "256"),
+        "EMBED_CACHE_MAX_MB": "0" if not args.embed_cache else os.environ.get("EMBED_CACHE_MAX_MB", "1024"),
+        "WATCH_ENABLED": "0",  # the bench ingests its own corpus
+    })
+    if args.index_kind:
+        os.environ["INDEX_KIND"] = args.index_kind
+    try:
+        return _run(args, scratch)
+    finally:
+        if args.keep:
+            print(f"[bench] kept scratch data in {scratch}")
+        else:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+
+def _run(args, scratch: str) -> Dict[str, Any]:
+    sys.path.insert(0, os.path.dirname(BENCH_DIR))
+    t0 = time.perf_counter()
+    import app
+    from report import echo_data_extractor
+    from bench.stub_client import StubAnthropic
+    import_s = time.perf_counter() - t0
+
+    stub = StubAnthropic(args.latency, args.jitter, args.failure_rate, seed=args.seed)
+    app.anthropic = stub
+    rng = random.Random(args.seed)
+    results: Dict[str, Any] = {"import_s": round(import_s, 3), "rss_after_import_mb": _peak_rss_mb()}
+
+    # ---- corpus + ingest
+    corpus_dir = os.path.join(scratch, "corpus")
+    os.makedirs(corpus_dir)
+    paths = []
+    for i in range(args.docs):
+        p = os.path.join(corpus_dir, f"doc_{i:06d}.txt")
+        with open(p, "w", encoding="utf-8") as f:
+            f.write(_doc(rng, args.doc_words))
+        paths.append(p)
+    t = time.perf_counter()
+    ingest = app._build_index_from_paths(paths)
+    ingest_s = time.perf_counter() - t
+    results["ingest"] = {
+        "docs": args.docs, "chunks": ingest.get("ingested_chunks", 0), "elapsed_s": round(ingest_s, 3),
+        "docs_per_s": round(args.docs / ingest_s, 1) if ingest_s else None,
+        "chunks_per_s": round(ingest.get("ingested_chunks", 0) / ingest_s, 1) if ingest_s else None,
+        "index_kind": app.INDEX.kind, "peak_rss_mb": _peak_rss_mb(),
+    }
+    print(f"[bench] ingest: {results['ingest']}")
+
+    # ---- retrieval
+    queries = [_draft(rng, 1) for _ in range(args.queries)]
+    lat = [_timed(lambda q=q: app.retrieve(q, k=args.top_k)) for q in queries]
+    t = time.perf_counter()
+    app.retrieve_many(queries, k=args.top_k)
+    batch_s = time.perf_counter() - t
+    results["retrieve"] = {**_percentiles(lat), "qps": round(len(lat) / sum(lat), 1) if lat else None,
+                           "batched_qps": round(len(queries) / batch_s, 1) if batch_s else None}
+    print(f"[bench] retrieve: {results['retrieve']}")
+
+    # ---- claim-window retrieval for a whole draft vs the single head query it replaces
+    draft_rng = random.Random(args.seed + 1)  # own stream, so the analyze drafts below don't change
+    single, claims = [], []
+    for d in [_draft(draft_rng, args.draft_sentences) for _ in range(max(5, args.queries // 10))]:
+        head = f"Key claims and entities in this draft: {d[:2000]}"
+        single.append(_timed(lambda: app.retrieve(head, args.top_k)))
+        claims.append(_timed(lambda: app.retrieve_for_draft(d, args.top_k, head)))
+    added = [c - s for c, s in zip(claims, single)]
+    added_p95 = _percentiles(added)["p95_ms"]
+    results["retrieve_for_draft"] = {
+        **_percentiles(claims), "single_p95_ms": _percentiles(single)["p95_ms"],
+        "added_p50_ms": _percentiles(added)["p50_ms"], "added_p95_ms": added_p95,
+        "budget_ms": args.draft_budget_ms, "within_budget": added_p95 <= args.draft_budget_ms,
+    }
+    print(f"[bench] retrieve_for_draft: {results['retrieve_for_draft']}")
+
+    # ---- analyze (the Echo synthesis call is live-network only; stub it and time the rest of the step)
+    echo_lat: List[float] = []
+    echo_lock = threading.Lock()
+    echo_api = echo_data_extractor.echo_api_script
+    echo_api.synthesize = lambda echo_data, timeout=None: {"executive_summary": {}, "key_insights": {}}
+    run_echo = echo_data_extractor.extract_and_run_echo
+
+    def _echo_timed(folder: str, i: int, analysis=None):
+        t0 = time.perf_counter()
+        out = run_echo(folder, i, analysis=analysis)
+        with echo_lock:
+            echo_lat.append(time.perf_counter() - t0)
+        return out
+
+    app.echo_data_extractor.extract_and_run_echo = _echo_timed
+
+    drafts = [_draft(rng, args.draft_sentences) for _ in range(args.analyses)]
+    stage_ms: Dict[str, List[float]] = {}
+    analyze_lat: List[float] = []
+    outputs: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+
+    def _one(i: int):
+        body = {"draft": drafts[i], "communityId": f"bench_{i % max(1, args.communities)}", "incremental": False,
+                "top_k": args.top_k, "max_concurrency": args.max_concurrency}
+        t0 = time.perf_counter()
+        out = app.run_analysis(body)
+        dt = time.perf_counter() - t0
+        with lock:
+            analyze_lat.append(dt)
+            outputs.append(out)
+            for stage, st in out["timings"]["stages"].items():
+                stage_ms.setdefault(stage, []).append(st["total_ms"] / 1000)
+
+    calls0 = stub.calls
+    t = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        list(pool.map(_one, range(args.analyses)))
+    wall = time.perf_counter() - t
+    results["analyze"] = {
+        **_percentiles(analyze_lat), "concurrency": args.concurrency, "wall_s": round(wall, 3),
+        "analyses_per_min": round(60 * len(analyze_lat) / wall, 2) if wall else None,
+        "model_calls": stub.calls - calls0, "peak_model_inflight": stub.peak_inflight,
+        "stages": {k: _percentiles(v) for k, v in sorted(stage_ms.items())},
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    print(f"[bench] analyze: p50={results['analyze'].get('p50_ms')}ms p95={results['analyze'].get('p95_ms')}ms "
+          f"{results['analyze']['analyses_per_min']}/min")
+
+    # ---- rollups + Echo transform in isolation
+    per_bots = [o["per_bot"] for o in outputs]
+    per_auds = [o["per_audience"] for o in outputs]
+    reps = max(1, args.rollup_reps)
+    results["aggregate_editorial"] = _percentiles([_timed(lambda p=p: app.aggregate_editorial(p)) for p in per_bots * reps])
+    results["aggregate_audience"] = _percentiles([_timed(lambda p=p: app.aggregate_audience(p)) for p in per_auds * reps])
+    results["echo_transform"] = _percentiles(echo_lat)
+    results["peak_rss_mb"] = _peak_rss_mb()
+    return results
+
+
+# ---------- regression check ----------
+# (section, field, higher_is_better)
+_WATCH = [
+    ("ingest", "chunks_per_s", True),
+    ("retrieve", "p95_ms", False),
+    ("retrieve", "qps", True),
+    ("retrieve_for_draft", "added_p95_ms", False),
+    ("analyze", "p95_ms", False),
+    ("analyze", "analyses_per_min", True),
+    ("echo_transform", "p95_ms", False),
+    ("results", "peak_rss_mb", False),
+]
+
+
+def compare(base: Dict[str, Any], cur: Dict[str, Any], tolerance: float) -> List[str]:
+    """Watched metrics that got worse than `base` by more than `tolerance` (fraction)."""
+    bad = []
+    for section, field, higher_better in _WATCH:
+        b = base["results"].get(field) if section == "results" else base["results"].get(section, {}).get(field)
+        c = cur["results"].get(field) if section == "results" else cur["results"].get(section, {}).get(field)
+        if not b or c is None:
+            continue
+        change = (c - b) / b
+        if (higher_better and change < -tolerance) or (not higher_better and change > tolerance):
+            bad.append(f"{section}.{field}: {b} -> {c} ({change:+.1%})")
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--docs", type=int, default=200, help="synthetic documents to ingest")
+    ap.add_argument("--doc-words", type=int, default=600)
+    ap.add_argument("--queries", type=int, default=200, help="single-query retrievals to time")
+    ap.add_argument("--analyses", type=int, default=5, help="full /analyze runs")
+    ap.add_argument("--concurrency", type=int, default=1, help="analyses run at once")
+    ap.add_argument("--communities", type=int, default=1)
+    ap.add_argument("--draft-sentences", type=int, default=12)
+    ap.add_argument("--top-k", type=int, default=8)
+    ap.add_argument("--draft-budget-ms", type=float, default=50.0,
+                    help="p95 latency claim-window retrieval may add over a single query; checked with --compare")
+    ap.add_argument("--max-concurrency", type=int, default=8, help="per-analysis model-call concurrency")
+    ap.add_argument("--latency", type=float, default=0.5, help="mean stub model latency (s)")
+    ap.add_argument("--jitter", type=float, default=0.1)
+    ap.add_argument("--failure-rate", type=float, default=0.0)
+    ap.add_argument("--rollup-reps", type=int, default=20)
+    ap.add_argument("--index-kind", default=None, help="override INDEX_KIND (flat|ivf_flat|ivf_pq|hnsw|auto)")
+    ap.add_argument("--response-cache", action="store_true", help="leave the model response cache on")
+    ap.add_argument("--embed-cache", action="store_true", help="leave the embedding cache on")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--keep", action="store_true", help="keep the scratch folder")
+    ap.add_argument("--out", help="write results JSON here")
+    ap.add_argument("--compare", help="baseline results JSON; exit 1 if a watched metric regressed")
+    ap.add_argument("--tolerance", type=float, default=0.15)
+    args = ap.parse_args()
+
+    report = {
+        "time_utc": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "keep")},
+        "env": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": run(args),
+    }
+    print(json.dumps(report["results"], indent=2))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[bench] wrote {args.out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        bad = compare(base, report, args.tolerance)
+        rfd = report["results"]["retrieve_for_draft"]
+        if not rfd["within_budget"]:
+            bad.append(f"retrieve_for_draft.added_p95_ms: {rfd['added_p95_ms']} over the {rfd['budget_ms']:g} ms budget")
+        for line in bad:
+            print(f"[bench] REGRESSION {line}")
+        if bad:
+            sys.exit(1)
+        print(f"[bench] no regressions vs {args.compare} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import json, random, threading, time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+# -----------------------------
+# Deterministic stand-in for the Anthropic client (benchmarks only)
+# -----------------------------
+_EDITORIAL_REPLY = {
+    "summary": "Stub summary.",
+    "key_points": ["stub point"],
+    "suggestions": [{"text": "Tighten the lede.", "rationale": "[1]", "supported_by": [1],
+                     "impact": "high", "effort": "low", "quote_from_draft": ""}],
+    "risks": [{"issue": "Unsupported cost claim.", "rationale": "[2]", "supported_by": [2],
+               "severity": 6, "mitigation": "Cite the budget office."}],
+    "ratings": {"clarity": 7, "accuracy": 6, "engagement": 7, "novelty": 5, "risk": 4},
+    "headline_suggestions": ["Stub headline"],
+    "citations": [1, 2],
+    "next_actions": ["Call the budget office."],
+}
+
+_AUDIENCE_REPLY = {
+    "persona_takeaway": "Stub takeaway.",
+    "stance": "mixed",
+    "positives": ["stub positive"],
+    "concerns": [{"issue": "Cost to households.", "why": "[1]", "supported_by": [1], "severity": 6}],
+    "questions_for_reporter": ["Who pays?"],
+    "scores": {"trust": 6, "relevance": 8, "share_intent": 5},
+    "likely_comment": "Stub comment.",
+    "suggestions_to_journalist": [{"text": "Add a cost table.", "rationale": "", "supported_by": [1]}],
+    "citations": [1],
+}
+
+def _personas_reply(n: int) -> Dict[str, Any]:
+    return {"personas": [
+        {"name": f"Stub Persona {i+1}", "why_included": "stub", "scope": ["a"], "avoid_overlap_with": ["b"],
+         "system_prompt": f"AUDIENCE ROLE: Stub Persona {i+1}."}
+        for i in range(n)
+    ]}
+
+
+class StubMessages:
+    def __init__(self, owner: "StubAnthropic"):
+        self._owner = owner
+
+    def create(self, model: str, system: Any, messages: List[Dict[str, Any]], max_tokens: int,
+               temperature: float = 1.0, timeout: Optional[float] = None, **kwargs) -> Any:
+        o = self._owner
+        with o._lock:
+            o.calls += 1
+            o.inflight += 1
+            o.peak_inflight = max(o.peak_inflight, o.inflight)
+            latency = max(0.0, o._rng.gauss(o.latency_s, o.jitter_s))
+            fail = o._rng.random() < o.failure_rate
+        try:
+            time.sleep(latency)
+            if fail:
+                raise RuntimeError("stub model failure")
+            sys_txt = system if isinstance(system, str) else json.dumps(system)
+            if "audience research planner" in sys_txt:
+                body = _personas_reply(5)
+            elif "AUDIENCE" in sys_txt:
+                body = _AUDIENCE_REPLY
+            else:
+                body = _EDITORIAL_REPLY
+            text = json.dumps(body)
+            return SimpleNamespace(
+                content=[SimpleNamespace(type="text", text=text)],
+                model=model,
+                usage=o._usage(system, messages, text),
+            )
+        finally:
+            with o._lock:
+                o.inflight -= 1
+
+
+class StubAnthropic:
+    """Drop-in for `anthropic.Anthropic` with fixed latency, jitter and failure rate."""
+
+    def __init__(self, latency_s: float = 0.5, jitter_s: float = 0.0, failure_rate: float = 0.0, seed: int = 0):
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.inflight = 0
+        self.peak_inflight = 0
+        self._prompt_cache: set = set()
+        self.messages = StubMessages(self)
+
+    def _usage(self, system: Any, messages: List[Dict[str, Any]], text: str) -> SimpleNamespace:
+        """Token counts (chars/4), mimicking prompt caching: system blocks up to the
+        last cache_control mark are written on first sight and read afterwards."""
+        cached, rest = "", str(system) + str(messages)
+        if isinstance(system, list):
+            marks = [i for i, b in enumerate(system) if b.get("cache_control")]
+            if marks:
+                cached = "".join(b["text"] for b in system[:marks[-1] + 1])
+                rest = "".join(b["text"] for b in system[marks[-1] + 1:]) + str(messages)
+        with self._lock:
+            hit = cached in self._prompt_cache
+            if cached:
+                self._prompt_cache.add(cached)
+        return SimpleNamespace(
+            input_tokens=len(rest) // 4,
+            output_tokens=len(text) // 4,
+            cache_creation_input_tokens=0 if hit or not cached else len(cached) // 4,
+            cache_read_input_tokens=len(cached) // 4 if hit else 0,
+        )
@@ -0,0 +1,206 @@
+import os, time, random, threading
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# -----------------------------
+# Per-model circuit breakers + jittered retry for rate-limit/overload errors
+# -----------------------------
+# Consecutive failures that open a model's breaker.
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "3"))
+# How long an open breaker skips its model before letting one probe through.
+BREAKER_COOLDOWN_S = float(os.getenv("BREAKER_COOLDOWN_S", "30"))
+# Cooldowns double on each failed probe, up to this cap.
+BREAKER_MAX_COOLDOWN_S = float(os.getenv("BREAKER_MAX_COOLDOWN_S", "600"))
+# A 404 means the model id is wrong or retired: open at once for the max cooldown.
+BREAKER_NOT_FOUND_COOLDOWN_S = float(os.getenv("BREAKER_NOT_FOUND_COOLDOWN_S", "600"))
+
+# Retries on the same model for 429 / 5xx / 529 (overloaded) responses. The
+# router is the only retry layer: the API client is built with max_retries=0.
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY_S = float(os.getenv("RETRY_BASE_DELAY_S", "0.5"))
+RETRY_MAX_DELAY_S = float(os.getenv("RETRY_MAX_DELAY_S", "8"))
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504, 529)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CallAbandoned(Exception):
+    """Raised by a call's fn to give up before reaching the model (e.g. no rate capacity
+    before the deadline); it is not retried and does not count against the model."""
+
+
+def status_of(exc: BaseException) -> Optional[int]:
+    return getattr(exc, "status_code", None)
+
+
+def counts_against_model(exc: BaseException) -> bool:
+    """Timeouts, connection errors, 404, 429 and 5xx say something about the model;
+    other 4xx (bad request, auth) are about our call and don't trip the breaker."""
+    status = status_of(exc)
+    return status is None or status >= 500 or status in (404, 429)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds from a Retry-After header on the error's response, if any."""
+    resp = getattr(exc, "response", None)
+    try:
+        return float(resp.headers.get("retry-after")) if resp is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, exc: Optional[BaseException] = None) -> float:
+    """Full-jitter exponential backoff, stretched to honour Retry-After."""
+    delay = random.uniform(0, min(RETRY_MAX_DELAY_S, RETRY_BASE_DELAY_S * (2 ** attempt)))
+    hinted = retry_after(exc) if exc is not None else None
+    if hinted is not None:
+        delay = max(delay, min(hinted, RETRY_MAX_DELAY_S))
+    return delay
+
+
+class CircuitBreaker:
+    """
+    closed -> (BREAKER_FAILURES consecutive failures) -> open
+    open   -> (cooldown elapsed) -> half_open: one probe call is let through
+    half_open -> success -> closed | failure -> open with a doubled cooldown
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.failures = 0
+        self.cooldown_s = BREAKER_COOLDOWN_S
+        self.opened_at = 0.0
+        self.probe_inflight = False
+        self.totals = {"calls": 0, "successes": 0, "failures": 0, "retries": 0, "rejected": 0}
+        self.last_error: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _reopens_at(self) -> float:
+        return self.opened_at + self.cooldown_s
+
+    def allow(self) -> bool:
+        """May a call go to this model now? In half-open only one probe is let through."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() >= self._reopens_at():
+                self.state = HALF_OPEN
+                self.probe_inflight = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self.probe_inflight:
+                self.probe_inflight = True
+                return True
+            self.totals["rejected"] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.totals["calls"] += 1
+            self.totals["successes"] += 1
+            self.state = CLOSED
+            self.failures = 0
+            self.cooldown_s = BREAKER_COOLDOWN_S
+            self.probe_inflight = False
+
+    def record_failure(self, exc: BaseException):
+        with self._lock:
+            self.totals["calls"] += 1
+            if not counts_against_model(exc):
+                self.probe_inflight = False  # our request was bad, not the model
+                return
+            self.totals["failures"] += 1
+            self.failures += 1
+            self.last_error = f"{type(exc).__name__}: {exc}"[:300]
+            if status_of(exc) == 404:
+                self._open(BREAKER_NOT_FOUND_COOLDOWN_S)
+            elif self.state == HALF_OPEN:
+                self._open(min(self.cooldown_s * 2, BREAKER_MAX_COOLDOWN_S))
+            elif self.failures >= BREAKER_FAILURES:
+                self._open(self.cooldown_s)
+
+    def release(self):
+        """Give back an admission that was never used (e.g. the call was abandoned before sending)."""
+        with self._lock:
+            self.probe_inflight = False
+
+    def record_retry(self):
+        with self._lock:
+            self.totals["retries"] += 1
+
+    def _open(self, cooldown_s: float):
+        if self.state != OPEN:
+            print(f"[breaker] {self.name} open for {cooldown_s:g}s ({self.last_error})")
+        self.state = OPEN
+        self.cooldown_s = cooldown_s
+        self.opened_at = time.monotonic()
+        self.probe_inflight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out = {"state": self.state, "consecutive_failures": self.failures, "last_error": self.last_error,
+                   **self.totals}
+            if self.state == OPEN:
+                out["retry_in_s"] = round(max(0.0, self._reopens_at() - time.monotonic()), 1)
+            return out
+
+
+class ModelRouter:
+    """One breaker per model candidate; picks which candidates to try, healthy ones first."""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        with self._lock:
+            b = self._breakers.get(model)
+            if b is None:
+                b = self._breakers[model] = CircuitBreaker(model)
+            return b
+
+    def route(self, candidates: List[str]) -> Iterator[str]:
+        """
+        Yield the candidates whose breaker admits a call, in order. Admission is
+        checked lazily, so a half-open probe slot is only taken by a model the
+        caller actually tries. If every breaker is open, yield the one that
+        reopens soonest rather than failing outright.
+        """
+        admitted = False
+        for m in candidates:
+            if self.breaker(m).allow():
+                admitted = True
+                yield m
+        if not admitted and candidates:
+            yield min(candidates, key=lambda m: self.breaker(m)._reopens_at())
+
+    def call(self, model: str, fn: Callable[[], Any], deadline: Optional[float] = None) -> Any:
+        """Run fn() against `model`, retrying RETRYABLE_STATUS with jittered backoff
+        (never sleeping past `deadline`, a time.monotonic() value). Each retry
+        calls fn() again, so whatever admission fn() does happens per attempt;
+        fn() must send one request and not retry it itself."""
+        b = self.breaker(model)
+        attempt = 0
+        while True:
+            try:
+                out = fn()
+            except CallAbandoned:
+                b.release()
+                raise
+            except Exception as e:
+                retryable = status_of(e) in RETRYABLE_STATUS
+                if retryable and attempt + 1 < RETRY_MAX_ATTEMPTS:
+                    delay = backoff_delay(attempt, e)
+                    if deadline is None or time.monotonic() + delay < deadline:
+                        b.record_retry()
+                        attempt += 1
+                        time.sleep(delay)
+                        continue
+                b.record_failure(e)
+                raise
+            b.record_success()
+            return out
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {m: b.snapshot() for m, b in breakers.items()}
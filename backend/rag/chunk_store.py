@@ -0,0 +1,385 @@
+import os, json, shutil, hashlib, threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# -----------------------------
+# Columnar, memory-mapped chunk metadata (replaces meta.jsonl)
+# -----------------------------
+# Layout inside the store directory; row r is FAISS row r:
+#   text.bin       utf-8 chunk texts, back to back
+#   text.off       uint64 end offset of each row's text (row r spans off[r-1]..off[r])
+#   ids.bin        64 ascii bytes per row, NUL-padded (hex ids from chunk_id)
+#   source.u32     uint32 per row, index into sources.jsonl
+#   chunk.i32      int32 chunk_index per row
+#   pages.u32      uint32 (first, last) page per row, 0 = unknown; may be shorter than
+#                  the other columns in stores written before it existed
+#   sources.jsonl  one JSON string per distinct source label
+#   tombstones.u32 uint32 row numbers of deleted rows, appended as rows are deleted
+#   format.json    {"version": STORE_VERSION}; a store without it predates version 2
+# text.off is written last on append, so its length is the committed row count.
+# Deleted rows stay in place (FAISS row r must stay row r) until compaction
+# copies the live rows into a fresh store and swaps it in.
+
+# 2: labels canonical (source_label), ids hash the chunk text (chunk_id)
+STORE_VERSION = 2
+
+_COLUMNS = {
+    "ids.bin": (np.uint8, 64),
+    "source.u32": (np.uint32, 1),
+    "chunk.i32": (np.int32, 1),
+    "pages.u32": (np.uint32, 2),
+    "text.off": (np.uint64, 1),
+}
+
+
+def source_label(path: str) -> str:
+    """
+    Canonical label for a file path, so "./data/docs\\x.txt" and "data/docs/x.txt"
+    are the same source. Labels of JSON sub-documents ("file.json::url") are kept as-is.
+    """
+    if "::" in path:
+        return path
+    return os.path.normpath(path.replace("\\", "/"))
+
+
+def chunk_id(source: str, index: int, text: str) -> str:
+    """Row id of a chunk; it changes whenever the chunk's text does."""
+    h = hashlib.sha256(f"{source}|{index}|".encode("utf-8"))
+    h.update(text.encode("utf-8"))
+    return h.hexdigest()
+
+
+def _map(path: str, dtype, width: int) -> np.ndarray:
+    n_bytes = os.path.getsize(path) if os.path.exists(path) else 0
+    item = np.dtype(dtype).itemsize * width
+    rows = n_bytes // item
+    if rows == 0:
+        return np.empty((0, width) if width > 1 else (0,), dtype=dtype)
+    shape = (rows, width) if width > 1 else (rows,)
+    return np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+class ChunkStore:
+    """
+    Row-addressable chunk metadata. store[i] is an O(1) lookup that slices the
+    mapped text blob and columns; nothing is parsed and only touched pages are
+    resident. Rows are append-only; deleting one only tombstones it.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.RLock()
+        self._maps: Optional[Dict[str, np.ndarray]] = None
+        self._id_set: Optional[set] = None
+        self._dead: Optional[np.ndarray] = None
+        self._sources: List[str] = []
+        self._source_ids: Dict[str, int] = {}
+        self._load_sources()
+        if self._version() < STORE_VERSION:
+            if len(self):
+                self._upgrade()
+            else:
+                self._write_version()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    def _load_sources(self):
+        self._sources, self._source_ids = [], {}
+        p = self._path("sources.jsonl")
+        if os.path.exists(p):
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        label = json.loads(line)
+                        self._source_ids.setdefault(label, len(self._sources))
+                        self._sources.append(label)
+
+    def _ensure_maps(self) -> Dict[str, np.ndarray]:
+        if self._maps is None:
+            maps = {name: _map(self._path(name), dt, w) for name, (dt, w) in _COLUMNS.items()}
+            maps["text.bin"] = _map(self._path("text.bin"), np.uint8, 1)
+            n = len(maps["text.off"])
+            for name in ("ids.bin", "source.u32", "chunk.i32", "pages.u32"):
+                maps[name] = maps[name][:n]  # ignore any torn tail past the last committed row
+            self._maps = maps
+        return self._maps
+
+    def _sig(self, name: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self._path(name))
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def signature(self) -> Tuple[Any, Any]:
+        """(mtime_ns, size) of the commit column and the tombstones; changes whenever rows are added or deleted."""
+        return (self._sig("text.off"), self._sig("tombstones.u32"))
+
+    def refresh(self):
+        """Drop mappings so the next read sees rows appended or deleted by another process."""
+        with self._lock:
+            self._maps = None
+            self._id_set = None
+            self._dead = None
+            self._load_sources()
+
+    # ---------- reads ----------
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._ensure_maps()["text.off"])
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        with self._lock:
+            m = self._ensure_maps()
+            n = len(m["text.off"])
+            if i < 0:
+                i += n
+            if not 0 <= i < n:
+                raise IndexError(i)
+            end = int(m["text.off"][i])
+            start = int(m["text.off"][i - 1]) if i > 0 else 0
+            row = {
+                "id": bytes(m["ids.bin"][i]).rstrip(b"\0").decode("ascii"),
+                "source": self._sources[int(m["source.u32"][i])],
+                "chunk_index": int(m["chunk.i32"][i]),
+                "text": bytes(m["text.bin"][start:end]).decode("utf-8"),
+            }
+            if i < len(m["pages.u32"]) and m["pages.u32"][i][0]:
+                row["pages"] = [int(m["pages.u32"][i][0]), int(m["pages.u32"][i][1])]
+            return row
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def has_ids(self, ids: Iterable[str]) -> set:
+        """Subset of `ids` stored in live rows. The id set is built from the id column on first use."""
+        with self._lock:
+            if self._id_set is None:
+                keys = self._id_keys()[~self.dead_mask()]
+                self._id_set = {k.decode("ascii") for k in keys.tolist()}
+            return {i for i in ids if i in self._id_set}
+
+    def _id_keys(self) -> np.ndarray:
+        col = self._ensure_maps()["ids.bin"]
+        return np.ascontiguousarray(col).view("S64").reshape(-1)
+
+    def dead_mask(self) -> np.ndarray:
+        """Bool per row, True where the row was deleted."""
+        with self._lock:
+            if self._dead is None:
+                n = len(self._ensure_maps()["text.off"])
+                dead = np.zeros(n, dtype=bool)
+                p = self._path("tombstones.u32")
+                if os.path.exists(p):
+                    rows = np.fromfile(p, dtype=np.uint32)
+                    dead[rows[rows < n]] = True
+                self._dead = dead
+            return self._dead
+
+    def dead_count(self) -> int:
+        return int(self.dead_mask().sum())
+
+    def rows_for_ids(self, ids: Iterable[str]) -> np.ndarray:
+        """Live rows holding any of these chunk ids."""
+        with self._lock:
+            want = np.array([str(i).encode("ascii")[:64] for i in ids], dtype="S64")
+            return np.flatnonzero(np.isin(self._id_keys(), want) & ~self.dead_mask())
+
+    def rows_for_sources(self, labels: Iterable[str] = (), prefixes: Iterable[str] = (),
+                         keep_ids: Optional[Iterable[str]] = None) -> np.ndarray:
+        """
+        Live rows whose source is one of `labels` or starts with one of `prefixes`,
+        except rows holding an id in `keep_ids`.
+        """
+        with self._lock:
+            labels, prefixes = set(labels), tuple(prefixes)
+            sids = [sid for sid, label in enumerate(self._sources)
+                    if label in labels or (prefixes and label.startswith(prefixes))]
+            if not sids:
+                return np.empty(0, dtype=np.int64)
+            hit = np.isin(self._ensure_maps()["source.u32"], sids) & ~self.dead_mask()
+            if keep_ids:
+                hit &= ~np.isin(self._id_keys(), np.array([k.encode("ascii") for k in keep_ids], dtype="S64"))
+            return np.flatnonzero(hit)
+
+    # ---------- writes ----------
+    def _source_id(self, label: str, new_labels: List[str]) -> int:
+        sid = self._source_ids.get(label)
+        if sid is None:
+            sid = len(self._sources)
+            self._sources.append(label)
+            self._source_ids[label] = sid
+            new_labels.append(label)
+        return sid
+
+    def append(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Append {id, source, chunk_index, text[, pages]} rows; returns how many were written."""
+        with self._lock:
+            m = self._ensure_maps()
+            base = int(m["text.off"][-1]) if len(m["text.off"]) else 0
+            blobs, ids, srcs, cidx, pages, offs = [], [], [], [], [], []
+            new_labels: List[str] = []
+            for r in rows:
+                b = (r.get("text") or "").encode("utf-8")
+                base += len(b)
+                blobs.append(b)
+                ids.append(str(r["id"]).encode("ascii")[:64].ljust(64, b"\0"))
+                srcs.append(self._source_id(r.get("source") or "", new_labels))
+                cidx.append(int(r.get("chunk_index", 0)))
+                pages.append(r.get("pages") or (0, 0))
+                offs.append(base)
+            if not offs:
+                return 0
+            if new_labels:
+                with open(self._path("sources.jsonl"), "a", encoding="utf-8") as f:
+                    for label in new_labels:
+                        f.write(json.dumps(label, ensure_ascii=False) + "\n")
+            with open(self._path("text.bin"), "ab") as f:
+                f.write(b"".join(blobs))
+            with open(self._path("ids.bin"), "ab") as f:
+                f.write(b"".join(ids))
+            with open(self._path("source.u32"), "ab") as f:
+                f.write(np.asarray(srcs, dtype=np.uint32).tobytes())
+            with open(self._path("chunk.i32"), "ab") as f:
+                f.write(np.asarray(cidx, dtype=np.int32).tobytes())
+            # zero-fill rows written before this column existed (or drop a torn tail)
+            pages_path = self._path("pages.u32")
+            open(pages_path, "ab").close()
+            os.truncate(pages_path, len(m["text.off"]) * 8)
+            with open(pages_path, "ab") as f:
+                f.write(np.asarray(pages, dtype=np.uint32).reshape(-1, 2).tobytes())
+            with open(self._path("text.off"), "ab") as f:
+                f.write(np.asarray(offs, dtype=np.uint64).tobytes())
+            self._maps = None
+            self._dead = None
+            if self._id_set is not None:
+                self._id_set.update(b.rstrip(b"\0").decode("ascii") for b in ids)
+            return len(offs)
+
+    def tombstone(self, rows: Iterable[int]) -> int:
+        """Mark rows deleted; returns how many were live."""
+        with self._lock:
+            dead = self.dead_mask()
+            rows = np.unique(np.asarray(list(rows), dtype=np.int64))
+            rows = rows[(rows >= 0) & (rows < len(dead))]
+            rows = rows[~dead[rows]]
+            if not len(rows):
+                return 0
+            with open(self._path("tombstones.u32"), "ab") as f:
+                f.write(rows.astype(np.uint32).tobytes())
+            dead[rows] = True
+            self._id_set = None
+            return len(rows)
+
+    # ---------- compaction ----------
+    def compaction_rows(self) -> np.ndarray:
+        """Live rows, keeping only the first row of any id stored more than once."""
+        with self._lock:
+            live = np.flatnonzero(~self.dead_mask())
+            _, first = np.unique(self._id_keys()[live], return_index=True)
+            return live[np.sort(first)]
+
+    def copy_rows(self, rows: Iterable[int], dest: str, batch: int = 10000) -> "ChunkStore":
+        """Write the given rows, in order, into a new store at `dest` (emptied first)."""
+        shutil.rmtree(dest, ignore_errors=True)
+        out = ChunkStore(dest)
+        rows = list(rows)
+        for i in range(0, len(rows), batch):
+            out.append([self[int(r)] for r in rows[i:i + batch]])
+        return out
+
+    def reset(self):
+        with self._lock:
+            self._maps = None
+            self._id_set = None
+            self._dead = None
+            for name in list(_COLUMNS) + ["text.bin", "sources.jsonl", "tombstones.u32"]:
+                p = self._path(name)
+                if os.path.exists(p):
+                    os.remove(p)
+            self._load_sources()
+
+    # ---------- migration ----------
+    def _version(self) -> int:
+        try:
+            with open(self._path("format.json"), "r", encoding="utf-8") as f:
+                return int(json.load(f).get("version", 1))
+        except FileNotFoundError:
+            return 1
+
+    def _write_version(self):
+        tmp = self._path("format.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": STORE_VERSION}, f)
+        os.replace(tmp, self._path("format.json"))
+
+    def _upgrade(self, batch: int = 10000):
+        """
+        Rewrite labels and ids of a store written before STORE_VERSION in place.
+        Rows keep their positions (so FAISS rows stay aligned); a row whose new id
+        repeats an earlier row's (the same doc ingested under two spellings of its
+        path) is tombstoned. Safe to rerun if interrupted: the marker is written last.
+        """
+        with self._lock:
+            tmp = self._path("sources.jsonl.tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                for label in self._sources:
+                    f.write(json.dumps(source_label(label), ensure_ascii=False) + "\n")
+            os.replace(tmp, self._path("sources.jsonl"))
+            self.refresh()
+            n = len(self)
+            tmp = self._path("ids.bin.tmp")
+            with open(tmp, "wb") as f:
+                for i in range(0, n, batch):
+                    rows = (self[j] for j in range(i, min(n, i + batch)))
+                    f.write(b"".join(chunk_id(r["source"], r["chunk_index"], r["text"]).encode("ascii").ljust(64, b"\0")
+                                     for r in rows))
+            os.replace(tmp, self._path("ids.bin"))
+            self.refresh()
+            live = np.flatnonzero(~self.dead_mask())
+            _, first = np.unique(self._id_keys()[live], return_index=True)
+            dupes = self.tombstone(np.setdiff1d(live, live[first]))
+            self._write_version()
+        print(f"[chunks] upgraded {self.root} to format {STORE_VERSION} ({n} rows, {dupes} duplicates dropped)")
+
+    def migrate_from_jsonl(self, meta_path: str, batch: int = 10000) -> int:
+        """
+        One-shot import of a legacy meta.jsonl (row order preserved); labels and
+        ids are brought up to date as in _upgrade. The source file is renamed to
+        <meta_path>.migrated afterwards.
+        """
+        total = 0
+        buf: List[Dict[str, Any]] = []
+        with open(meta_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                buf.append(json.loads(line))
+                if len(buf) >= batch:
+                    total += self.append(buf)
+                    buf = []
+        total += self.append(buf)
+        if total:
+            self._upgrade()
+        os.replace(meta_path, meta_path + ".migrated")
+        print(f"[chunks] migrated {total} rows from {meta_path} into {self.root}")
+        return total
+
+
+if __name__ == "__main__":
+    import argparse
+
+    ap = argparse.ArgumentParser(description="Migrate a meta.jsonl into a columnar chunk store")
+    ap.add_argument("meta_path")
+    ap.add_argument("store_dir")
+    args = ap.parse_args()
+    store = ChunkStore(args.store_dir)
+    if len(store):
+        raise SystemExit(f"{args.store_dir} already holds {len(store)} rows; refusing to migrate into it")
+    store.migrate_from_jsonl(args.meta_path)
@@ -0,0 +1,254 @@
+import os, re
+from bisect import bisect_right
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+# -----------------------------
+# Chunking: legacy fixed-width slices, sentence packing, or token-budgeted packing
+# -----------------------------
+# "chars"    - 900-char slices every 760 chars (the original behaviour; chunk ids unchanged)
+# "sentence" - whole sentences/paragraphs packed up to CHUNK_SIZE chars
+# "tokens"   - whole sentences packed up to the embedder's token window
+# Chunk ids hash (source, index, text), so switching modes on an existing
+# index re-adds every document under new ids: rebuild the index when you do.
+CHUNK_MODE = os.getenv("CHUNK_MODE", "chars").lower()
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "900"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "140"))
+# 0 = the embedder's max_seq_length minus its two special tokens
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "0"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "32"))
+# sentences measured per tokenizer call
+CHUNK_MEASURE_BATCH = int(os.getenv("CHUNK_MEASURE_BATCH", "512"))
+
+MODES = ("chars", "sentence", "tokens")
+
+# a sentence ends at .!? followed by whitespace; a blank line ends a paragraph
+_BOUNDARY = re.compile(r"(?<=[.!?])\s+|\n\s*\n")
+
+Text = Union[str, Iterable[str]]
+Unit = Tuple[str, str, int, int]  # (sentence, separator that followed it, first part, last part)
+Span = Tuple[str, int, int]       # (chunk, first part, last part)
+
+
+def token_counter(embedder: Any) -> Optional[Callable[[List[str]], List[int]]]:
+    """Batch token counter backed by the embedder's own tokenizer, if it exposes one."""
+    tok = getattr(embedder, "tokenizer", None)
+    if tok is None:
+        return None
+
+    def count(texts: List[str]) -> List[int]:
+        ids = tok(texts, add_special_tokens=False, truncation=False)["input_ids"]
+        return [len(x) for x in ids]
+    return count
+
+
+def _words(texts: List[str]) -> List[int]:
+    # ~1.3 wordpiece tokens per English word; used only when no tokenizer is available
+    return [int(len(t.split()) * 1.3) + 1 for t in texts]
+
+
+def _parts(text: Text) -> Iterator[str]:
+    if isinstance(text, str):
+        yield text
+    else:
+        yield from text
+
+
+def _normalized(parts: Iterable[str]) -> Iterator[Tuple[int, str]]:
+    """
+    (part index, part) with "\r\n" turned into "\n", also when the pair is split
+    across two parts: a trailing "\r" is held back and starts the next part.
+    """
+    held, idx = "", 0
+    for idx, part in enumerate(parts):
+        part = held + part
+        held = "\r" if part.endswith("\r") else ""
+        yield idx, part[:len(part) - len(held)].replace("\r\n", "\n")
+    if held:
+        yield idx, held
+
+
+class _Marks:
+    """Which input part each offset of a sliding buffer came from."""
+
+    def __init__(self):
+        self.offsets: List[int] = []
+        self.parts: List[int] = []
+
+    def add(self, offset: int, part: int):
+        self.offsets.append(offset)
+        self.parts.append(part)
+
+    def at(self, offset: int) -> int:
+        return self.parts[max(0, bisect_right(self.offsets, offset) - 1)] if self.parts else 0
+
+    def shift(self, n: int):
+        """The buffer dropped its first n characters."""
+        keep = max(0, bisect_right(self.offsets, n) - 1)
+        self.offsets = [max(0, o - n) for o in self.offsets[keep:]]
+        self.parts = self.parts[keep:]
+
+
+def _units(text: Text) -> Iterator[Unit]:
+    """Sentences with their trailing separator, streamed across parts without joining them."""
+    carry = ""
+    marks = _Marks()
+    for idx, part in _normalized(_parts(text)):
+        marks.add(len(carry), idx)
+        buf = carry + part
+        pos = 0
+        for m in _BOUNDARY.finditer(buf):
+            if m.end() == len(buf):
+                break  # the next part may continue this whitespace run
+            raw = buf[pos:m.start()]
+            unit = raw.strip()
+            if unit:
+                sep = m.group()
+                lead = len(raw) - len(raw.lstrip())
+                yield (unit, ("\n\n" if sep.count("\n") >= 2 else "\n" if "\n" in sep else " "),
+                       marks.at(pos + lead), marks.at(m.start() - 1))
+            pos = m.end()
+        carry = buf[pos:]
+        marks.shift(pos)
+    if carry.strip():
+        lead = len(carry) - len(carry.lstrip())
+        yield carry.strip(), "", marks.at(lead), marks.at(len(carry.rstrip()) - 1)
+
+
+class Chunker:
+    """
+    Callable text -> chunks. `iter_chunks` accepts a string or an iterable of
+    string parts (e.g. PDF pages) and yields chunks as they fill, so a long
+    document never has all of its chunks in memory at once.
+    """
+
+    def __init__(self, mode: str = CHUNK_MODE, size: int = CHUNK_SIZE, overlap: int = CHUNK_OVERLAP,
+                 count_tokens: Optional[Callable[[List[str]], List[int]]] = None):
+        if mode not in MODES:
+            raise ValueError(f"CHUNK_MODE must be one of {MODES}, got {mode!r}")
+        if overlap >= size:
+            raise ValueError("chunk overlap must be smaller than the chunk size")
+        self.mode, self.size, self.overlap = mode, size, overlap
+        self.measure = (count_tokens or _words) if mode == "tokens" else (lambda ts: [len(t) + 1 for t in ts])
+
+    def __call__(self, text: Text) -> List[str]:
+        return list(self.iter_chunks(text))
+
+    def describe(self) -> dict:
+        unit = "tokens" if self.mode == "tokens" else "chars"
+        return {"mode": self.mode, "size": self.size, "overlap": self.overlap, "unit": unit}
+
+    def iter_chunks(self, text: Text, spans: bool = False) -> Iterator[Union[str, Span]]:
+        """
+        Chunks of `text`. With spans=True each chunk comes as (chunk, first, last),
+        the indices of the input parts it was cut from (e.g. PDF pages).
+        """
+        out = self._slices(text) if self.mode == "chars" else self._packed(text)
+        return out if spans else (c for c, _, _ in out)
+
+    # ---------- legacy fixed-width ----------
+    def _slices(self, text: Text) -> Iterator[Span]:
+        if isinstance(text, str):
+            text = [text.strip()]
+        step = self.size - self.overlap
+        buf, started = "", False
+        marks = _Marks()
+
+        def cut() -> Optional[Span]:
+            piece = buf[:self.size]
+            return (piece, marks.at(0), marks.at(len(piece) - 1)) if piece.strip() else None
+
+        for idx, part in _normalized(text):
+            if not started:
+                part = part.lstrip()
+                started = bool(part)
+            if part:
+                marks.add(len(buf), idx)
+            buf += part
+            while len(buf) >= self.size + step:  # the slice after this one is also complete
+                c = cut()
+                if c:
+                    yield c
+                buf = buf[step:]
+                marks.shift(step)
+        buf = buf.rstrip()
+        while buf:
+            c = cut()
+            if c:
+                yield c
+            buf = buf[step:]
+            marks.shift(step)
+
+    # ---------- sentence / token packing ----------
+    def _measured(self, text: Text) -> Iterator[Tuple[str, str, int, int, int]]:
+        units = _units(text)
+        while True:
+            batch = list(islice(units, CHUNK_MEASURE_BATCH))
+            if not batch:
+                return
+            for (u, sep, a, b), n in zip(batch, self.measure([u[0] for u in batch])):
+                yield u, sep, n, a, b
+
+    def _split_long(self, unit: str, n: int) -> Iterator[str]:
+        """A single sentence over budget: word windows sized by its average cost per word."""
+        words = unit.split()
+        if len(words) < 2:
+            per = max(1, len(unit) * self.size // n)
+            step = max(1, per - len(unit) * self.overlap // n)
+            for i in range(0, len(unit), step):
+                yield unit[i:i+per]
+                if i + per >= len(unit):
+                    return
+            return
+        per = max(1, len(words) * self.size // n)
+        step = max(1, per - len(words) * self.overlap // n)
+        for i in range(0, len(words), step):
+            yield " ".join(words[i:i+per])
+            if i + per >= len(words):
+                return
+
+    @staticmethod
+    def _join(cur: List[Tuple[str, str, int, int, int]]) -> Span:
+        return "".join(u[0] + u[1] for u in cur[:-1]) + cur[-1][0], cur[0][3], cur[-1][4]
+
+    def _packed(self, text: Text) -> Iterator[Span]:
+        cur: List[Tuple[str, str, int, int, int]] = []
+        cur_n, fresh = 0, False
+        for item in self._measured(text):
+            u, sep, n, a, b = item
+            if n > self.size:
+                if fresh:
+                    yield self._join(cur)
+                for piece in self._split_long(u, n):
+                    yield piece, a, b
+                cur, cur_n, fresh = [], 0, False
+                continue
+            if cur_n + n > self.size and fresh:
+                yield self._join(cur)
+                # carry whole trailing sentences (up to `overlap`) into the next chunk
+                keep, kept = [], 0
+                for prev in reversed(cur):
+                    if kept + prev[2] > self.overlap or kept + prev[2] + n > self.size:
+                        break
+                    keep.insert(0, prev)
+                    kept += prev[2]
+                cur, cur_n, fresh = keep, kept, False
+            cur.append(item)
+            cur_n += n
+            fresh = True
+        if fresh:
+            yield self._join(cur)
+
+
+def make_chunker(embedder: Any = None, mode: str = CHUNK_MODE) -> Chunker:
+    """Chunker configured from the CHUNK_* env vars; token mode sizes itself to `embedder`."""
+    if mode != "tokens":
+        return Chunker(mode, CHUNK_SIZE, CHUNK_OVERLAP)
+    counter = token_counter(embedder)
+    if counter is None:
+        print("[chunking] embedder has no tokenizer; estimating tokens from word counts")
+    budget = CHUNK_TOKENS
+    if budget <= 0:
+        max_len = getattr(embedder, "max_seq_length", None) or 256
+        budget = max(16, int(max_len) - 2)
+    return Chunker("tokens", budget, min(CHUNK_OVERLAP_TOKENS, budget // 2), count_tokens=counter)
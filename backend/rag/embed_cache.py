@@ -0,0 +1,103 @@
+import os, time, sqlite3, hashlib, threading
+from typing import List, Optional
+
+import numpy as np
+
+# -----------------------------
+# Content-addressed embedding cache (SQLite, LRU by last use, size-capped)
+# -----------------------------
+
+def _key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Maps (model name, chunk text) -> embedding vector on disk. Entries carry a
+    last-used timestamp; once the stored vectors exceed `max_bytes`, the least
+    recently used ones are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS emb ("
+            " key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vec BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS emb_last_used ON emb(last_used)")
+        self._db.commit()
+        self._bytes = self._stored_bytes()
+
+    def _stored_bytes(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(LENGTH(vec)), 0) FROM emb").fetchone()[0]
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        keys = [_key(model, t) for t in texts]
+        found = {}
+        now = time.time()
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i:i+500]
+                q = f"SELECT key, dim, vec FROM emb WHERE key IN ({','.join('?' * len(part))})"
+                for k, dim, blob in self._db.execute(q, part):
+                    found[k] = np.frombuffer(blob, dtype=np.float32, count=dim)
+            if found:
+                self._db.executemany("UPDATE emb SET last_used=? WHERE key=?", [(now, k) for k in found])
+                self._db.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return [found.get(k) for k in keys]
+
+    def put_many(self, model: str, texts: List[str], vecs: np.ndarray):
+        now = time.time()
+        rows = [(_key(model, t), int(v.shape[0]), np.asarray(v, dtype=np.float32).tobytes(), now)
+                for t, v in zip(texts, vecs)]
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO emb(key, dim, vec, last_used) VALUES (?,?,?,?)", rows)
+            self._db.commit()
+            self._bytes += sum(len(r[2]) for r in rows)  # upper bound; replaced keys are recounted below
+            if self._bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        total = self._stored_bytes()
+        self._bytes = total
+        if total <= self.max_bytes:
+            return
+        over = total - int(self.max_bytes * 0.9)  # trim below the cap so we don't evict on every put
+        freed = 0
+        doomed = []
+        for k, n in self._db.execute("SELECT key, LENGTH(vec) FROM emb ORDER BY last_used ASC"):
+            doomed.append((k,))
+            freed += n
+            if freed >= over:
+                break
+        self._db.executemany("DELETE FROM emb WHERE key=?", doomed)
+        self._db.commit()
+        self._bytes = total - freed
+
+    def stats(self) -> dict:
+        with self._lock:
+            n, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vec)), 0) FROM emb").fetchone()
+        return {"entries": n, "bytes": size, "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+def encode_cached(embedder, model: str, texts: List[str], cache: Optional[EmbeddingCache], **encode_kw) -> np.ndarray:
+    """embedder.encode(texts) that only encodes texts the cache hasn't seen for this model."""
+    if cache is None or not texts:
+        return embedder.encode(texts, convert_to_numpy=True, **encode_kw)
+    cached = cache.get_many(model, texts)
+    miss_idx = [i for i, v in enumerate(cached) if v is None]
+    if miss_idx:
+        fresh = embedder.encode([texts[i] for i in miss_idx], convert_to_numpy=True, **encode_kw)
+        cache.put_many(model, [texts[i] for i in miss_idx], fresh)
+        for i, v in zip(miss_idx, fresh):
+            cached[i] = v
+    return np.vstack(cached).astype("float32")
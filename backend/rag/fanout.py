@@ -0,0 +1,88 @@
+import os, time, threading, contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# -----------------------------
+# Bounded-concurrency fan-out for model calls
+# -----------------------------
+# Global in-flight cap: the shared worker pool is sized to it, so no more than
+# LLM_MAX_INFLIGHT model calls run at once across all concurrent requests.
+LLM_MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", "16"))
+# Per-request cap: how many of one request's calls may be in flight at once.
+BOT_MAX_CONCURRENCY = int(os.getenv("BOT_MAX_CONCURRENCY", "8"))
+# Per-call deadline (seconds), measured from when the call starts running.
+BOT_CALL_TIMEOUT = float(os.getenv("BOT_CALL_TIMEOUT", "60"))
+
+_pool_lock = threading.Lock()
+_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, LLM_MAX_INFLIGHT), thread_name_prefix="llm")
+        return _pool
+
+
+def run_bounded(tasks: List[Tuple[str, Callable[[], Any]]],
+                fallback: Callable[[str, BaseException], Any],
+                max_concurrency: Optional[int] = None,
+                timeout: Optional[float] = None,
+                on_done: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+    """
+    Run (key, fn) tasks on the shared pool with at most `max_concurrency` of
+    them in flight for this caller. A task that raises, or that runs longer
+    than `timeout` seconds, is replaced by `fallback(key, exc)`.
+    Results come back keyed in the same order as `tasks`.
+    `on_done(key, result)` fires as each task settles (including fallbacks).
+    """
+    limit = max(1, min(max_concurrency or BOT_MAX_CONCURRENCY, LLM_MAX_INFLIGHT))
+    deadline_s = BOT_CALL_TIMEOUT if timeout is None else timeout
+    pool = _get_pool()
+
+    results: Dict[str, Any] = {}
+    started: Dict[str, float] = {}
+    queue = list(tasks)
+    pending: Dict[Future, str] = {}
+
+    def _settle(key: str, value: Any):
+        results[key] = value
+        if on_done:
+            on_done(key, value)
+
+    def _wrap(key: str, fn: Callable[[], Any]) -> Callable[[], Any]:
+        def _run():
+            started[key] = time.monotonic()
+            return fn()
+        return _run
+
+    while queue or pending:
+        while queue and len(pending) < limit:
+            key, fn = queue.pop(0)
+            # each task runs in a copy of the caller's context (per-run timings etc.)
+            pending[pool.submit(contextvars.copy_context().run, _wrap(key, fn))] = key
+
+        done, _ = wait(list(pending), timeout=0.05, return_when=FIRST_COMPLETED)
+        for fut in done:
+            key = pending.pop(fut)
+            try:
+                value = fut.result()
+            except Exception as e:
+                value = fallback(key, e)
+            # outside the try: an on_done error (e.g. a cancelled job) must propagate,
+            # not be mistaken for a task failure and settle the key a second time
+            _settle(key, value)
+
+        # Give up on calls past their deadline; their worker frees itself once
+        # the underlying HTTP call returns or hits the client timeout.
+        if deadline_s and deadline_s > 0:
+            now = time.monotonic()
+            for fut, key in list(pending.items()):
+                t0 = started.get(key)
+                if t0 is not None and now - t0 > deadline_s:
+                    pending.pop(fut)
+                    fut.cancel()
+                    _settle(key, fallback(key, TimeoutError(f"call exceeded {deadline_s:g}s")))
+
+    return {key: results[key] for key, _ in tasks}
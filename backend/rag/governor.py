@@ -0,0 +1,135 @@
+import os, time, threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+# -----------------------------
+# Process-wide rate governor for model calls (RPM + TPM token buckets, FIFO)
+# -----------------------------
+# Requests and tokens per minute allowed to leave this process (0 = no limit).
+# Set them a little under the account's tier limits.
+LLM_RPM = float(os.getenv("LLM_RPM", "0"))
+LLM_TPM = float(os.getenv("LLM_TPM", "0"))
+# Rough prompt size estimate used before the real usage is known.
+CHARS_PER_TOKEN = float(os.getenv("LLM_CHARS_PER_TOKEN", "4"))
+
+
+def estimate_tokens(system: str, user: str, max_tokens: int) -> int:
+    """Prompt tokens (from character count) plus the full output budget."""
+    return int((len(system) + len(user)) / CHARS_PER_TOKEN) + int(max_tokens)
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute`/60 per second up to `per_minute`. May go negative (debt)."""
+
+    def __init__(self, per_minute: float):
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute
+        self.level = per_minute
+        self._t = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._t) * self.rate)
+        self._t = now
+
+    def wait_for(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (0 if it is now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)  # a single oversize request waits for a full bucket, not forever
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= amount
+
+    def give(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class Governor:
+    """
+    Admits model calls in arrival order: only the caller at the head of the
+    queue may take from the buckets, so a big request can't be starved by a
+    stream of small ones. acquire() returns the tokens it reserved;
+    settle() corrects the TPM bucket once the real usage is known.
+    """
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM):
+        self.rpm = TokenBucket(rpm) if rpm > 0 else None
+        self.tpm = TokenBucket(tpm) if tpm > 0 else None
+        self._cond = threading.Condition()
+        self._queue: deque = deque()
+        self._ticket = 0
+        self.counters = {"admitted": 0, "timeouts": 0, "wait_s_total": 0.0, "max_wait_s": 0.0,
+                         "max_queue_depth": 0, "tokens_reserved": 0, "tokens_used": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.rpm is not None or self.tpm is not None
+
+    def acquire(self, tokens: int, deadline: Optional[float] = None) -> int:
+        """
+        Block until one request and `tokens` tokens are available, in FIFO order.
+        Raises TimeoutError if that can't happen before `deadline` (time.monotonic()).
+        """
+        if not self.enabled:
+            return 0
+        t0 = time.monotonic()
+        with self._cond:
+            self._ticket += 1
+            me = self._ticket
+            self._queue.append(me)
+            self.counters["max_queue_depth"] = max(self.counters["max_queue_depth"], len(self._queue))
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = None
+                    if self._queue[0] == me:
+                        wait = max(self.rpm.wait_for(1, now) if self.rpm else 0.0,
+                                   self.tpm.wait_for(tokens, now) if self.tpm else 0.0)
+                        if wait <= 0:
+                            if self.rpm:
+                                self.rpm.take(1)
+                            if self.tpm:
+                                self.tpm.take(tokens)
+                            break
+                    if deadline is not None and now >= deadline:
+                        self.counters["timeouts"] += 1
+                        raise TimeoutError("rate governor: no capacity before the call deadline")
+                    if deadline is not None:
+                        wait = min(wait if wait is not None else deadline - now, deadline - now)
+                    self._cond.wait(timeout=wait)
+            finally:
+                self._queue.remove(me)
+                self._cond.notify_all()
+            waited = time.monotonic() - t0
+            self.counters["admitted"] += 1
+            self.counters["wait_s_total"] += waited
+            self.counters["max_wait_s"] = max(self.counters["max_wait_s"], waited)
+            self.counters["tokens_reserved"] += tokens
+        return tokens
+
+    def settle(self, reserved: int, used: Optional[int]):
+        """Return over-reserved tokens (or charge the overrun) once usage is known."""
+        if used is None:
+            return
+        with self._cond:
+            self.counters["tokens_used"] += used
+            if self.tpm is None:
+                return
+            if used < reserved:
+                self.tpm.give(reserved - used)
+                self._cond.notify_all()
+            elif used > reserved:
+                self.tpm.take(used - reserved)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            out: Dict[str, Any] = {"enabled": self.enabled, "queue_depth": len(self._queue), **self.counters}
+            for name, b in (("rpm", self.rpm), ("tpm", self.tpm)):
+                if b is not None:
+                    b._refill(now)
+                    out[name] = {"limit": b.capacity, "available": round(b.level, 1)}
+        out["wait_s_total"] = round(out["wait_s_total"], 3)
+        out["max_wait_s"] = round(out["max_wait_s"], 3)
+        out["avg_wait_s"] = round(out["wait_s_total"] / out["admitted"], 4) if out["admitted"] else 0.0
+        return out
@@ -0,0 +1,174 @@
+import os, re, json, hashlib, difflib
+from typing import Any, Dict, List, Optional, Tuple
+
+# -----------------------------
+# Incremental re-analysis: reuse sections of the previous rag_{i}.json
+# -----------------------------
+# A bot's earlier output is reused when its other inputs (prompt, snippets,
+# params) are identical and the draft changed by at most this fraction of words,
+# or in at most INCREMENTAL_MAX_SENTENCES sentences (a one-sentence fix in a
+# long draft is often several percent of its words).
+INCREMENTAL_MAX_CHANGE = float(os.getenv("INCREMENTAL_MAX_CHANGE", "0.01"))
+INCREMENTAL_MAX_SENTENCES = int(os.getenv("INCREMENTAL_MAX_SENTENCES", "1"))
+# Personas describe who reads the story rather than its wording, so they are
+# kept across bigger edits (and audience scores stay comparable between runs).
+INCREMENTAL_PERSONA_MAX_CHANGE = float(os.getenv("INCREMENTAL_PERSONA_MAX_CHANGE", "0.25"))
+
+_SENTENCES = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+def fingerprint(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def usable(result: Any) -> bool:
+    """False for the placeholder a failed model call leaves behind (see app._editorial_fallback)."""
+    return isinstance(result, dict) and "_error" not in result and result.get("_model") not in ("unavailable", "n/a")
+
+
+def snippets_fingerprint(hits: List[Dict[str, Any]]) -> str:
+    return fingerprint([(h["source"], h["chunk_index"], h["text"]) for h in hits])
+
+
+def pack_query_hits(queries: List[str], per_query: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Per-query hits for the artifact, so the next run only re-retrieves queries
+    whose text changed: (chunk key, score) refs per query fingerprint, and each
+    chunk's text stored once.
+    """
+    packed: Dict[str, Any] = {"queries": {}, "chunks": {}}
+    for q, hits in zip(queries, per_query):
+        refs = []
+        for h in hits:
+            key = f"{h['source']}#{h['chunk_index']}"
+            packed["chunks"].setdefault(key, {k: h[k] for k in ("source", "chunk_index", "text", "pages") if k in h})
+            refs.append([key, h["score"]])
+        packed["queries"][fingerprint(q)] = refs
+    return packed
+
+
+def draft_change(old: str, new: str) -> float:
+    """Fraction of words that differ between two drafts (0 = identical)."""
+    if old == new:
+        return 0.0
+    a, b = old.split(), new.split()
+    return round(1.0 - difflib.SequenceMatcher(None, a, b, autojunk=False).ratio(), 4)
+
+
+def sentence_diff(old: str, new: str) -> Dict[str, Any]:
+    """Sentence-level diff: how many were added/removed and which new sentences changed."""
+    a = [s.strip() for s in _SENTENCES.split(old) if s.strip()]
+    b = [s.strip() for s in _SENTENCES.split(new) if s.strip()]
+    added, removed, changed = 0, 0, []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        removed += i2 - i1
+        added += j2 - j1
+        changed.extend(range(j1, j2))
+    return {"sentences_added": added, "sentences_removed": removed, "changed_sentence_idx": changed}
+
+
+def load_previous(community_dir: str, artifact_idx: int,
+                  base_artifact: Optional[int] = None) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """
+    The run to diff against: `base_artifact` if given, else the file this run
+    overwrites, else the newest rag_{j}.json before it.
+    """
+    if base_artifact is not None:
+        candidates = [int(base_artifact)]
+    else:
+        existing = []
+        try:
+            for name in os.listdir(community_dir):
+                m = re.match(r"rag_(\d+)\.json$", name)
+                if m and int(m.group(1)) <= artifact_idx:
+                    existing.append(int(m.group(1)))
+        except FileNotFoundError:
+            return None
+        candidates = sorted(existing, reverse=True)
+    for j in candidates:
+        path = os.path.join(community_dir, f"rag_{j}.json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                prev = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"[incremental] skipping {path}: {e}")
+            continue
+        if (prev.get("input") or {}).get("draft") is not None:
+            return j, prev
+    return None
+
+
+class Reuse:
+    """
+    What a previous run can contribute to this one. Runs written before
+    fingerprints were recorded contribute nothing, so the first run after an
+    upgrade is always a full one.
+    """
+
+    def __init__(self, base_artifact: Optional[int], prev: Optional[Dict[str, Any]], draft: str):
+        self.base_artifact = base_artifact
+        self.prev = prev or {}
+        self.info = self.prev.get("incremental") or {}
+        self.fps: Dict[str, Any] = self.info.get("fingerprints") or {}
+        old = (self.prev.get("input") or {}).get("draft")
+        self.change = draft_change(old, draft) if old is not None else 1.0
+        self.diff = sentence_diff(old, draft) if old is not None else None
+        self.sections: Dict[str, Any] = {"per_bot": {}, "per_audience": {}}
+
+    def small_edit(self) -> bool:
+        """True if the draft barely moved: few words, or few sentences, changed."""
+        if self.change <= INCREMENTAL_MAX_CHANGE:
+            return True
+        return self.diff is not None and max(self.diff["sentences_added"],
+                                             self.diff["sentences_removed"]) <= INCREMENTAL_MAX_SENTENCES
+
+    def query_hits(self, sig: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Previous hits per query fingerprint (see pack_query_hits), if retrieval ran with the same `sig`."""
+        if self.info.get("retrieval_sig") != sig:
+            return {}
+        packed = self.info.get("query_hits") or {}
+        chunks = packed.get("chunks") or {}
+        out = {}
+        for qfp, refs in (packed.get("queries") or {}).items():
+            if all(key in chunks for key, _ in refs):
+                out[qfp] = [{**chunks[key], "score": score} for key, score in refs]
+        return out
+
+    def personas(self, fp: str) -> Optional[List[Dict[str, Any]]]:
+        if self.change <= INCREMENTAL_PERSONA_MAX_CHANGE and self.fps.get("personas") == fp:
+            return (self.prev.get("audience") or {}).get("personas")
+        return None
+
+    def output(self, section: str, key: str, fp: str) -> Optional[Dict[str, Any]]:
+        """
+        Previous result for per_bot/per_audience `key` if its fingerprint matches
+        (so it saw the same snippets), the draft barely moved and the call had
+        not failed.
+        """
+        if not self.small_edit() or (self.fps.get(section) or {}).get(key) != fp:
+            return None
+        group = "editorial" if section == "per_bot" else "audience"
+        result = ((self.prev.get(group) or {}).get(section) or {}).get(key)
+        return result if usable(result) else None
+
+    def mark_queries(self, reused: int, total: int):
+        """Retrieval is "reused", "partial" (only changed queries re-ran) or "fresh"."""
+        self.sections["retrieval"] = "reused" if reused == total else "partial" if reused else "fresh"
+        self.sections["retrieval_queries"] = {"reused": reused, "fresh": total - reused}
+
+    def mark(self, section: str, key: Optional[str], reused: bool):
+        status = "reused" if reused else "fresh"
+        if key is None:
+            self.sections[section] = status
+        else:
+            self.sections[section][key] = status
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "base_artifact": self.base_artifact,
+            "draft_change": self.change if self.base_artifact is not None else None,
+            "diff": self.diff,
+            "sections": self.sections,
+        }
@@ -0,0 +1,384 @@
+import os, time, shutil, threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import faiss
+
+from chunk_store import ChunkStore
+import ann
+
+# -----------------------------
+# Process-wide FAISS index + metadata, loaded once and kept in memory
+# -----------------------------
+# Deleted rows are tombstoned and filtered out at search time; once they make
+# up COMPACT_DEAD_RATIO of the index (and number at least COMPACT_MIN_DEAD) the
+# index and chunk store are rebuilt from the live rows in the background.
+COMPACT_DEAD_RATIO = float(os.getenv("COMPACT_DEAD_RATIO", "0.2"))
+COMPACT_MIN_DEAD = int(os.getenv("COMPACT_MIN_DEAD", "1000"))
+# A compacted store and its index are staged together in <chunks>.compact; this
+# file marks the staged copy complete, so a swap cut short is finished on restart.
+COMPACT_MARKER = "compaction.done"
+
+def _file_sig(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class IndexManager:
+    """
+    Owns the FAISS index and its row-aligned chunk store for the whole process.
+    Searches are served from memory; writes go through add()/reset() so the
+    in-memory copy and the files on disk stay in step. If another process
+    rewrites index.faiss or the chunk store, the next access notices the
+    changed mtime/size and reloads. `generation` bumps on every change.
+    A legacy meta.jsonl at `legacy_meta_path` is migrated into the store once.
+    The FAISS backend follows ann.INDEX_KIND; when the corpus grows past the
+    promotion threshold, or past the lists an IVF index was trained with, it
+    is rebuilt on a background thread and swapped in.
+    Vectors for a rebuild are read back from the index, except from a lossy
+    (PQ) one, whose stored texts are re-embedded with `embed_fn` instead.
+    Rows are deleted by chunk id or by source: a deleted row keeps its FAISS
+    position (so rows stay aligned) but is excluded from every search through
+    an id selector, until compaction drops it. Compaction stages the new store
+    and index side by side and swaps them in as one step that a restart
+    finishes if it was interrupted (see _finish_compaction).
+    """
+
+    def __init__(self, index_path: str, chunk_dir: str, dim: int, legacy_meta_path: Optional[str] = None,
+                 embed_fn: Optional[Callable[[List[str]], np.ndarray]] = None):
+        self.index_path = index_path
+        self.dim = dim
+        self.embed_fn = embed_fn
+        self.generation = 0
+        self._epoch = 0  # bumps when rows are renumbered or the index object is replaced
+        self._lock = threading.RLock()
+        self._index: Optional[faiss.Index] = None
+        self._sig: Tuple[Any, Any] = (None, None)
+        self._loaded = False
+        self._sel_key: Optional[Tuple[int, int]] = None
+        self._sel: Optional[faiss.IDSelector] = None
+        self._sel_bits: Optional[np.ndarray] = None
+        self._worker: Optional[threading.Thread] = None
+        self._task: Optional[str] = None
+        self._finish_compaction(chunk_dir)
+        self._meta = ChunkStore(chunk_dir)
+        if legacy_meta_path and os.path.exists(legacy_meta_path) and len(self._meta) == 0:
+            self._meta.migrate_from_jsonl(legacy_meta_path)
+
+    # ---------- loading ----------
+    def _disk_sig(self) -> Tuple[Any, Any]:
+        return (_file_sig(self.index_path), self._meta.signature())
+
+    def _read_index(self) -> faiss.Index:
+        if os.path.exists(self.index_path):
+            return faiss.read_index(self.index_path)
+        return ann.new_index("flat", self.dim)  # cosine via normalized inner product; promoted once trainable
+
+    def _reload(self):
+        sig = self._disk_sig()
+        self._index = self._read_index()
+        self._meta.refresh()
+        self._sig = sig
+        self._loaded = True
+        self.generation += 1
+        self._epoch += 1
+        if self._index.ntotal != len(self._meta):
+            print(f"[index] warning: index has {self._index.ntotal} vectors but meta has {len(self._meta)} rows")
+
+    def _ensure_fresh(self):
+        if not self._loaded or self._disk_sig() != self._sig:
+            self._reload()
+
+    # ---------- reads ----------
+    def __len__(self) -> int:
+        """Live (searchable) chunks."""
+        with self._lock:
+            self._ensure_fresh()
+            return len(self._meta) - self._meta.dead_count()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._ensure_fresh()
+            rows, dead = len(self._meta), self._meta.dead_count()
+            return {"chunks": rows - dead, "rows": rows, "tombstones": dead,
+                    "generation": self.generation, "kind": ann.kind_of(self._index),
+                    "compacting": self._busy() == "compaction", "maintenance": self._busy()}
+
+    @property
+    def kind(self) -> str:
+        with self._lock:
+            self._ensure_fresh()
+            return ann.kind_of(self._index)
+
+    def search(self, q: np.ndarray, k: int, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, ChunkStore]:
+        """
+        Search normalized query rows; returns (D, I, meta) where meta[I[r][c]] is the hit's row.
+        `nprobe` (IVF) / `ef_search` (HNSW) trade recall for latency on this call only.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            k = min(k, len(self._meta) - self._meta.dead_count())
+            if k <= 0 or self._index.ntotal == 0:
+                empty = np.empty((q.shape[0], 0))
+                return empty, empty.astype("int64"), self._meta
+            sel = self._live_selector()
+            if sel is None:
+                ann.set_search_params(self._index, nprobe=nprobe, ef_search=ef_search)
+                D, I = self._index.search(q, k)
+            else:
+                D, I = self._index.search(q, k, params=ann.search_params(self._index, sel, nprobe, ef_search))
+            return D, I, self._meta
+
+    def _live_selector(self) -> Optional[faiss.IDSelector]:
+        """Bitmap selector over the live rows, or None while nothing is deleted. Cached per generation."""
+        dead = self._meta.dead_mask()
+        if not dead.any():
+            return None
+        key = (self._index.ntotal, self.generation)
+        if self._sel_key != key:
+            live = np.zeros(self._index.ntotal, dtype=bool)
+            m = min(len(live), len(dead))
+            live[:m] = ~dead[:m]
+            self._sel_bits = np.packbits(live, bitorder="little")  # the selector points into this buffer
+            self._sel = faiss.IDSelectorBitmap(len(self._sel_bits), faiss.swig_ptr(self._sel_bits))
+            self._sel_key = key
+        return self._sel
+
+    def existing_ids(self, ids: List[str]) -> set:
+        """Which of these chunk ids are already indexed."""
+        with self._lock:
+            self._ensure_fresh()
+            return self._meta.has_ids(ids)
+
+    # ---------- writes ----------
+    def add(self, vecs: np.ndarray, rows: List[Dict[str, Any]]):
+        """Append vectors and their metadata rows, persisting both."""
+        if len(rows) != vecs.shape[0]:
+            raise ValueError(f"{vecs.shape[0]} vectors but {len(rows)} meta rows")
+        with self._lock:
+            self._ensure_fresh()
+            self._index.add(vecs)
+            faiss.write_index(self._index, self.index_path)
+            self._meta.append(rows)
+            self._sig = self._disk_sig()
+            self.generation += 1
+            if ann.needs_rebuild(self._index):
+                self._in_background("promotion", self._rebuild)
+
+    def _vectors(self, index: faiss.Index, start: int, stop: int) -> Optional[np.ndarray]:
+        """
+        Vectors of rows [start, stop) for building another index, or None if
+        they have to be re-embedded (see _reembed). Call under the lock.
+        """
+        if ann.kind_of(index) in ann.LOSSY_KINDS:
+            if self.embed_fn is None:
+                raise ValueError(f"{ann.kind_of(index)} only holds approximate vectors; rebuilding it needs embed_fn")
+            return None
+        if isinstance(index, faiss.IndexIVF):
+            index.make_direct_map()
+        return index.reconstruct_n(start, stop - start)
+
+    def _reembed(self, rows: Sequence[int], batch: int = 4096) -> np.ndarray:
+        """Embed the stored texts of these rows again."""
+        out = [np.empty((0, self.dim), dtype="float32")]
+        for i in range(0, len(rows), batch):
+            texts = [self._meta[int(r)]["text"] for r in rows[i:i + batch]]
+            out.append(np.asarray(self.embed_fn(texts), dtype="float32"))
+        return np.vstack(out)
+
+    def _rebuild(self, kind: Optional[str] = None) -> bool:
+        """
+        Rebuild every row into a `kind` index (default: ann.target_kind for its
+        size, which may be the current kind retrained with more IVF lists) and
+        swap it in. Training and adding run outside the lock, so searches and
+        ingests carry on; rows appended meanwhile are added to the new index
+        before the swap. False if rows were renumbered meanwhile.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            epoch, n0 = self._epoch, self._index.ntotal
+            current = ann.kind_of(self._index)
+            kind = kind or ann.target_kind(current, n0)
+            vecs = self._vectors(self._index, 0, n0)
+        t0 = time.perf_counter()
+        print(f"[index] rebuilding {current} -> {kind} over {n0} vectors")
+        try:
+            if vecs is None:
+                vecs = self._reembed(range(n0))
+        except IndexError:
+            return False  # the store was swapped out underneath us
+        index = ann.build(kind, vecs, self.dim)
+        with self._lock:
+            self._ensure_fresh()
+            if self._epoch != epoch:
+                return False
+            n1 = self._index.ntotal
+            if n1 > n0:
+                tail = self._vectors(self._index, n0, n1)
+                index.add(self._reembed(range(n0, n1)) if tail is None else tail)
+            faiss.write_index(index, self.index_path + ".tmp")
+            os.replace(self.index_path + ".tmp", self.index_path)
+            self._index = index
+            self._sig = self._disk_sig()
+            self.generation += 1
+            self._epoch += 1
+        print(f"[index] rebuilt {current} -> {kind} over {n1} vectors in {time.perf_counter() - t0:.2f}s")
+        return True
+
+    def rebuild(self, kind: str, attempts: int = 5) -> str:
+        """Rebuild the current vectors into a `kind` index (retrains IVF/PQ) and persist it."""
+        if kind not in ann.KINDS:
+            raise ValueError(f"Unknown index kind: {kind!r} (expected one of {ann.KINDS})")
+        with self._lock:
+            self._ensure_fresh()
+            need = ann.min_train_size(kind, self._index.ntotal)
+            if self._index.ntotal < need:
+                raise ValueError(f"{kind} needs at least {need} vectors to train; index has {self._index.ntotal}")
+        for _ in range(attempts):
+            if self._rebuild(kind):
+                return kind
+            time.sleep(1.0)
+        raise ValueError("Rebuild abandoned: the index kept changing underneath it")
+
+    # ---------- deletes ----------
+    def delete_ids(self, ids: List[str]) -> int:
+        """Tombstone every live row holding one of these chunk ids; returns how many."""
+        with self._lock:
+            self._ensure_fresh()
+            return self._deleted(self._meta.tombstone(self._meta.rows_for_ids(ids)))
+
+    def delete_sources(self, labels: List[str] = (), prefixes: List[str] = (),
+                       keep_ids: Optional[set] = None) -> int:
+        """
+        Tombstone the live rows of these sources (exact labels, or labels starting
+        with a prefix), sparing rows whose id is in `keep_ids`; returns how many.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            rows = self._meta.rows_for_sources(labels, prefixes, keep_ids=keep_ids)
+            return self._deleted(self._meta.tombstone(rows))
+
+    def _deleted(self, n: int) -> int:
+        if n:
+            self._sig = self._disk_sig()
+            self.generation += 1
+            if self.needs_compaction():
+                self.compact_async()
+        return n
+
+    # ---------- compaction ----------
+    def needs_compaction(self) -> bool:
+        with self._lock:
+            dead = self._meta.dead_count()
+            return dead >= max(1, COMPACT_MIN_DEAD) and dead >= COMPACT_DEAD_RATIO * len(self._meta)
+
+    def compact_async(self, attempts: int = 5) -> bool:
+        """Compact on a background thread; False if another rebuild is already running."""
+        return self._in_background("compaction", self.compact, attempts)
+
+    def _busy(self) -> Optional[str]:
+        """Name of the background rebuild in progress, if any."""
+        return self._task if self._worker and self._worker.is_alive() else None
+
+    def _in_background(self, task: str, fn: Callable[[], bool], attempts: int = 5) -> bool:
+        """
+        Run `fn` (a rebuild returning False when it had to be discarded) on the
+        maintenance thread, retrying up to `attempts` times. One rebuild runs at
+        a time; False if one is already running.
+        """
+        with self._lock:
+            if self._busy():
+                return False
+            self._task = task
+            self._worker = threading.Thread(target=self._retry, args=(task, fn, attempts),
+                                            name=f"index-{task}", daemon=True)
+            self._worker.start()
+            return True
+
+    def _retry(self, task: str, fn: Callable[[], bool], attempts: int):
+        for _ in range(attempts):
+            try:
+                if fn():
+                    return
+            except Exception as e:
+                print(f"[index] {task} failed: {type(e).__name__}: {e}")
+                return
+            time.sleep(1.0)
+        print(f"[index] {task} skipped: the index kept changing underneath it")
+
+    def compact(self) -> bool:
+        """
+        Rebuild the index and chunk store from the live rows, dropping tombstoned
+        rows and repeated ids. The rebuild runs outside the lock, so searches
+        and ingests carry on; if the index changed meanwhile the result is
+        discarded and False returned. A lossy (PQ) index is rebuilt from the
+        re-embedded texts rather than its own reconstructions, which would lose
+        precision on every compaction.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            gen, before = self.generation, len(self._meta)
+            rows = self._meta.compaction_rows()
+            if len(rows) == before:
+                return True
+            vecs = self._vectors(self._index, 0, self._index.ntotal)
+            kind = ann.kind_of(self._index)
+        t0 = time.perf_counter()
+        try:
+            vecs = self._reembed(rows) if vecs is None else vecs[rows]
+        except IndexError:
+            return False  # the store was swapped out underneath us
+        if len(rows) < ann.min_train_size(kind, len(rows)):
+            kind = "flat"
+        index = ann.build(kind, vecs, self.dim)
+        staged = self._meta.root + ".compact"
+        self._meta.copy_rows(rows, staged)
+        faiss.write_index(index, os.path.join(staged, "index.faiss"))
+        with self._lock:
+            self._ensure_fresh()
+            if self.generation != gen:
+                shutil.rmtree(staged, ignore_errors=True)
+                return False
+            open(os.path.join(staged, COMPACT_MARKER), "w").close()
+            self._finish_compaction(self._meta.root)
+            self._index = index
+            self._meta.refresh()
+            self._sig = self._disk_sig()
+            self.generation += 1
+            self._epoch += 1
+        print(f"[index] compacted {before} -> {len(rows)} rows ({kind}) in {time.perf_counter() - t0:.2f}s")
+        return True
+
+    def _finish_compaction(self, chunk_dir: str):
+        """
+        Swap a complete staged compaction in: the store directory first, then
+        its index.faiss. The marker travels with the store and is removed last,
+        so each step can be redone after a crash; a store holding the marker is
+        never read with the index it replaced. An incomplete staged copy is left
+        for the next compaction to overwrite.
+        """
+        staged, old = chunk_dir + ".compact", chunk_dir + ".old"
+        if os.path.exists(os.path.join(staged, COMPACT_MARKER)):
+            if os.path.isdir(chunk_dir):
+                shutil.rmtree(old, ignore_errors=True)
+                os.replace(chunk_dir, old)
+            os.replace(staged, chunk_dir)
+        marker = os.path.join(chunk_dir, COMPACT_MARKER)
+        if os.path.exists(marker):
+            staged_index = os.path.join(chunk_dir, "index.faiss")
+            if os.path.exists(staged_index):
+                os.replace(staged_index, self.index_path)
+            os.remove(marker)
+        shutil.rmtree(old, ignore_errors=True)
+
+    def reset(self):
+        """Drop the index and metadata on disk and in memory."""
+        with self._lock:
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+            self._meta.reset()
+            self._reload()
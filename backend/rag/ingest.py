@@ -0,0 +1,111 @@
+import os, time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# -----------------------------
+# Streaming ingestion: docs -> chunks -> length-sorted batches -> embed -> index
+# -----------------------------
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "64"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+# how many batches to gather before sorting by length (bigger = less padding, more RAM)
+INGEST_SORT_WINDOW = int(os.getenv("INGEST_SORT_WINDOW", "16"))
+# commit to the index every this many new rows so memory stays bounded on big runs
+INGEST_FLUSH_ROWS = int(os.getenv("INGEST_FLUSH_ROWS", "50000"))
+
+Row = Dict[str, Any]
+
+
+def run_ingest(docs: Iterable[Tuple[str, str]],
+               chunk_fn: Callable[[Any], Iterable[str]],
+               select_fn: Callable[[str, List[str], int], List[Row]],
+               embed_fn: Callable[[List[str], int], np.ndarray],
+               commit_fn: Callable[[np.ndarray, List[Row]], None],
+               batch_size: Optional[int] = None,
+               workers: Optional[int] = None,
+               progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Pull (source_label, text) docs lazily, chunk them, and keep the rows that
+    `select_fn(source_label, chunks, first_chunk_index)` says still need
+    indexing. A document's chunks are consumed in window-sized groups, so one
+    huge document doesn't have to be chunked in full before embedding starts.
+    Rows from many documents are pooled, sorted by text length and cut into
+    `batch_size` batches so each encode call is full and evenly padded. Batches are embedded on `workers` threads;
+    `commit_fn(vectors, rows)` persists them every INGEST_FLUSH_ROWS rows and
+    at the end. `progress(stats)` is called after every window.
+    """
+    batch_size = max(1, batch_size or INGEST_BATCH_SIZE)
+    workers = max(1, workers or INGEST_WORKERS)
+    window_rows = batch_size * max(1, INGEST_SORT_WINDOW)
+
+    stats = {"docs_seen": 0, "ingested_docs": 0, "ingested_chunks": 0, "skipped_chunks": 0, "batches": 0}
+    t0 = time.perf_counter()
+    pending: List[Row] = []
+    done_vecs: List[np.ndarray] = []
+    done_rows: List[Row] = []
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") if workers > 1 else None
+
+    def _embed_window(rows: List[Row]):
+        rows = sorted(rows, key=lambda r: len(r["text"]))
+        batches = [rows[i:i+batch_size] for i in range(0, len(rows), batch_size)]
+        texts = [[r["text"] for r in b] for b in batches]
+        if pool:
+            vecs = list(pool.map(lambda t: embed_fn(t, batch_size), texts))
+        else:
+            vecs = [embed_fn(t, batch_size) for t in texts]
+        for b, v in zip(batches, vecs):
+            done_rows.extend(b)
+            done_vecs.append(v)
+        stats["batches"] += len(batches)
+        stats["ingested_chunks"] += len(rows)
+
+    def _flush():
+        if done_rows:
+            commit_fn(np.vstack(done_vecs).astype("float32"), list(done_rows))
+            done_rows.clear()
+            done_vecs.clear()
+
+    def _report():
+        stats["elapsed_s"] = round(time.perf_counter() - t0, 3)
+        if progress:
+            progress(dict(stats))
+        else:
+            print(f"[ingest] {stats['docs_seen']} docs, {stats['ingested_chunks']} chunks embedded, "
+                  f"{stats['skipped_chunks']} skipped ({stats['elapsed_s']}s)")
+
+    try:
+        for src_label, text in docs:
+            stats["docs_seen"] += 1
+            chunks = iter(chunk_fn(text))
+            offset, has_new = 0, False
+            while True:
+                group = list(islice(chunks, window_rows))
+                if not group:
+                    break
+                rows = select_fn(src_label, group, offset)
+                offset += len(group)
+                stats["skipped_chunks"] += len(group) - len(rows)
+                if not rows:
+                    continue
+                has_new = True
+                pending.extend(rows)
+                if len(pending) >= window_rows:
+                    _embed_window(pending)
+                    pending = []
+                    if len(done_rows) >= INGEST_FLUSH_ROWS:
+                        _flush()
+                    _report()
+            if has_new:
+                stats["ingested_docs"] += 1
+        if pending:
+            _embed_window(pending)
+        _flush()
+    finally:
+        if pool:
+            pool.shutdown(wait=True)
+
+    _report()
+    return stats
@@ -0,0 +1,220 @@
+import os, json, time, uuid, socket, sqlite3, threading
+from typing import Any, Callable, Dict, List, Optional
+
+# -----------------------------
+# Persistent background job queue (SQLite) for long-running analyses
+# -----------------------------
+# How many jobs this process runs at once.
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Refuse new submissions once this many jobs are waiting (0 = unbounded).
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "100"))
+# A running job whose heartbeat is older than this is assumed orphaned
+# (its process died) and is handed to the next free worker.
+JOB_STALE_S = float(os.getenv("JOB_STALE_S", "900"))
+# A job is started at most this many times; one that keeps taking its worker's
+# process down with it is failed instead of being handed out again.
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# Finished jobs are pruned after this many seconds.
+JOB_RETENTION_S = float(os.getenv("JOB_RETENTION_S", str(7 * 24 * 3600)))
+
+STATUSES = ("queued", "running", "done", "failed", "cancelled")
+FINAL = ("done", "failed", "cancelled")
+
+Runner = Callable[[Dict[str, Any], Callable[[str, Dict[str, Any]], None]], Dict[str, Any]]
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueue:
+    """
+    Jobs live in one SQLite table, so they survive restarts and several
+    processes can share a queue file. `runner(body, emit)` does the work;
+    every emit() is folded into the job's `partial` snapshot, refreshes its
+    heartbeat and is where a requested cancellation takes effect.
+    """
+
+    def __init__(self, path: str, runner: Runner, workers: Optional[int] = None):
+        self.path = path
+        self.runner = runner
+        self.workers = max(1, workers or JOB_WORKERS)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._wake = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, body TEXT NOT NULL,"
+            " partial TEXT, result TEXT, error TEXT, cancel INTEGER NOT NULL DEFAULT 0, owner TEXT,"
+            " created REAL NOT NULL, started REAL, finished REAL, heartbeat REAL,"
+            " attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        cols = {r[1] for r in self._db.execute("PRAGMA table_info(jobs)")}
+        if "attempts" not in cols:  # queue files created before attempts were counted
+            self._db.execute("ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created)")
+
+    # ---------- workers ----------
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._work_loop, name=f"job-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Atomically move the oldest queued (or orphaned) job to running and return it.
+        Orphans that already used JOB_MAX_ATTEMPTS starts are failed instead.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute(
+                    "UPDATE jobs SET status='failed', finished=?, error=? "
+                    "WHERE status='running' AND heartbeat < ? AND attempts >= ?",
+                    (now, f"abandoned: its worker died on each of {JOB_MAX_ATTEMPTS} attempts",
+                     now - JOB_STALE_S, JOB_MAX_ATTEMPTS),
+                )
+                row = self._db.execute(
+                    "SELECT id, body FROM jobs WHERE status='queued'"
+                    " OR (status='running' AND heartbeat < ?) ORDER BY created LIMIT 1",
+                    (now - JOB_STALE_S,),
+                ).fetchone()
+                if row:
+                    self._db.execute(
+                        "UPDATE jobs SET status='running', owner=?, started=?, heartbeat=?, partial=NULL,"
+                        " attempts=attempts+1 WHERE id=?",
+                        (self.owner, now, now, row[0]),
+                    )
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return {"id": row[0], "body": json.loads(row[1])} if row else None
+
+    def _work_loop(self):
+        while True:
+            try:
+                job = self._claim()
+            except sqlite3.Error as e:
+                print(f"[jobs] claim failed: {e}")
+                job = None
+            if job is None:
+                with self._wake:
+                    self._wake.wait(timeout=1.0)  # also polls for jobs queued by other processes
+                continue
+            self._run(job)
+
+    def _run(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        partial: Dict[str, Any] = {}
+
+        def emit(event: str, data: Dict[str, Any]):
+            if event in ("per_bot", "per_audience"):
+                partial.setdefault(event, {})[data["id"]] = data["result"]
+            elif event != "report":
+                partial[event] = data
+            with self._lock:
+                self._db.execute("UPDATE jobs SET partial=?, heartbeat=? WHERE id=?",
+                                 (json.dumps(partial, ensure_ascii=False), time.time(), job_id))
+                cancel = self._db.execute("SELECT cancel FROM jobs WHERE id=?", (job_id,)).fetchone()
+            if cancel and cancel[0]:
+                raise JobCancelled()
+
+        print(f"[jobs] {job_id} started")
+        try:
+            result = self.runner(job["body"], emit)
+            self._finish(job_id, "done", result=result)
+        except JobCancelled:
+            self._finish(job_id, "cancelled", error="cancelled while running")
+        except Exception as e:
+            self._finish(job_id, "failed", error=f"{type(e).__name__}: {e}")
+
+    def _finish(self, job_id: str, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status=?, result=?, error=?, finished=? WHERE id=?",
+                (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+                 error, time.time(), job_id),
+            )
+        print(f"[jobs] {job_id} {status}" + (f": {error}" if error else ""))
+
+    # ---------- API ----------
+    def submit(self, body: Dict[str, Any]) -> str:
+        """Queue a job; raises OverflowError if JOB_MAX_QUEUED jobs are already waiting."""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE status IN ('done','failed','cancelled') AND finished < ?",
+                             (now - JOB_RETENTION_S,))
+            if JOB_MAX_QUEUED > 0:
+                waiting = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status='queued'").fetchone()[0]
+                if waiting >= JOB_MAX_QUEUED:
+                    raise OverflowError(f"job queue is full ({waiting} waiting)")
+            self._db.execute("INSERT INTO jobs(id, status, body, created) VALUES (?, 'queued', ?, ?)",
+                             (job_id, json.dumps(body, ensure_ascii=False), now))
+        with self._wake:
+            self._wake.notify()
+        return job_id
+
+    def get(self, job_id: str, with_result: bool = False) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, status, partial, result, error, cancel, created, started, finished, attempts"
+                " FROM jobs WHERE id=?",
+                (job_id,),
+            ).fetchone()
+            position = None
+            if row and row[1] == "queued":
+                position = self._db.execute("SELECT COUNT(*) FROM jobs WHERE status='queued' AND created < ?",
+                                            (row[6],)).fetchone()[0]
+        if not row:
+            return None
+        job = {
+            "id": row[0], "status": row[1], "error": row[4], "cancel_requested": bool(row[5]),
+            "created": row[6], "started": row[7], "finished": row[8], "attempts": row[9],
+            "partial": json.loads(row[2]) if row[2] else {},
+        }
+        if position is not None:
+            job["queue_position"] = position
+        if with_result:
+            job["result"] = json.loads(row[3]) if row[3] else None
+        return job
+
+    def list(self, limit: int = 50, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        q = "SELECT id, status, error, created, started, finished FROM jobs"
+        args: List[Any] = []
+        if status:
+            q += " WHERE status=?"
+            args.append(status)
+        q += " ORDER BY created DESC LIMIT ?"
+        args.append(int(limit))
+        with self._lock:
+            rows = self._db.execute(q, args).fetchall()
+        return [{"id": r[0], "status": r[1], "error": r[2], "created": r[3], "started": r[4], "finished": r[5]}
+                for r in rows]
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a job: queued jobs stop at once, running ones at their next stage. Returns the new status."""
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET status='cancelled', finished=?, error='cancelled before start'"
+                " WHERE id=? AND status='queued'", (time.time(), job_id))
+            if cur.rowcount == 0:
+                self._db.execute("UPDATE jobs SET cancel=1 WHERE id=? AND status='running'", (job_id,))
+            row = self._db.execute("SELECT status FROM jobs WHERE id=?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {"workers": self.workers, "max_queued": JOB_MAX_QUEUED,
+                **{s: counts.get(s, 0) for s in STATUSES}}
@@ -0,0 +1,199 @@
+import os, json
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+# -----------------------------
+# JSON / JSONL corpora -> (source_label, text), one item at a time
+# -----------------------------
+# Characters read per refill. A single item may be larger; the buffer grows to fit it.
+JSON_STREAM_BLOCK = int(os.getenv("JSON_STREAM_BLOCK", str(1 << 20)))
+# ...up to this many characters. A value that still doesn't parse by then is
+# treated as malformed, so a broken item can't pull the rest of a huge file into memory.
+JSON_STREAM_MAX_ITEM = int(os.getenv("JSON_STREAM_MAX_ITEM", str(64 << 20)))
+
+TEXT_KEYS = ("text", "data", "content", "body")
+ARRAY_KEYS = ("sources", "documents", "docs")
+
+Doc = Tuple[str, str]
+
+
+def pick_text(d: Dict[str, Any]) -> str:
+    for k in TEXT_KEYS:
+        v = d.get(k)
+        if isinstance(v, str) and v.strip():
+            return v
+    return ""
+
+
+def item_doc(it: Any, filename: str, fallback: str, allow_str: bool = True) -> Optional[Doc]:
+    """One array item -> (label, text): labelled by its url if it has one, else `fallback`."""
+    if isinstance(it, dict):
+        txt = pick_text(it)
+        if not txt:
+            return None
+        url = it.get("url")
+        url = url.strip() if isinstance(url, str) else ""
+        return (f"{filename}::{url}" if url else f"{filename}::{fallback}", txt)
+    if allow_str and isinstance(it, str) and it.strip():
+        return (f"{filename}::{fallback}", it)
+    return None
+
+
+def _keep(doc: Optional[Doc], out: List[Doc]):
+    if doc:
+        out.append(doc)
+
+
+def docs_from_obj(obj: Any, filename: str) -> List[Doc]:
+    """
+    Normalize many JSON shapes into a list of (source_label, text).
+    Supports:
+      { "sources": [ {url, text|data|content}, ... ] }
+      { "documents" | "docs": [ ..., ... ] }
+      { "text" | "data" | "content": "..." }
+      [ "text...", {"url":"...", "text":"..."} , ... ]
+    """
+    out: List[Doc] = []
+    if isinstance(obj, dict):
+        for key in ARRAY_KEYS:
+            if isinstance(obj.get(key), list):
+                for i, it in enumerate(obj[key]):
+                    # "sources" entries must be objects; the doc arrays may also hold bare strings
+                    _keep(item_doc(it, filename, f"{key[:-1]}_{i+1}", allow_str=key != "sources"), out)
+        single = pick_text(obj)
+        if single:
+            out.append((f"{filename}::single", single))
+    elif isinstance(obj, list):
+        for i, it in enumerate(obj):
+            _keep(item_doc(it, filename, f"item_{i+1}"), out)
+    return out
+
+
+class _Scanner:
+    """Pulls JSON values out of a text stream without reading the whole document."""
+
+    def __init__(self, f: TextIO):
+        self.f = f
+        self.buf = ""
+        self.pos = 0
+        self.offset = 0  # characters dropped from the front of buf so far
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, at_least: int = 0):
+        chunk = self.f.read(max(JSON_STREAM_BLOCK, at_least))
+        if not chunk:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + chunk
+        self.offset += self.pos
+        self.pos = 0
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos] if self.pos < len(self.buf) else ""
+            self._fill()
+
+    def take(self, ch: str):
+        if self.peek() != ch:
+            raise ValueError(f"expected {ch!r} at offset ~{self.offset + self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                v, end = self.decoder.raw_decode(self.buf, self.pos)
+                # a number cut off by the end of the buffer ("12" of "12.5e3") parses fine on its own
+                if self.eof or (end < len(self.buf) and self.buf[end] not in "0123456789.eE+-"):
+                    self.pos = end
+                    return v
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            pending = len(self.buf) - self.pos
+            if pending >= JSON_STREAM_MAX_ITEM:
+                raise ValueError(f"no complete JSON value within {pending} characters at offset ~{self.offset + self.pos}"
+                                 f" (malformed, or larger than JSON_STREAM_MAX_ITEM)")
+            # grow geometrically so one huge item costs O(n log n), not O(n^2)
+            self._fill(at_least=min(pending, JSON_STREAM_MAX_ITEM - pending))
+
+    def items(self) -> Iterator[Any]:
+        self.take("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            c = self.peek()
+            self.take(c if c in (",", "]") else ",")
+            if c == "]":
+                return
+
+
+def iter_json_docs(f: TextIO, filename: str) -> Iterator[Doc]:
+    """
+    Streaming docs_from_obj over an open JSON file: the sources/documents/docs
+    arrays (or a top-level array) are walked one item at a time, so memory is
+    bounded by the largest single item rather than the file. Labels are the
+    same as docs_from_obj's; items come in file order. Raises ValueError on
+    malformed JSON (after yielding whatever preceded it).
+    """
+    sc = _Scanner(f)
+    c = sc.peek()
+    if c == "[":
+        for i, it in enumerate(sc.items()):
+            doc = item_doc(it, filename, f"item_{i+1}")
+            if doc:
+                yield doc
+        return
+    if c != "{":
+        sc.value()  # a bare scalar holds no documents
+        return
+    sc.take("{")
+    singles: Dict[str, Any] = {}
+    if sc.peek() == "}":
+        return
+    while True:
+        key = sc.value()
+        sc.take(":")
+        if key in ARRAY_KEYS and sc.peek() == "[":
+            for i, it in enumerate(sc.items()):
+                doc = item_doc(it, filename, f"{key[:-1]}_{i+1}", allow_str=key != "sources")
+                if doc:
+                    yield doc
+        else:
+            v = sc.value()
+            if key in TEXT_KEYS:
+                singles[key] = v
+        c = sc.peek()
+        sc.take(c if c in (",", "}") else ",")
+        if c == "}":
+            break
+    single = pick_text(singles)
+    if single:
+        yield (f"{filename}::single", single)
+
+
+def iter_jsonl_docs(f: TextIO, filename: str) -> Iterator[Doc]:
+    """
+    One JSON value per line. A line holding a sources/documents/docs corpus is
+    expanded like a .json file; any other line is an item labelled by its url
+    or item_{line number}. Malformed lines are skipped.
+    """
+    for n, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError as e:
+            print(f"[ingest] {filename}:{n}: skipping malformed line ({e})")
+            continue
+        if isinstance(obj, dict) and any(isinstance(obj.get(k), list) for k in ARRAY_KEYS):
+            yield from docs_from_obj(obj, filename)
+            continue
+        doc = item_doc(obj, filename, f"item_{n}")
+        if doc:
+            yield doc
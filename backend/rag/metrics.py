@@ -0,0 +1,161 @@
+import time, threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# -----------------------------
+# Timing spans + Prometheus-style metrics (text exposition, no client library)
+# -----------------------------
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    esc = lambda v: v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name, self.help = name, help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        out += [f"{self.name}{_fmt_labels(k)} {v:g}" for k, v in items]
+        return out
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name, self.help, self.buckets = name, help, buckets
+        self._series: Dict[LabelKey, List[float]] = {}  # bucket counts..., +Inf count, sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = _labels(labels)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    s[i] += 1
+            s[-2] += 1
+            s[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, s in items:
+            for b, n in zip(self.buckets, s):
+                out.append(f"{self.name}_bucket{_fmt_labels(key, ('le', f'{b:g}'))} {n:g}")
+            out.append(f"{self.name}_bucket{_fmt_labels(key, ('le', '+Inf'))} {s[-2]:g}")
+            out.append(f"{self.name}_count{_fmt_labels(key)} {s[-2]:g}")
+            out.append(f"{self.name}_sum{_fmt_labels(key)} {s[-1]:.6f}")
+        return out
+
+
+STAGE_SECONDS = Histogram("echo_stage_seconds", "Wall time of pipeline stages.")
+LLM_CALL_SECONDS = Histogram("echo_llm_call_seconds", "Wall time of one model call attempt (incl. retries).")
+LLM_CALLS = Counter("echo_llm_calls_total", "Model call attempts by serving model and outcome.")
+LLM_TOKENS = Counter("echo_llm_tokens_total", "Tokens reported by the API, by model and kind.")
+LLM_PROMPT_CACHE = Counter("echo_llm_prompt_cache_total",
+                           "Calls with a shared prompt prefix, by model and cache outcome (read|write|ignored|too_short).")
+
+_METRICS: List[Any] = [STAGE_SECONDS, LLM_CALL_SECONDS, LLM_CALLS, LLM_TOKENS, LLM_PROMPT_CACHE]
+_GAUGES: List[Tuple[str, str, Callable[[], List[Tuple[Dict[str, Any], float]]]]] = []
+
+
+def register_gauge(name: str, help: str, fn: Callable[[], List[Tuple[Dict[str, Any], float]]]):
+    """`fn()` returns [(labels, value), ...] and is read at scrape time."""
+    _GAUGES.append((name, help, fn))
+
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _METRICS:
+        lines += m.render()
+    for name, help, fn in _GAUGES:
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} gauge"]
+        try:
+            lines += [f"{name}{_fmt_labels(_labels(lbl))} {float(v):g}" for lbl, v in fn()]
+        except Exception as e:
+            lines.append(f"# {name} unavailable: {type(e).__name__}")
+    return "\n".join(lines) + "\n"
+
+
+# ---------- per-run timings ----------
+class Timings:
+    """Spans recorded while this run's context is active (fanout tasks inherit it)."""
+
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans: List[Dict[str, Any]] = []
+
+    def add(self, stage: str, start: float, seconds: float, **detail: Any):
+        with self._lock:
+            self.spans.append({"stage": stage, "start_ms": round((start - self._t0) * 1000, 1),
+                               "ms": round(seconds * 1000, 1), **detail})
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ms"])
+        stages: Dict[str, Dict[str, Any]] = {}
+        for s in spans:
+            st = stages.setdefault(s["stage"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            st["count"] += 1
+            st["total_ms"] = round(st["total_ms"] + s["ms"], 1)
+            st["max_ms"] = max(st["max_ms"], s["ms"])
+        return {"elapsed_ms": round((time.perf_counter() - self._t0) * 1000, 1), "stages": stages, "spans": spans}
+
+
+_current: ContextVar[Optional[Timings]] = ContextVar("echo_timings", default=None)
+
+
+@contextmanager
+def collect() -> Iterator[Timings]:
+    """Make a fresh Timings the current one for the duration of the block."""
+    t = Timings()
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(stage: str, **detail: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Time a block into echo_stage_seconds{stage} and, if a run is being
+    collected, into its timings. `detail` (and anything the block adds to the
+    yielded dict) goes only to the per-run span, never to metric labels.
+    """
+    extra: Dict[str, Any] = dict(detail)
+    t0 = time.perf_counter()
+    try:
+        yield extra
+    finally:
+        dt = time.perf_counter() - t0
+        STAGE_SECONDS.observe(dt, stage=stage)
+        t = _current.get()
+        if t is not None:
+            t.add(stage, t0, dt, **extra)
@@ -0,0 +1,164 @@
+import io, os, signal, time
+import multiprocessing as mp
+from collections import deque
+from typing import Iterator, Optional, Tuple, Union
+
+from pypdf import PdfReader
+
+# -----------------------------
+# PDF page extraction: in page order, across a process pool, one page at a time
+# -----------------------------
+# Worker processes per document (0 = extract in-process).
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Shorter PDFs aren't worth starting a pool for.
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+# A page that takes longer than this is skipped (pool mode only).
+PDF_PAGE_TIMEOUT_S = float(os.getenv("PDF_PAGE_TIMEOUT_S", "20"))
+# Pages extracted ahead of the consumer, per worker.
+PDF_PREFETCH = int(os.getenv("PDF_PREFETCH", "4"))
+# A wedged pool is replaced by a fresh one at most this many times per
+# document; after that the remaining pages are skipped.
+PDF_POOL_RESTARTS = int(os.getenv("PDF_POOL_RESTARTS", "2"))
+# Start method for the pool. fork is the default: forkserver/spawn avoid forking
+# a threaded server but import the entry module (e.g. app.py, with its model
+# load) again in every worker, so use them only behind a light entry point.
+PDF_START_METHOD = os.getenv("PDF_START_METHOD", "fork").lower()
+
+Source = Union[str, bytes]
+
+_reader: Optional[PdfReader] = None
+
+
+class _PageTimeout(Exception):
+    pass
+
+
+def _open(src: Source) -> PdfReader:
+    return PdfReader(io.BytesIO(src) if isinstance(src, (bytes, bytearray)) else src)
+
+
+def _init_worker(src: Source):
+    global _reader
+    _reader = _open(src)
+
+    def _alarm(signum, frame):
+        raise _PageTimeout()
+    signal.signal(signal.SIGALRM, _alarm)
+
+
+def _page_text(i: int) -> Tuple[int, str, Optional[str]]:
+    """(page index, text, problem) for one page, run inside a worker."""
+    signal.setitimer(signal.ITIMER_REAL, PDF_PAGE_TIMEOUT_S)
+    try:
+        return i, _reader.pages[i].extract_text() or "", None
+    except _PageTimeout:
+        return i, "", "timeout"
+    except Exception as e:
+        return i, "", f"{type(e).__name__}: {e}"
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _pool_context():
+    methods = mp.get_all_start_methods()
+    if PDF_START_METHOD not in methods or not hasattr(signal, "SIGALRM"):
+        return None
+    ctx = mp.get_context(PDF_START_METHOD)
+    if PDF_START_METHOD == "forkserver":
+        ctx.set_forkserver_preload([__name__])
+    return ctx
+
+
+class PdfPages:
+    """
+    Iterable of page texts for one PDF (a path or the raw bytes), produced
+    lazily so chunking and embedding start on page 1 while later pages are
+    still being extracted. The file is opened up front, so an unreadable PDF
+    raises here rather than mid-ingest. Iterating yields one string per page,
+    with the blank line that used to join pages as a prefix on every page
+    after the first; `pages()` yields (page_number, text) instead.
+    """
+
+    def __init__(self, src: Source, workers: Optional[int] = None):
+        self.src = src
+        self.reader = _open(src)
+        self.page_count = len(self.reader.pages)
+        self.workers = PDF_WORKERS if workers is None else workers
+        self.problems: dict = {}
+
+    def __iter__(self) -> Iterator[str]:
+        for n, text in self.pages():
+            yield text if n == 1 else "\n\n" + text
+
+    def pages(self) -> Iterator[Tuple[int, str]]:
+        ctx = _pool_context()
+        if self.workers <= 0 or self.page_count < PDF_PARALLEL_MIN_PAGES or ctx is None:
+            yield from self._sequential()
+        else:
+            yield from self._pooled(ctx)
+
+    def _sequential(self) -> Iterator[Tuple[int, str]]:
+        for i in range(self.page_count):
+            page = self.reader.pages[i]
+            try:
+                yield i + 1, page.extract_text() or ""
+            except Exception as e:
+                self._problem(i, f"{type(e).__name__}: {e}")
+                yield i + 1, ""
+
+    def _pooled(self, ctx) -> Iterator[Tuple[int, str]]:
+        workers = min(self.workers, self.page_count)
+        t0 = time.perf_counter()
+        start, restarts = 0, 0
+        while start < self.page_count:
+            if restarts > PDF_POOL_RESTARTS:
+                # never fall back to extracting in-process: nothing would bound the next bad page
+                for i in range(start, self.page_count):
+                    self.problems[i + 1] = "skipped (pool abandoned)"
+                    yield i + 1, ""
+                print(f"[pdf] pages {start + 1}-{self.page_count}: skipped after {restarts} wedged pools")
+                break
+            wedged = yield from self._pool_pages(ctx, workers, start)
+            if wedged is None:
+                break
+            start, restarts = wedged + 1, restarts + 1
+        print(f"[pdf] {self.page_count} pages on {workers} workers in {time.perf_counter() - t0:.2f}s"
+              + (f", {restarts} wedged pools" if restarts else "")
+              + (f", {len(self.problems)} skipped" if self.problems else ""))
+
+    def _pool_pages(self, ctx, workers: int, start: int):
+        """
+        Extract pages from `start` on with one pool. Returns None when done, or
+        the index of the page that wedged it: waiting out every queued page
+        would take pages x timeout, so the pool is dropped at the first one.
+        """
+        pool = ctx.Pool(workers, initializer=_init_worker, initargs=(self.src,))
+        try:
+            inflight: deque = deque()
+            nxt = start
+            while nxt < self.page_count or inflight:
+                while nxt < self.page_count and len(inflight) < workers * max(1, PDF_PREFETCH):
+                    inflight.append((nxt, pool.apply_async(_page_text, (nxt,))))
+                    nxt += 1
+                i, res = inflight.popleft()
+                try:
+                    # the worker enforces the cap; this only guards against a page stuck outside Python
+                    _, text, problem = res.get(timeout=PDF_PAGE_TIMEOUT_S + 10)
+                except mp.TimeoutError:
+                    self._problem(i, "timeout (pool abandoned)")
+                    yield i + 1, ""
+                    return i
+                if problem:
+                    self._problem(i, problem)
+                yield i + 1, text
+            return None
+        finally:
+            pool.terminate()  # also reclaims any worker still stuck on a page
+            pool.join()
+
+    def _problem(self, i: int, problem: str):
+        self.problems[i + 1] = problem
+        print(f"[pdf] page {i + 1}: {problem}")
+
+    def text(self) -> str:
+        return "".join(self)
@@ -1,14 +1,36 @@
 import json
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
 import os
 import sys
 import re
+import threading
+from typing import Any, Dict, Optional
 
 # Configuration
 load_dotenv()
 API_KEY = os.getenv("ECHO_KEY")
 API_URL = "https://api.anthropic.com/v1/messages"
+ECHO_MODEL = os.getenv("ECHO_MODEL", "claude-3-5-haiku-20241022")
+ECHO_TIMEOUT_S = float(os.getenv("ECHO_TIMEOUT_S", "60"))
+# Keep-alive connections held open to the API (one per concurrent analysis).
+ECHO_POOL_SIZE = int(os.getenv("ECHO_POOL_SIZE", "4"))
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """Process-wide session so repeated reports reuse TLS connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=ECHO_POOL_SIZE)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+        return _session
 
 # Define allowed base directories for file operations
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -144,8 +166,11 @@ def load_json_file(safe_path: str):
         print(f"Error: Invalid JSON format")
         return None
 
-def call_claude_api(json_data):
+def call_claude_api(json_data, timeout: float = ECHO_TIMEOUT_S):
     """Send data to Claude API and get response"""
+    if not API_KEY:
+        print("API Error: ECHO_KEY is not set")
+        return None
     headers = {
         "Content-Type": "application/json",
         "X-API-Key": API_KEY,
@@ -153,7 +178,7 @@ def call_claude_api(json_data):
     }
     
     payload = {
-        "model": "claude-3-5-haiku-20241022", 
+        "model": ECHO_MODEL,
         "max_tokens": 2000,
         "system": SYSTEM_PROMPT,
         "messages": [
@@ -165,13 +190,38 @@ def call_claude_api(json_data):
     }
     
     try:
-        response = requests.post(API_URL, headers=headers, json=payload)
+        response = get_session().post(API_URL, headers=headers, json=payload, timeout=timeout)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
         print(f"API Error: {e}")
         return None
 
+def parse_report(content: str) -> Dict[str, Any]:
+    """The report JSON from a reply, tolerating ```json fences; non-JSON replies come back as {"text": ...}."""
+    text = content.strip()
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.S)
+    if fenced:
+        text = fenced.group(1)
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            return parsed
+    except json.JSONDecodeError:
+        pass
+    return {"text": content}
+
+def synthesize(echo_data: Dict[str, Any], timeout: float = ECHO_TIMEOUT_S) -> Optional[Dict[str, Any]]:
+    """In-process Echo report: send the echo_data dict and return the parsed report (None on failure)."""
+    response = call_claude_api(echo_data, timeout=timeout)
+    if not response:
+        return None
+    try:
+        return parse_report(response['content'][0]['text'])
+    except (KeyError, IndexError, TypeError) as e:
+        print(f"API Error: unexpected response shape ({e})")
+        return None
+
 def save_response(response, output_file="echo_report.json"):
     """Save Claude's response to file"""
     try:
@@ -2,9 +2,14 @@ import json
 import os
 import sys
 import re
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from statistics import mean
 
+try:
+    from report import echo_api_script
+except ImportError:  # run as a script from report/
+    import echo_api_script
+
 # Define allowed base directories for file operations
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 ALLOWED_BASE_DIRS = [
@@ -244,7 +249,10 @@ class EchoDataExtractor:
         # Load the analysis file (path already validated)
         with open(safe_file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
-        
+        return self.transform(data, safe_file_path)
+
+    def transform(self, data: Dict[str, Any], source_file: str = "") -> Dict[str, Any]:
+        """Transform an already-loaded analysis (the rag_{i}.json payload) to Echo format."""
         # Extract the editorial and audience sections
         editorial_data = data.get("editorial", {})
         audience_data = data.get("audience", {})
@@ -276,7 +284,7 @@ class EchoDataExtractor:
             "quickest_wins": quickest_wins,
             "audience_data": audience_info,
             "meta": {
-                "source_file": safe_file_path,
+                "source_file": source_file,
                 "overall_average": averages["overall_average"],
                 "overall_readiness": readiness,
                 "category_averages": averages["by_category"],
@@ -380,12 +388,13 @@ def main():
     return 0
 
 # Example usage in a script:
-def extract_and_run_echo(analysis_folder_name: str, i: int):
+def extract_and_run_echo(analysis_folder_name: str, i: int, analysis: Optional[Dict[str, Any]] = None):
     """Helper function to extract data and run Echo in one step.
     
     Args:
         analysis_folder_name: Path to the analysis folder (must be within allowed directories)
         i: The artifact index number (must be non-negative integer)
+        analysis: The rag_{i}.json payload if the caller already has it (skips re-reading it)
     """
     # Validate folder path and ensure i is a positive integer
     if not isinstance(i, int) or i < 0:
@@ -401,8 +410,11 @@ def extract_and_run_echo(analysis_folder_name: str, i: int):
     analysis_file_path = os.path.join(safe_folder, analysis_file_name)
     
     # Validate the input file path
-    safe_input = get_safe_path(analysis_file_path, check_exists=True)
-    echo_data = extractor.transform_to_echo_format(safe_input)
+    safe_input = get_safe_path(analysis_file_path, check_exists=analysis is None)
+    if analysis is None:
+        echo_data = extractor.transform_to_echo_format(safe_input)
+    else:
+        echo_data = extractor.transform(analysis, safe_input)
 
     # Save to "llmready_i.json" in the analysis folder
     output_file = os.path.join(safe_folder, f"llmready_{i}.json")
@@ -411,30 +423,19 @@ def extract_and_run_echo(analysis_folder_name: str, i: int):
         json.dump(echo_data, f, indent=2, ensure_ascii=False)
     
     print(f"Echo data saved to: {safe_output}")
-    
-    echo_script_path = os.path.join(os.path.dirname(__file__), 'echo_api_script.py')
 
+    # Synthesize the report in-process (echo_api_script.py stays usable as a CLI)
     response_file = None
-    # If Echo script provided, run it
-    if os.path.exists(echo_script_path):
-        import subprocess
-        result = subprocess.run([
-            'python3', echo_script_path, safe_output
-        ], capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print(result.stdout)
-            # Save response to response_i.json
-            response_file_path = os.path.join(safe_folder, f"response_{i}.json")
-            safe_response = get_safe_path(response_file_path, check_exists=False)
-            with open(safe_response, 'w', encoding='utf-8') as resp_f:
-                resp_f.write(result.stdout)
-            print(f"Echo response saved to: {safe_response}")
-            response_file = safe_response
-        else:
-            print("Error running Echo:", result.stderr)
+    report = echo_api_script.synthesize(echo_data)
+    if report is not None:
+        response_file_path = os.path.join(safe_folder, f"response_{i}.json")
+        safe_response = get_safe_path(response_file_path, check_exists=False)
+        with open(safe_response, 'w', encoding='utf-8') as resp_f:
+            json.dump(report, resp_f, indent=2, ensure_ascii=False)
+        print(f"Echo response saved to: {safe_response}")
+        response_file = safe_response
     else:
-        print(f"Echo script not found at {echo_script_path}")
+        print("Error running Echo: no report returned")
     
     return output_file, response_file
 
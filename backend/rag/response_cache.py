@@ -0,0 +1,120 @@
+import os, json, time, sqlite3, hashlib, threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+# -----------------------------
+# Model response cache: in-memory LRU in front of a SQLite tier, with TTL
+# -----------------------------
+RESPONSE_CACHE_MEM_ENTRIES = int(os.getenv("RESPONSE_CACHE_MEM_ENTRIES", "512"))
+RESPONSE_CACHE_TTL_S = float(os.getenv("RESPONSE_CACHE_TTL_S", str(7 * 24 * 3600)))
+
+
+def fingerprint(models: List[str], system: str, user: str, temp: float, max_tokens: int) -> str:
+    """Stable key for one model call: candidate list, both prompts and sampling params."""
+    blob = json.dumps([models, system, user, float(temp), int(max_tokens)], ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Maps a call fingerprint -> {"content", "used_model"}. Lookups hit the
+    in-memory LRU first, then SQLite (promoting the entry into memory).
+    Entries older than `ttl_s` count as misses and are dropped; once the disk
+    tier exceeds `max_bytes` the least recently used rows are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl_s: Optional[float] = None,
+                 mem_entries: Optional[int] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_s = RESPONSE_CACHE_TTL_S if ttl_s is None else ttl_s
+        self.mem_entries = RESPONSE_CACHE_MEM_ENTRIES if mem_entries is None else mem_entries
+        self.counters = {"mem_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "bypassed": 0}
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS resp ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS resp_last_used ON resp(last_used)")
+        self._db.commit()
+
+    def _fresh(self, created: float, now: float) -> bool:
+        return self.ttl_s <= 0 or now - created <= self.ttl_s
+
+    def _remember(self, key: str, created: float, value: Dict[str, Any]):
+        if self.mem_entries <= 0:
+            return
+        self._mem[key] = (created, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.mem_entries:
+            self._mem.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            item = self._mem.get(key)
+            if item is not None:
+                if self._fresh(item[0], now):
+                    self._mem.move_to_end(key)
+                    self.counters["mem_hits"] += 1
+                    return item[1]
+                del self._mem[key]
+            row = self._db.execute("SELECT value, created FROM resp WHERE key=?", (key,)).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            if not self._fresh(row[1], now):
+                self._db.execute("DELETE FROM resp WHERE key=?", (key,))
+                self._db.commit()
+                self.counters["misses"] += 1
+                return None
+            self._db.execute("UPDATE resp SET last_used=? WHERE key=?", (now, key))
+            self._db.commit()
+            value = json.loads(row[0])
+            self._remember(key, row[1], value)
+            self.counters["disk_hits"] += 1
+            return value
+
+    def put(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self._db.execute("INSERT OR REPLACE INTO resp(key, value, created, last_used) VALUES (?,?,?,?)",
+                             (key, json.dumps(value, ensure_ascii=False), now, now))
+            self._db.commit()
+            self.counters["stores"] += 1
+            if self.counters["stores"] % 100 == 0:
+                self._evict(now)
+
+    def note_bypass(self):
+        with self._lock:
+            self.counters["bypassed"] += 1
+
+    def _evict(self, now: float):
+        if self.ttl_s > 0:
+            self._db.execute("DELETE FROM resp WHERE created < ?", (now - self.ttl_s,))
+        total = self._db.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM resp").fetchone()[0]
+        if total > self.max_bytes:
+            over = total - int(self.max_bytes * 0.9)
+            freed = 0
+            doomed = []
+            for k, n in self._db.execute("SELECT key, LENGTH(value) FROM resp ORDER BY last_used ASC"):
+                doomed.append((k,))
+                freed += n
+                if freed >= over:
+                    break
+            self._db.executemany("DELETE FROM resp WHERE key=?", doomed)
+        self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            n, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM resp").fetchone()
+            out = {"entries": n, "bytes": size, "mem_entries": len(self._mem), "max_bytes": self.max_bytes,
+                   "ttl_s": self.ttl_s, **self.counters}
+        hits = out["mem_hits"] + out["disk_hits"]
+        out["hit_rate"] = round(hits / (hits + out["misses"]), 3) if hits + out["misses"] else None
+        return out
@@ -1,14 +1,18 @@
 import json
-import time
-from typing import List, Dict, Any
-from firecrawl import FirecrawlApp
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+# Firecrawl client, throttling and retries are shared with web_retrieval/scrape.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "web_retrieval"))
+from scrape_common import SCRAPE_WORKERS, get_client, fetch_content
+
 
 def search_community_links(community_description: str, max_results: int = 10, api_key: str = "api key") -> List[str]:
     try:
-        app = FirecrawlApp(api_key=api_key)
+        app = get_client(api_key)
         search_query = f"{community_description} demographics community characteristics"
         search_results = app.search(search_query, limit=max_results)
         
@@ -25,28 +29,15 @@ def search_community_links(community_description: str, max_results: int = 10, ap
 
 def scrape_page_content(url: str, api_key: str = "api key") -> Dict[str, Any]:
     try:
-        app = FirecrawlApp(api_key=api_key)
-        scrape_result = app.scrape(url)
-        
-        if scrape_result:
-            if hasattr(scrape_result, 'data'):
-                data = scrape_result.data
-            elif hasattr(scrape_result, 'markdown') or hasattr(scrape_result, 'content'):
-                data = scrape_result
-            else:
-                raise Exception("No data returned from Firecrawl")
-            
-            content = (getattr(data, 'markdown', '') or 
-                      getattr(data, 'content', '') or 
-                      getattr(data, 'html', ''))
-            
-            return {
-                'url': url,
-                'content': content,
-                'status': 'success'
-            }
-        else:
+        content = fetch_content(url, api_key)
+        if not content:
             raise Exception("No data returned from Firecrawl")
+        
+        return {
+            'url': url,
+            'content': content,
+            'status': 'success'
+        }
     except Exception as e:
         return {
             'url': url,
@@ -88,17 +79,15 @@ def save_community_data(data: Dict[str, Any], community_description: str) -> str
     return filename
 
 
-def scrape_community(community_description: str, max_links: int = 10, api_key: str = "api key") -> str:
+def scrape_community(community_description: str, max_links: int = 10, api_key: str = "api key",
+                     workers: Optional[int] = None) -> str:
     links = search_community_links(community_description, max_links, api_key)
     
     if not links:
         return ""
     
-    scraped_data = []
-    for link in links:
-        data = scrape_page_content(link, api_key)
-        scraped_data.append(data)
-        time.sleep(1)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers or SCRAPE_WORKERS, len(links)))) as pool:
+        scraped_data = list(pool.map(lambda link: scrape_page_content(link, api_key), links))
     
     structured_data = structure_community_data(community_description, scraped_data)
     output_file = save_community_data(structured_data, community_description)
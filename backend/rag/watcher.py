@@ -0,0 +1,230 @@
+import os, time, socket, sqlite3, hashlib, threading
+from fnmatch import fnmatch
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# -----------------------------
+# Background auto-ingestion: poll watched folders, ingest new or changed files
+# -----------------------------
+# Start the watcher with the app (off by default: /seed and /ingest stay the explicit way in).
+WATCH_ENABLED = os.getenv("WATCH_ENABLED", "0") == "1"
+# Seconds between scans of the watched folders.
+WATCH_INTERVAL_S = float(os.getenv("WATCH_INTERVAL_S", "10"))
+# A file is ingested once it has gone this long without being modified, so a
+# burst of writes (a scrape still appending, a copy in progress) is ingested once.
+WATCH_DEBOUNCE_S = float(os.getenv("WATCH_DEBOUNCE_S", "3"))
+# Several processes may share a manifest; only the one holding the lease scans.
+# It is renewed before every file, so a dead owner is replaced after this long.
+WATCH_LEASE_S = float(os.getenv("WATCH_LEASE_S", "300"))
+
+WATCH_EXTS = (".txt", ".md", ".markdown", ".pdf", ".json", ".jsonl", ".ndjson")
+
+Root = Tuple[str, Sequence[str]]  # (directory, basename patterns to ingest)
+Sig = Tuple[int, int]             # (size, mtime_ns)
+
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class DirWatcher:
+    """
+    Polls `roots` for files and calls `ingest_fn(path) -> stats` for each one
+    that is new or whose content changed since it was last ingested. The
+    manifest (path, size, mtime, sha256, outcome) lives in SQLite, so a restart
+    picks up where the last scan stopped; a file whose size and mtime match the
+    manifest is never re-read, and one that was only touched is hashed but not
+    re-ingested. `remove_fn(path)`, if given, is called for tracked files that
+    disappeared. Ingestion runs on the watcher's own thread.
+    """
+
+    def __init__(self, path: str, roots: List[Root], ingest_fn: Callable[[str], Dict[str, Any]],
+                 interval: Optional[float] = None, debounce: Optional[float] = None,
+                 remove_fn: Optional[Callable[[str], Any]] = None):
+        self.path = path
+        self.roots = [(os.path.normpath(d), tuple(p)) for d, p in roots]
+        self.ingest_fn = ingest_fn
+        self.remove_fn = remove_fn
+        self.interval = WATCH_INTERVAL_S if interval is None else interval
+        self.debounce = WATCH_DEBOUNCE_S if debounce is None else debounce
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.leader = False
+        self._lock = threading.Lock()
+        self._kick = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pending: Dict[str, Sig] = {}
+        self._counts = {"scans": 0, "ingested": 0, "unchanged": 0, "failed": 0, "removed": 0}
+        self._last_scan: Optional[float] = None
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha256 TEXT,"
+            " status TEXT NOT NULL, error TEXT, chunks INTEGER, ingested REAL)"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS lease (name TEXT PRIMARY KEY, owner TEXT, heartbeat REAL)")
+
+    # ---------- thread ----------
+    def start(self):
+        with self._lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._loop, name="watcher", daemon=True)
+            self._thread.start()
+        print(f"[watch] watching {', '.join(d for d, _ in self.roots)} every {self.interval:g}s")
+
+    def wake(self):
+        """Scan now instead of at the next interval."""
+        self._kick.set()
+
+    def _loop(self):
+        while True:
+            delay = self.interval
+            try:
+                if self._lead():
+                    delay = self.scan_once()
+            except sqlite3.Error as e:
+                print(f"[watch] manifest error: {e}")
+            except Exception as e:
+                print(f"[watch] scan failed: {type(e).__name__}: {e}")
+            self._kick.wait(timeout=delay)
+            self._kick.clear()
+
+    def _lead(self) -> bool:
+        """Take or renew the scan lease; False while another live process holds it."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute("SELECT owner, heartbeat FROM lease WHERE name='scan'").fetchone()
+                self.leader = row is None or row[0] == self.owner or row[1] < now - WATCH_LEASE_S
+                if self.leader:
+                    self._db.execute("INSERT OR REPLACE INTO lease VALUES ('scan', ?, ?)", (self.owner, now))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return self.leader
+
+    # ---------- scanning ----------
+    def _walk(self) -> Dict[str, Sig]:
+        found: Dict[str, Sig] = {}
+        for root, patterns in self.roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+                for name in filenames:
+                    if name.startswith(".") or os.path.splitext(name)[1].lower() not in WATCH_EXTS:
+                        continue
+                    if not any(fnmatch(name, p) for p in patterns):
+                        continue
+                    p = os.path.normpath(os.path.join(dirpath, name))
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue  # removed since listing
+                    found[p] = (st.st_size, st.st_mtime_ns)
+        return found
+
+    def scan_once(self) -> float:
+        """
+        One pass over the roots: ingest every settled new/changed file and drop
+        manifest rows for deleted ones. Returns the seconds until the next scan
+        is due (sooner than the interval while a file is still settling).
+        """
+        with self._lock:
+            known = {r[0]: r[1:] for r in self._db.execute("SELECT path, size, mtime_ns, sha256 FROM files")}
+        found = self._walk()
+        now = time.time()
+        self._pending = {}
+        wait = self.interval
+        for p, sig in sorted(found.items()):
+            k = known.get(p)
+            if k and (k[0], k[1]) == sig:
+                continue
+            quiet = now - sig[1] / 1e9
+            if quiet < self.debounce:
+                self._pending[p] = sig
+                wait = min(wait, self.debounce - quiet + 0.1)
+                continue
+            if not self._lead():
+                break  # lost the lease mid-scan
+            self._process(p, sig, k[2] if k else None)
+        for p in known:
+            if p not in found and not os.path.exists(p):
+                if self.remove_fn:
+                    try:
+                        self.remove_fn(p)
+                    except Exception as e:
+                        print(f"[watch] {p}: removal failed ({type(e).__name__}: {e})")
+                        continue  # keep the row so the next scan retries
+                with self._lock:
+                    self._db.execute("DELETE FROM files WHERE path=?", (p,))
+                self._counts["removed"] += 1
+        self._counts["scans"] += 1
+        self._last_scan = now
+        return max(0.1, wait)
+
+    def _process(self, path: str, sig: Sig, old_sha: Optional[str]):
+        try:
+            sha = _sha256(path)
+        except OSError as e:
+            print(f"[watch] {path}: unreadable ({e})")
+            return
+        if sha == old_sha:
+            # touched or rewritten with the same bytes: nothing to ingest
+            with self._lock:
+                self._db.execute("UPDATE files SET size=?, mtime_ns=? WHERE path=?", (*sig, path))
+            self._counts["unchanged"] += 1
+            return
+        t0 = time.perf_counter()
+        status, error, chunks = "ok", None, None
+        try:
+            stats = self.ingest_fn(path) or {}
+            chunks = stats.get("ingested_chunks")
+            self._counts["ingested"] += 1
+        except Exception as e:
+            # recorded with the file's signature, so it is retried only once the file changes
+            status, error = "failed", f"{type(e).__name__}: {e}"
+            self._counts["failed"] += 1
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (path, *sig, sha, status, error, chunks, time.time()))
+        print(f"[watch] {path}: " + (f"{chunks or 0} new chunks in {time.perf_counter() - t0:.2f}s"
+                                     if status == "ok" else error))
+
+    # ---------- API ----------
+    def forget(self):
+        """Clear the manifest (e.g. after the index was reset) so every file is ingested again."""
+        with self._lock:
+            self._db.execute("DELETE FROM files")
+        self.wake()
+
+    def files(self, limit: int = 50, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        q = "SELECT path, size, mtime_ns, sha256, status, error, chunks, ingested FROM files"
+        args: Tuple = ()
+        if status:
+            q += " WHERE status=?"
+            args = (status,)
+        q += " ORDER BY ingested DESC LIMIT ?"
+        with self._lock:
+            rows = self._db.execute(q, args + (limit,)).fetchall()
+        cols = ("path", "size", "mtime_ns", "sha256", "status", "error", "chunks", "ingested")
+        return [dict(zip(cols, r)) for r in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            tracked = self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        return {
+            "roots": [{"dir": d, "patterns": list(p)} for d, p in self.roots],
+            "interval_s": self.interval,
+            "debounce_s": self.debounce,
+            "leader": self.leader,
+            "tracked_files": tracked,
+            "pending": sorted(self._pending),
+            "last_scan": self._last_scan,
+            **self._counts,
+        }
@@ -1,92 +1,174 @@
 import requests
 import time
 import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Iterator, Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
-def scrape_guardian_api(query: str, api_key: str, max_articles: int = 20) -> List[Dict[str, Any]]:
-    articles = []
-    url = "https://content.guardianapis.com/search"
-    
+GUARDIAN_URL = "https://content.guardianapis.com/search"
+NYT_URL = "https://api.nytimes.com/svc/search/v2/articlesearch.json"
+EVENT_REGISTRY_URL = "https://eventregistry.org/api/v1/article/getArticles"
+GDELT_URL = "https://api.gdeltproject.org/api/v2/doc/doc"
+
+NEWS_TIMEOUT_S = float(os.getenv("NEWS_TIMEOUT_S", "20"))
+# Attempts per request when a source answers 429 or 5xx. Each one waits for
+# the source's rate limit again, and for Retry-After when the source sends it.
+NEWS_MAX_ATTEMPTS = int(os.getenv("NEWS_MAX_ATTEMPTS", "4"))
+NEWS_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# Per-source request budgets as (requests per minute, burst). These replace the
+# old fixed sleep between sources: sources run in parallel and only requests to
+# the same source wait for each other (e.g. NYT allows 5/min, GDELT ~1 per 5s).
+SOURCE_RATE_LIMITS = {
+    'guardian': (60, 1),
+    'nyt': (5, 5),
+    'event_registry': (60, 2),
+    'gdelt': (12, 1),
+}
+
+
+class RateLimit:
+    def __init__(self, per_minute: float, burst: int = 1):
+        self.interval = 60.0 / per_minute
+        self.burst = burst
+        self._tokens = float(burst)
+        self._t = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        # reserve a slot under the lock, sleep outside it
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._t) / self.interval)
+            self._t = now
+            self._tokens -= 1
+            delay = -self._tokens * self.interval if self._tokens < 0 else 0.0
+        if delay > 0:
+            time.sleep(delay)
+
+
+_limits = {name: RateLimit(*spec) for name, spec in SOURCE_RATE_LIMITS.items()}
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            # connection-level retries only: status retries happen in _get_json,
+            # where they go back through the source's RateLimit
+            retry = Retry(total=3, backoff_factor=0.5, allowed_methods=("GET",),
+                          respect_retry_after_header=False, raise_on_status=False)
+            adapter = HTTPAdapter(pool_connections=len(SOURCE_RATE_LIMITS), pool_maxsize=4, max_retries=retry)
+            s = requests.Session()
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+        return _session
+
+
+def _retry_delay(response: requests.Response, attempt: int) -> float:
+    try:
+        return min(float(response.headers.get('Retry-After', '')), 60.0)
+    except ValueError:
+        return min(0.5 * (2 ** attempt), 8.0)
+
+
+def _get_json(source: str, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    for attempt in range(max(1, NEWS_MAX_ATTEMPTS)):
+        _limits[source].wait()
+        response = get_session().get(url, params=params, timeout=NEWS_TIMEOUT_S)
+        if response.status_code not in NEWS_RETRY_STATUS or attempt + 1 >= NEWS_MAX_ATTEMPTS:
+            break
+        time.sleep(_retry_delay(response, attempt))
+    response.raise_for_status()
+    return response.json()
+
+
+def iter_guardian_api(query: str, api_key: str, max_articles: int = 20) -> Iterator[Dict[str, Any]]:
+    page_size = min(max_articles, 50)
     params = {
         'q': query,
         'api-key': api_key,
         'show-fields': 'headline,trailText,bodyText,byline,publication',
         'show-tags': 'keyword',
-        'page-size': min(max_articles, 50),
+        'page-size': page_size,
         'order-by': 'relevance'
     }
-    
+
+    count, page = 0, 1
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        for item in data.get('response', {}).get('results', []):
-            fields = item.get('fields', {})
-            articles.append({
-                'title': fields.get('headline', ''),
-                'content': fields.get('bodyText', ''),
-                'summary': fields.get('trailText', ''),
-                'author': fields.get('byline', ''),
-                'url': item.get('webUrl', ''),
-                'date': item.get('webPublicationDate', ''),
-                'source': 'The Guardian',
-                'tags': [tag.get('webTitle', '') for tag in item.get('tags', [])]
-            })
-            
+        while count < max_articles:
+            data = _get_json('guardian', GUARDIAN_URL, {**params, 'page': page}).get('response', {})
+            results = data.get('results', [])
+            for item in results[:max_articles - count]:
+                fields = item.get('fields', {})
+                count += 1
+                yield {
+                    'title': fields.get('headline', ''),
+                    'content': fields.get('bodyText', ''),
+                    'summary': fields.get('trailText', ''),
+                    'author': fields.get('byline', ''),
+                    'url': item.get('webUrl', ''),
+                    'date': item.get('webPublicationDate', ''),
+                    'source': 'The Guardian',
+                    'tags': [tag.get('webTitle', '') for tag in item.get('tags', [])]
+                }
+            if not results or page >= data.get('pages', page):
+                break
+            page += 1
+
     except Exception as e:
         print(f"Guardian API error: {e}")
-    
-    return articles
 
 
-def scrape_nyt_api(query: str, api_key: str, max_articles: int = 20) -> List[Dict[str, Any]]:
-    articles = []
-    url = "https://api.nytimes.com/svc/search/v2/articlesearch.json"
-    
+def iter_nyt_api(query: str, api_key: str, max_articles: int = 20) -> Iterator[Dict[str, Any]]:
     params = {
         'q': query,
         'api-key': api_key,
         'sort': 'relevance',
-        'page': 0
     }
-    
+
+    count, page = 0, 0
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        for doc in data.get('response', {}).get('docs', [])[:max_articles]:
-            articles.append({
-                'title': doc.get('headline', {}).get('main', ''),
-                'content': doc.get('lead_paragraph', '') + ' ' + doc.get('snippet', ''),
-                'summary': doc.get('abstract', ''),
-                'author': ', '.join([person.get('firstname', '') + ' ' + person.get('lastname', '') 
-                                   for person in doc.get('byline', {}).get('person', [])]),
-                'url': doc.get('web_url', ''),
-                'date': doc.get('pub_date', ''),
-                'source': 'New York Times',
-                'section': doc.get('section_name', ''),
-                'keywords': [kw.get('value', '') for kw in doc.get('keywords', [])]
-            })
-            
+        # 10 docs per page; the API serves at most 100 pages
+        while count < max_articles and page < 100:
+            data = _get_json('nyt', NYT_URL, {**params, 'page': page}).get('response', {})
+            docs = data.get('docs') or []
+            for doc in docs[:max_articles - count]:
+                count += 1
+                yield {
+                    'title': doc.get('headline', {}).get('main', ''),
+                    'content': doc.get('lead_paragraph', '') + ' ' + doc.get('snippet', ''),
+                    'summary': doc.get('abstract', ''),
+                    'author': ', '.join([person.get('firstname', '') + ' ' + person.get('lastname', '')
+                                       for person in doc.get('byline', {}).get('person', [])]),
+                    'url': doc.get('web_url', ''),
+                    'date': doc.get('pub_date', ''),
+                    'source': 'New York Times',
+                    'section': doc.get('section_name', ''),
+                    'keywords': [kw.get('value', '') for kw in doc.get('keywords', [])]
+                }
+            hits = (data.get('meta') or {}).get('hits')
+            if len(docs) < 10 or (hits is not None and (page + 1) * 10 >= hits):
+                break
+            page += 1
+
     except Exception as e:
         print(f"NYT API error: {e}")
-    
-    return articles
 
 
-def scrape_event_registry_api(query: str, api_key: str, max_articles: int = 20) -> List[Dict[str, Any]]:
-    articles = []
-    url = "https://eventregistry.org/api/v1/article/getArticles"
-    
+def iter_event_registry_api(query: str, api_key: str, max_articles: int = 20) -> Iterator[Dict[str, Any]]:
     params = {
         'apiKey': api_key,
         'keyword': query,
         'lang': 'eng',
-        'articlesPage': 1,
         'articlesCount': min(max_articles, 100),
         'articlesSortBy': 'rel',
         'includeArticleTitle': True,
@@ -95,54 +177,53 @@ def scrape_event_registry_api(query: str, api_key: str, max_articles: int = 20)
         'includeSourceTitle': True,
         'articleBodyLen': 300
     }
-    
+
+    count, page = 0, 1
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        if 'articles' not in data or 'results' not in data['articles']:
-            print(f"Event Registry: No articles found. Response keys: {data.keys()}")
-            return articles
-        
-        for article in data['articles']['results']:
-            articles.append({
-                'title': article.get('title', ''),
-                'content': article.get('body', ''),
-                'summary': article.get('body', '')[:200] + '...' if article.get('body') else '',
-                'author': ', '.join([author.get('name', '') for author in article.get('authors', [])]),
-                'url': article.get('url', ''),
-                'date': article.get('date', '') + 'T' + article.get('time', '') if article.get('date') else '',
-                'source': article.get('source', {}).get('title', '') if article.get('source') else '',
-                'language': article.get('lang', ''),
-                'sentiment': article.get('sentiment', 0)
-            })
-            
+        while count < max_articles:
+            data = _get_json('event_registry', EVENT_REGISTRY_URL, {**params, 'articlesPage': page})
+
+            if 'articles' not in data or 'results' not in data['articles']:
+                print(f"Event Registry: No articles found. Response keys: {data.keys()}")
+                return
+
+            results = data['articles']['results']
+            for article in results[:max_articles - count]:
+                count += 1
+                yield {
+                    'title': article.get('title', ''),
+                    'content': article.get('body', ''),
+                    'summary': article.get('body', '')[:200] + '...' if article.get('body') else '',
+                    'author': ', '.join([author.get('name', '') for author in article.get('authors', [])]),
+                    'url': article.get('url', ''),
+                    'date': article.get('date', '') + 'T' + article.get('time', '') if article.get('date') else '',
+                    'source': article.get('source', {}).get('title', '') if article.get('source') else '',
+                    'language': article.get('lang', ''),
+                    'sentiment': article.get('sentiment', 0)
+                }
+            if not results or page >= data['articles'].get('pages', page):
+                break
+            page += 1
+
     except Exception as e:
         print(f"Event Registry API error: {e}")
-    
-    return articles
 
 
-def scrape_gdelt_api(query: str, max_articles: int = 20) -> List[Dict[str, Any]]:
-    articles = []
-    url = "https://api.gdeltproject.org/api/v2/doc/doc"
-    
+def iter_gdelt_api(query: str, max_articles: int = 20) -> Iterator[Dict[str, Any]]:
+    # GDELT has no paging; one request returns up to 250 records
     params = {
         'query': query,
         'mode': 'artlist',
-        'maxrecords': min(max_articles, 75),
+        'maxrecords': min(max_articles, 250),
         'format': 'json',
         'sort': 'relevance'
     }
-    
+
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
-        
-        for article in data.get('articles', []):
-            articles.append({
+        data = _get_json('gdelt', GDELT_URL, params)
+
+        for article in data.get('articles', [])[:max_articles]:
+            yield {
                 'title': article.get('title', ''),
                 'content': article.get('content', ''),
                 'summary': article.get('content', '')[:200] + '...' if article.get('content') else '',
@@ -151,73 +232,107 @@ def scrape_gdelt_api(query: str, max_articles: int = 20) -> List[Dict[str, Any]]
                 'date': article.get('seendate', ''),
                 'source': article.get('domain', ''),
                 'language': article.get('language', '')
-            })
-            
+            }
+
     except Exception as e:
         print(f"GDELT API error: {e}")
-    
-    return articles
 
-def scrape_fact_check_sources(topic: str, apis: Dict[str, str], max_per_source: int = 10) -> str:
-    all_articles = []
-    
+
+def scrape_guardian_api(query: str, api_key: str, max_articles: int = 20) -> List[Dict[str, Any]]:
+    return list(iter_guardian_api(query, api_key, max_articles))
+
+
+def scrape_nyt_api(query: str, api_key: str, max_articles: int = 20) -> List[Dict[str, Any]]:
+    return list(iter_nyt_api(query, api_key, max_articles))
+
+
+def scrape_event_registry_api(query: str, api_key: str, max_articles: int = 20) -> List[Dict[str, Any]]:
+    return list(iter_event_registry_api(query, api_key, max_articles))
+
+
+def scrape_gdelt_api(query: str, max_articles: int = 20) -> List[Dict[str, Any]]:
+    return list(iter_gdelt_api(query, max_articles))
+
+
+def _source_iterators(topic: str, apis: Dict[str, str], max_per_source: int) -> Dict[str, Callable[[], Iterator[Dict[str, Any]]]]:
+    sources = {}
     if 'guardian' in apis:
-        print("Fetching Guardian articles...")
-        guardian_articles = scrape_guardian_api(topic, apis['guardian'], max_per_source)
-        all_articles.extend(guardian_articles)
-        time.sleep(1)
-    
+        sources['Guardian'] = lambda: iter_guardian_api(topic, apis['guardian'], max_per_source)
     if 'nyt' in apis:
-        print("Fetching NYT articles...")
-        nyt_articles = scrape_nyt_api(topic, apis['nyt'], max_per_source)
-        all_articles.extend(nyt_articles)
-        time.sleep(1)
-    
+        sources['NYT'] = lambda: iter_nyt_api(topic, apis['nyt'], max_per_source)
     if 'event_registry' in apis:
-        print("Fetching Event Registry articles...")
-        event_registry_articles = scrape_event_registry_api(topic, apis['event_registry'], max_per_source)
-        all_articles.extend(event_registry_articles)
-        time.sleep(1)
-    
+        sources['Event Registry'] = lambda: iter_event_registry_api(topic, apis['event_registry'], max_per_source)
     if 'gdelt' in apis or len(apis) == 0:
-        print("Fetching GDELT articles...")
-        gdelt_articles = scrape_gdelt_api(topic, max_per_source)
-        all_articles.extend(gdelt_articles)
-        time.sleep(1)
-    
-    fact_check_text = []
-    for article in all_articles:
-        if article.get('content'):
-            fact_check_text.append(f"Source: {article.get('source', 'Unknown')}")
-            fact_check_text.append(f"Title: {article.get('title', '')}")
-            fact_check_text.append(f"Content: {article.get('content', '')}")
-            fact_check_text.append("---")
-    
+        sources['GDELT'] = lambda: iter_gdelt_api(topic, max_per_source)
+    return sources
+
+
+def iter_fact_check_articles(topic: str, apis: Dict[str, str], max_per_source: int = 10) -> Iterator[Dict[str, Any]]:
+    """Query every configured source in parallel and yield articles as they arrive."""
+    sources = _source_iterators(topic, apis, max_per_source)
+    if not sources:
+        return
+    out: "queue.Queue" = queue.Queue()
+    done = object()
+
+    def pump(name: str, make: Callable[[], Iterator[Dict[str, Any]]]):
+        print(f"Fetching {name} articles...")
+        try:
+            for article in make():
+                out.put(article)
+        finally:
+            out.put(done)
+
+    with ThreadPoolExecutor(max_workers=len(sources)) as pool:
+        for name, make in sources.items():
+            pool.submit(pump, name, make)
+        remaining = len(sources)
+        while remaining:
+            item = out.get()
+            if item is done:
+                remaining -= 1
+            else:
+                yield item
+
+
+def scrape_fact_check_sources(topic: str, apis: Dict[str, str], max_per_source: int = 10) -> str:
     os.makedirs('data', exist_ok=True)
     safe_topic = "".join(c for c in topic if c.isalnum() or c in (' ', '-', '_')).replace(' ', '_').lower()
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"data/factcheck_{safe_topic}_{timestamp}.txt"
-    
+
+    total, written = 0, 0
     with open(filename, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(fact_check_text))
-    
+        for article in iter_fact_check_articles(topic, apis, max_per_source):
+            total += 1
+            if not article.get('content'):
+                continue
+            fact_check_text = [
+                f"Source: {article.get('source', 'Unknown')}",
+                f"Title: {article.get('title', '')}",
+                f"Content: {article.get('content', '')}",
+                "---",
+            ]
+            f.write(('\n' if written else '') + '\n'.join(fact_check_text))
+            written += 1
+
     print(f"Fact-check data saved to: {filename}")
-    print(f"Total articles collected: {len(all_articles)}")
-    
+    print(f"Total articles collected: {total}")
+
     return filename
 
 
 if __name__ == "__main__":
     topic = "climate change" # will be input by user
-    
+
     api_keys = {
         'guardian': 'a008b18d-7491-4958-bdfe-43b74f92a7f2',
         # 'nyt': 'ZSkBk8Z4or8ALFyGX5d9dlSeGLxNZV0L',
-        # 'event_registry': 'dac9c971-aa15-4e28-bbb9-896de890c315', 
+        # 'event_registry': 'dac9c971-aa15-4e28-bbb9-896de890c315',
         # 'gdelt': True,  # keyless
     }
-    
+
     if api_keys:
         output_file = scrape_fact_check_sources(topic, api_keys, max_per_source=15)
     else:
-        print("Add API keys to run the scraper")
\ No newline at end of file
+        print("Add API keys to run the scraper")
@@ -1,10 +1,11 @@
-import time
 import re
-from typing import List
-from firecrawl import FirecrawlApp
 import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
 from datetime import datetime
 
+from scrape_common import SCRAPE_WORKERS, get_client, fetch_content
+
 
 def clean_content(text: str) -> str:
     lines = text.split('\n')
@@ -44,7 +45,7 @@ def clean_content(text: str) -> str:
 
 def search_community_links(community_description: str, max_results: int = 10, api_key: str = "api key") -> List[str]:
     try:
-        app = FirecrawlApp(api_key=api_key)
+        app = get_client(api_key)
         search_query = f"{community_description} demographics community characteristics"
         search_results = app.search(search_query, limit=max_results)
         
@@ -61,24 +62,7 @@ def search_community_links(community_description: str, max_results: int = 10, ap
 
 def scrape_page_content(url: str, api_key: str = "api key") -> str:
     try:
-        app = FirecrawlApp(api_key=api_key)
-        scrape_result = app.scrape(url)
-        
-        if scrape_result:
-            if hasattr(scrape_result, 'data'):
-                data = scrape_result.data
-            elif hasattr(scrape_result, 'markdown') or hasattr(scrape_result, 'content'):
-                data = scrape_result
-            else:
-                return ""
-            
-            content = (getattr(data, 'markdown', '') or 
-                      getattr(data, 'content', '') or 
-                      getattr(data, 'html', ''))
-            
-            return content
-        else:
-            return ""
+        return fetch_content(url, api_key)
     except Exception:
         return ""
 
@@ -97,22 +81,28 @@ def save_community_text(text_content: str, community_description: str) -> str:
     return filename
 
 
-def scrape_community(community_description: str, max_links: int = 10, api_key: str = "api key") -> str:
+def scrape_community(community_description: str, max_links: int = 10, api_key: str = "api key",
+                     workers: Optional[int] = None) -> str:
     links = search_community_links(community_description, max_links, api_key)
     
     if not links:
         return ""
-    
-    all_text = []
-    for link in links:
+
+    def scrape_one(link: str) -> str:
         print("scraping link")
-        content = scrape_page_content(link, api_key)
+        return scrape_page_content(link, api_key)
+
+    # results come back in link order, so the output matches the sequential version
+    with ThreadPoolExecutor(max_workers=max(1, min(workers or SCRAPE_WORKERS, len(links)))) as pool:
+        contents = list(pool.map(scrape_one, links))
+
+    all_text = []
+    for content in contents:
         if content:
             cleaned_content = clean_content(content)
             if cleaned_content:
                 all_text.append(cleaned_content)
                 all_text.append("\n\n")
-        time.sleep(1)
     
     combined_text = ''.join(all_text)
     output_file = save_community_text(combined_text, community_description)
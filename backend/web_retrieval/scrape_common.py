@@ -0,0 +1,72 @@
+import os
+import time
+import random
+import threading
+from typing import Any, Dict
+from urllib.parse import urlparse
+
+# Shared by web_retrieval/scrape.py and rag/scrape.py: one Firecrawl client per
+# API key, per-domain spacing and retried page fetches.
+
+# Pages fetched at once; requests to the same domain are still spaced out.
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", "4"))
+SCRAPE_DOMAIN_INTERVAL_S = float(os.getenv("SCRAPE_DOMAIN_INTERVAL_S", "1.0"))
+SCRAPE_ATTEMPTS = int(os.getenv("SCRAPE_ATTEMPTS", "3"))
+SCRAPE_BACKOFF_S = float(os.getenv("SCRAPE_BACKOFF_S", "1.0"))
+
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: str):
+    """The FirecrawlApp for `api_key`, created on first use."""
+    with _clients_lock:
+        if api_key not in _clients:
+            from firecrawl import FirecrawlApp
+            _clients[api_key] = FirecrawlApp(api_key=api_key)
+        return _clients[api_key]
+
+
+class DomainThrottle:
+    def __init__(self, interval_s: float = SCRAPE_DOMAIN_INTERVAL_S):
+        self.interval_s = interval_s
+        self._next: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        domain = urlparse(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next.get(domain, 0.0))
+            self._next[domain] = at + self.interval_s
+        if at > now:
+            time.sleep(at - now)
+
+
+_throttle = DomainThrottle()
+
+
+def fetch_content(url: str, api_key: str) -> str:
+    """Markdown (or content/html) for `url`, retried with jittered backoff; raises on final failure."""
+    for attempt in range(SCRAPE_ATTEMPTS):
+        _throttle.wait(url)
+        try:
+            scrape_result = get_client(api_key).scrape(url)
+            break
+        except Exception:
+            if attempt + 1 >= SCRAPE_ATTEMPTS:
+                raise
+            time.sleep(random.uniform(0, SCRAPE_BACKOFF_S * (2 ** attempt)))
+
+    if not scrape_result:
+        return ""
+    if hasattr(scrape_result, 'data'):
+        data = scrape_result.data
+    elif hasattr(scrape_result, 'markdown') or hasattr(scrape_result, 'content'):
+        data = scrape_result
+    else:
+        return ""
+
+    return (getattr(data, 'markdown', '') or
+            getattr(data, 'content', '') or
+            getattr(data, 'html', ''))
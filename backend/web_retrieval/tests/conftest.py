@@ -0,0 +1,62 @@
+import os, sys, json, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from typing import Any, Callable, Dict, List, Tuple
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# handler(query) -> (status, headers, body); dict/list bodies are sent as JSON
+Route = Callable[[Dict[str, str]], Tuple[int, Dict[str, str], Any]]
+
+
+class LocalServer:
+    """A local HTTP stand-in for the news APIs and scraped sites. Every request is recorded."""
+
+    def __init__(self):
+        self.routes: Dict[str, Route] = {}
+        self.requests: List[Tuple[str, Dict[str, str]]] = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+                server.requests.append((parts.path, query))
+                route = server.routes.get(parts.path)
+                status, headers, body = route(query) if route else (404, {}, "not found")
+                if not isinstance(body, (str, bytes)):
+                    body, headers = json.dumps(body), {"Content-Type": "application/json", **headers}
+                data = body.encode("utf-8") if isinstance(body, str) else body
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._httpd.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def url(self, path: str) -> str:
+        return self.base + path
+
+    def hits(self, path: str) -> List[Dict[str, str]]:
+        return [q for p, q in self.requests if p == path]
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    s = LocalServer()
+    yield s
+    s.close()
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+import news_scraper
+
+
+class CountingLimit:
+    """Stands in for a source's RateLimit: no sleeping, but every wait() is counted."""
+
+    def __init__(self):
+        self.waits = 0
+
+    def wait(self):
+        self.waits += 1
+
+
+@pytest.fixture
+def limits(monkeypatch):
+    fake = {name: CountingLimit() for name in news_scraper.SOURCE_RATE_LIMITS}
+    monkeypatch.setattr(news_scraper, "_limits", fake)
+    return fake
+
+
+def _guardian_page(page: int, pages: int, per_page: int = 3):
+    results = [{"webUrl": f"https://example.org/{page}/{i}", "webPublicationDate": "2025-01-01",
+                "fields": {"headline": f"p{page} a{i}", "bodyText": "body"}, "tags": []}
+               for i in range(per_page)]
+    return {"response": {"results": results, "pages": pages}}
+
+
+def test_guardian_pages_until_max_articles(server, limits, monkeypatch):
+    server.routes["/guardian"] = lambda q: (200, {}, _guardian_page(int(q["page"]), pages=5))
+    monkeypatch.setattr(news_scraper, "GUARDIAN_URL", server.url("/guardian"))
+
+    articles = list(news_scraper.iter_guardian_api("transit", "key", max_articles=7))
+
+    assert [a["title"] for a in articles] == ["p1 a0", "p1 a1", "p1 a2", "p2 a0", "p2 a1", "p2 a2", "p3 a0"]
+    assert [q["page"] for q in server.hits("/guardian")] == ["1", "2", "3"]
+    assert limits["guardian"].waits == 3
+
+
+def test_guardian_stops_at_last_page(server, limits, monkeypatch):
+    server.routes["/guardian"] = lambda q: (200, {}, _guardian_page(int(q["page"]), pages=2))
+    monkeypatch.setattr(news_scraper, "GUARDIAN_URL", server.url("/guardian"))
+
+    articles = list(news_scraper.iter_guardian_api("transit", "key", max_articles=50))
+
+    assert len(articles) == 6
+    assert len(server.hits("/guardian")) == 2
+
+
+def test_429_is_retried_through_the_rate_limit(server, limits, monkeypatch):
+    calls = {"n": 0}
+
+    def gdelt(q):
+        calls["n"] += 1
+        if calls["n"] <= 2:
+            return 429, {"Retry-After": "0"}, {"error": "slow down"}
+        return 200, {}, {"articles": [{"title": "ok", "content": "text", "url": "https://example.org/a"}]}
+
+    server.routes["/gdelt"] = gdelt
+    monkeypatch.setattr(news_scraper, "GDELT_URL", server.url("/gdelt"))
+
+    articles = list(news_scraper.iter_gdelt_api("transit", max_articles=5))
+
+    assert [a["title"] for a in articles] == ["ok"]
+    assert len(server.hits("/gdelt")) == 3
+    assert limits["gdelt"].waits == 3  # every attempt, retries included, took a rate-limit slot
+
+
+def test_gives_up_after_max_attempts(server, limits, monkeypatch):
+    server.routes["/gdelt"] = lambda q: (503, {"Retry-After": "0"}, "overloaded")
+    monkeypatch.setattr(news_scraper, "GDELT_URL", server.url("/gdelt"))
+    monkeypatch.setattr(news_scraper, "NEWS_MAX_ATTEMPTS", 2)
+
+    assert list(news_scraper.iter_gdelt_api("transit")) == []
+    assert len(server.hits("/gdelt")) == 2
+    assert limits["gdelt"].waits == 2
+
+
+def test_sources_stream_as_they_arrive(server, limits, monkeypatch):
+    def slow_gdelt(q):
+        time.sleep(0.5)
+        return 200, {}, {"articles": [{"title": "gdelt", "content": "text", "domain": "gdelt.example"}]}
+
+    server.routes["/guardian"] = lambda q: (200, {}, _guardian_page(int(q["page"]), pages=1, per_page=2))
+    server.routes["/gdelt"] = slow_gdelt
+    monkeypatch.setattr(news_scraper, "GUARDIAN_URL", server.url("/guardian"))
+    monkeypatch.setattr(news_scraper, "GDELT_URL", server.url("/gdelt"))
+
+    t0 = time.monotonic()
+    it = news_scraper.iter_fact_check_articles("transit", {"guardian": "key", "gdelt": True}, max_per_source=5)
+    first = next(it)
+    first_s = time.monotonic() - t0
+    rest = list(it)
+
+    assert first["source"] == "The Guardian"
+    assert first_s < 0.4  # did not wait for the slow source
+    assert sorted(a["title"] for a in [first] + rest) == ["gdelt", "p1 a0", "p1 a1"]
@@ -0,0 +1,96 @@
+import os, json, time, importlib.util
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import scrape_common
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _load(name: str, path: str):
+    # both scrapers are called scrape.py; load each under its own name
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+web_scrape = _load("web_scrape", os.path.join(BACKEND, "web_retrieval", "scrape.py"))
+rag_scrape = _load("rag_scrape", os.path.join(BACKEND, "rag", "scrape.py"))
+
+
+class LocalFirecrawl:
+    """FirecrawlApp stand-in: search() returns fixed links, scrape() really fetches them over HTTP."""
+
+    def __init__(self, links):
+        self.links = links
+        self.scraped = []
+
+    def search(self, query, limit=10):
+        return SimpleNamespace(web=[SimpleNamespace(url=u) for u in self.links[:limit]])
+
+    def scrape(self, url):
+        self.scraped.append(url)
+        r = requests.get(url, timeout=5)
+        if r.status_code != 200:
+            raise RuntimeError(f"HTTP {r.status_code}")
+        return SimpleNamespace(markdown=r.text)
+
+
+def _page(title: str) -> str:
+    return f"{title} residents commute by bus every weekday\nMenu\n{title} rents rose faster than wages this year\n"
+
+
+@pytest.fixture
+def site(server, monkeypatch, tmp_path):
+    flaky = {"n": 0}
+
+    def sometimes(q):
+        flaky["n"] += 1
+        return (503, {}, "busy") if flaky["n"] == 1 else (200, {}, _page("Flaky"))
+
+    server.routes["/a"] = lambda q: (200, {}, _page("Alpha"))
+    server.routes["/b"] = lambda q: (200, {}, _page("Beta"))
+    server.routes["/flaky"] = sometimes
+    server.routes["/down"] = lambda q: (500, {}, "error")
+    client = LocalFirecrawl([server.url(p) for p in ("/a", "/down", "/flaky", "/b")])
+    monkeypatch.setattr(scrape_common, "get_client", lambda api_key: client)
+    monkeypatch.setattr(scrape_common, "_throttle", scrape_common.DomainThrottle(0))
+    monkeypatch.setattr(scrape_common, "SCRAPE_BACKOFF_S", 0)
+    for mod in (web_scrape, rag_scrape):
+        monkeypatch.setattr(mod, "get_client", lambda api_key: client)
+    monkeypatch.chdir(tmp_path)  # the scrapers write into ./data
+    return client
+
+
+def test_web_scrape_community_keeps_link_order(site, server):
+    path = web_scrape.scrape_community("bus riders", max_links=4, api_key="k", workers=4)
+
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    firsts = [line.split()[0] for line in text.splitlines() if line]
+    assert firsts == ["Alpha", "Alpha", "Flaky", "Flaky", "Beta", "Beta"]  # link order; "Menu" cleaned out
+    assert len(server.hits("/flaky")) == 2  # retried after the 503
+    assert len(server.hits("/down")) == scrape_common.SCRAPE_ATTEMPTS
+
+
+def test_rag_scrape_community_writes_sources(site, server):
+    path = rag_scrape.scrape_community("bus riders", max_links=4, api_key="k", workers=2)
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    assert data["community_description"] == "bus riders"
+    assert [s["url"] for s in data["sources"]] == [server.url("/a"), server.url("/flaky"), server.url("/b")]
+    assert data["sources"][0]["text"].startswith("Alpha residents")
+
+
+def test_domain_throttle_spaces_requests_per_domain():
+    throttle = scrape_common.DomainThrottle(0.2)
+    t0 = time.monotonic()
+    throttle.wait("http://one.example/a")
+    throttle.wait("http://two.example/a")
+    assert time.monotonic() - t0 < 0.1  # different domains don't wait for each other
+    throttle.wait("http://one.example/b")
+    assert time.monotonic() - t0 >= 0.2